@@ -1,416 +1,676 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, Depends
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse, Response
-from fastapi.staticfiles import StaticFiles
-import logging
-import os
-from pathlib import Path
-
-from app.models.schemas import (
-    UploadResponse, AnalysisRequest, AnalysisResponse, 
-    ExportRequest, ErrorResponse, ColumnMapping
-)
-from app.models.config import AppConfig
-from app.services.simple_excel_service import SimpleExcelService
-from app.services.simple_analysis_service import SimpleAnalysisService
-from app.services.simple_export_service import SimpleExportService
-from app.utils.file_utils import read_excel_file, get_sample_data, is_valid_excel_file
-from app.utils.config_utils import ConfigManager, ResultManager
-
-# 設定の読み込み（ログ設定より前に実行）
-config = AppConfig.load_from_file()
-config.ensure_directories()
-
-# ログ設定
-# 環境変数に基づいてログ設定を調整
-log_level = os.getenv("LOG_LEVEL", "INFO")
-environment = os.getenv("ENVIRONMENT", "development")
-
-# ログハンドラーの設定
-handlers = [logging.StreamHandler()]
-
-# 本番環境以外ではファイルログも有効にする
-if environment != "production":
-    try:
-        os.makedirs('logs', exist_ok=True)
-        handlers.append(logging.FileHandler('logs/app.log', encoding='utf-8'))
-    except Exception as e:
-        # ファイルログが作成できない場合はストリームログのみ
-        print(f"Warning: Could not create log file: {e}")
-
-logging.basicConfig(
-    level=getattr(logging, log_level.upper(), logging.INFO),
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=handlers
-)
-logger = logging.getLogger(__name__)
-
-# FastAPIアプリケーションの作成
-app = FastAPI(
-    title="Clustering Map API",
-    description="Excelアンケート結果からクラスタリングマップを生成するAPI",
-    version="0.1.0"
-)
-
-# CORS設定
-cors_origins = os.getenv("CORS_ORIGINS", "http://localhost:3000,http://127.0.0.1:3000").split(",")
-# 本番環境ではフロントエンドのURLを追加
-if os.getenv("ENVIRONMENT") == "production" or os.getenv("VERCEL"):
-    # Vercel環境の場合、同じドメインからのアクセスを許可
-    vercel_url = os.getenv("VERCEL_URL", "")
-    if vercel_url:
-        cors_origins.extend([
-            f"https://{vercel_url}",
-            f"https://{vercel_url}/"
-        ])
-    # Render環境のURLも保持（後方互換性のため）
-    cors_origins.extend([
-        "https://clustering-map-frontend.onrender.com",
-        "https://clustering-map-frontend.onrender.com/"
-    ])
-
-logger.info(f"CORS origins: {cors_origins}")
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=cors_origins,
-    allow_credentials=True,
-    allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-    allow_headers=["*"],
-)
-
-# サービスの初期化
-excel_service = SimpleExcelService()
-analysis_service = SimpleAnalysisService()
-export_service = SimpleExportService()
-config_manager = ConfigManager()
-result_manager = ResultManager()
-
-# 静的ファイルの配信
-if os.path.exists("frontend/dist"):
-    app.mount("/static", StaticFiles(directory="frontend/dist"), name="static")
-
-
-@app.get("/")
-async def root():
-    """ルートエンドポイント"""
-    return {"message": "Clustering Map API", "version": "0.1.0"}
-
-@app.get("/health")
-async def health_check():
-    """ヘルスチェックエンドポイント"""
-    return {
-        "status": "healthy",
-        "message": "Clustering Map API is running",
-        "version": "0.1.0",
-        "timestamp": datetime.now().isoformat()
-    }
-
-
-
-
-@app.get("/template")
-async def download_template():
-    """テンプレートファイルをダウンロード"""
-    try:
-        from openpyxl import Workbook
-        from openpyxl.styles import Font, PatternFill, Alignment
-        from io import BytesIO
-        
-        # 実際のビジネス文脈のサンプルデータを作成
-        sample_data = [
-            '22時以降の残業を禁止にして欲しいです。夜に連絡がくるのでワークライフバランスが保てません。',
-            'チームの仲間がとても協力的で、困った時には助け合える環境です。上司も理解があります。',
-            'スキルアップのための研修制度が充実していて、キャリア成長を実感できます。',
-            '給与や待遇面で満足しており、ボーナスも期待できます。昇進の機会も多いです。',
-            '会社の業績が好調で、売上が前年比で20%向上しました。目標を達成できて嬉しいです。',
-            '職場環境が快適で、オフィスの設備も整っています。働きやすい環境です。',
-            'プロジェクトの責任が重く、プレッシャーを感じることがあります。',
-            '会社の文化や価値観に共感でき、働きがいを感じています。',
-            '残業が多く、休暇が取りにくい状況が続いています。改善が必要です。',
-            '夜中や休日に緊急の連絡が来ることがあり、プライベートの時間が取れません。'
-        ]
-        
-        # ワークブックを作成
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "アンケート結果"
-        
-        # ヘッダーを設定
-        ws['A1'] = '自由記述'
-        
-        # ヘッダーのスタイル設定
-        header_font = Font(bold=True, color="FFFFFF")
-        header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        header_alignment = Alignment(horizontal="center", vertical="center")
-        
-        ws['A1'].font = header_font
-        ws['A1'].fill = header_fill
-        ws['A1'].alignment = header_alignment
-        
-        # サンプルデータを追加
-        for i, data in enumerate(sample_data, start=2):
-            ws[f'A{i}'] = data
-        
-        # 列幅を調整
-        ws.column_dimensions['A'].width = 80
-        
-        # データ行のスタイル設定
-        for row in ws.iter_rows(min_row=2):
-            for cell in row:
-                cell.alignment = Alignment(horizontal="left", vertical="top", wrap_text=True)
-        
-        # メモリ上に保存
-        output = BytesIO()
-        wb.save(output)
-        output.seek(0)
-        
-        return Response(
-            content=output.getvalue(),
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={"Content-Disposition": "attachment; filename=clustering_map_template.xlsx"}
-        )
-        
-    except Exception as e:
-        logger.error(f"Template generation failed: {e}")
-        raise HTTPException(status_code=500, detail=f"テンプレートの生成に失敗しました: {str(e)}")
-
-
-@app.post("/upload", response_model=UploadResponse)
-async def upload_excel(file: UploadFile = File(...)):
-    """Excelファイルをアップロードして前処理"""
-    try:
-        logger.info(f"Upload request received: filename={file.filename}, content_type={file.content_type}")
-        # ファイル形式の検証
-        if not file.filename or not is_valid_excel_file(file.filename):
-            raise HTTPException(
-                status_code=400,
-                detail="サポートされていないファイル形式です。.xlsxまたは.xlsファイルをアップロードしてください。"
-            )
-        
-        # ファイルサイズの検証
-        content = await file.read()
-        logger.info(f"File size: {len(content)} bytes")
-        if len(content) > config.max_file_size:
-            raise HTTPException(
-                status_code=400,
-                detail=f"ファイルサイズが大きすぎます。最大{config.max_file_size // (1024*1024)}MBまでです。"
-            )
-        
-        # 一時ファイルに保存
-        from app.utils.file_utils import create_temp_file, cleanup_temp_file
-        temp_file_path = create_temp_file(content, '.xlsx')
-        
-        try:
-            # Excelファイルを読み込み
-            logger.info(f"Reading Excel file: {temp_file_path}")
-            df = read_excel_file(temp_file_path)
-            logger.info(f"Excel file loaded: {len(df)} rows, {len(df.columns)} columns")
-            
-            # 行数制限の検証
-            if len(df) > config.max_rows:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"データ行数が多すぎます。最大{config.max_rows}行までです。"
-                )
-            
-            # サンプルデータを取得
-            logger.info("Generating sample data...")
-            sample_data = get_sample_data(df, 5)
-            
-            # タグ候補を生成
-            logger.info("Generating tag candidates...")
-            tag_candidates = excel_service.generate_tag_candidates(df)
-            logger.info(f"Generated {len(tag_candidates)} tag candidates")
-            
-            logger.info("Upload processing completed successfully")
-            return UploadResponse(
-                success=True,
-                message="ファイルのアップロードと前処理が完了しました。",
-                columns=list(df.columns),
-                sample_data=sample_data,
-                tag_candidates=tag_candidates
-            )
-        
-        finally:
-            # 一時ファイルを削除
-            cleanup_temp_file(temp_file_path)
-    
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Upload failed: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail=f"ファイルの処理中にエラーが発生しました: {str(e)}")
-
-
-@app.post("/analyze", response_model=AnalysisResponse)
-async def analyze_data(request: AnalysisRequest):
-    """データの解析を実行"""
-    try:
-        # リクエスト内容をログに出力
-        logger.info(f"Analysis request received: cluster_method={request.cluster_method}, shape_mask_path={request.shape_mask_path}")
-        logger.info(f"Request dict: {request.model_dump()}")
-        
-        # 解析を実行
-        result = analysis_service.analyze_data(request)
-        
-        return AnalysisResponse(
-            success=True,
-            message="解析が完了しました。",
-            data_points=result["data_points"],
-            clusters=result["clusters"],
-            tags=result["tags"],
-            config=result.get("config", {})
-        )
-    
-    except Exception as e:
-        logger.error(f"Analysis failed: {e}")
-        raise HTTPException(status_code=500, detail=f"解析中にエラーが発生しました: {str(e)}")
-
-
-@app.get("/export/pdf")
-async def export_pdf():
-    """PDFエクスポート（Vercelでは無効化）"""
-    raise HTTPException(
-        status_code=503, 
-        detail="PDF export is not available on Vercel Serverless Functions due to package size constraints"
-    )
-
-
-@app.get("/export/png")
-async def export_png():
-    """PNGエクスポート（Vercelでは無効化）"""
-    raise HTTPException(
-        status_code=503, 
-        detail="PNG export is not available on Vercel Serverless Functions due to package size constraints"
-    )
-
-
-@app.get("/tags")
-async def get_tags():
-    """タグ辞書を取得"""
-    try:
-        tags = excel_service.get_tag_rules()
-        return {"success": True, "tags": tags}
-    except Exception as e:
-        logger.error(f"Get tags failed: {e}")
-        raise HTTPException(status_code=500, detail=f"タグ辞書の取得中にエラーが発生しました: {str(e)}")
-
-
-@app.post("/tags")
-async def update_tags(tags: dict):
-    """タグ辞書を更新"""
-    try:
-        excel_service.update_tag_rules(tags)
-        return {"success": True, "message": "タグ辞書が更新されました。"}
-    except Exception as e:
-        logger.error(f"Update tags failed: {e}")
-        raise HTTPException(status_code=500, detail=f"タグ辞書の更新中にエラーが発生しました: {str(e)}")
-
-
-@app.get("/configs")
-async def get_configs():
-    """保存された設定一覧を取得"""
-    try:
-        configs = config_manager.list_configs()
-        return {"success": True, "configs": configs}
-    except Exception as e:
-        logger.error(f"Get configs failed: {e}")
-        raise HTTPException(status_code=500, detail=f"設定一覧の取得中にエラーが発生しました: {str(e)}")
-
-
-@app.post("/configs")
-async def save_config(config: dict):
-    """設定を保存"""
-    try:
-        config_name = config.get("name")
-        config_data = config.get("config")
-        
-        if not config_data:
-            raise HTTPException(status_code=400, detail="設定データが提供されていません")
-        
-        saved_path = config_manager.save_analysis_config(config_data, config_name)
-        return {"success": True, "message": "設定が保存されました。", "path": saved_path}
-    except Exception as e:
-        logger.error(f"Save config failed: {e}")
-        raise HTTPException(status_code=500, detail=f"設定の保存中にエラーが発生しました: {str(e)}")
-
-
-@app.get("/configs/{config_name}")
-async def get_config(config_name: str):
-    """設定を取得"""
-    try:
-        config_data = config_manager.load_analysis_config(config_name)
-        if config_data is None:
-            raise HTTPException(status_code=404, detail="設定が見つかりません")
-        
-        return {"success": True, "config": config_data}
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Get config failed: {e}")
-        raise HTTPException(status_code=500, detail=f"設定の取得中にエラーが発生しました: {str(e)}")
-
-
-@app.delete("/configs/{config_name}")
-async def delete_config(config_name: str):
-    """設定を削除"""
-    try:
-        success = config_manager.delete_config(config_name)
-        if not success:
-            raise HTTPException(status_code=404, detail="設定が見つかりません")
-        
-        return {"success": True, "message": "設定が削除されました。"}
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Delete config failed: {e}")
-        raise HTTPException(status_code=500, detail=f"設定の削除中にエラーが発生しました: {str(e)}")
-
-
-@app.get("/results")
-async def get_results():
-    """保存された結果一覧を取得"""
-    try:
-        results = result_manager.list_results()
-        return {"success": True, "results": results}
-    except Exception as e:
-        logger.error(f"Get results failed: {e}")
-        raise HTTPException(status_code=500, detail=f"結果一覧の取得中にエラーが発生しました: {str(e)}")
-
-
-@app.get("/results/{result_name}")
-async def get_result(result_name: str):
-    """結果を取得"""
-    try:
-        result_data = result_manager.load_analysis_result(result_name)
-        if result_data is None:
-            raise HTTPException(status_code=404, detail="結果が見つかりません")
-        
-        return {"success": True, "result": result_data}
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Get result failed: {e}")
-        raise HTTPException(status_code=500, detail=f"結果の取得中にエラーが発生しました: {str(e)}")
-
-
-@app.delete("/results/{result_name}")
-async def delete_result(result_name: str):
-    """結果を削除"""
-    try:
-        success = result_manager.delete_result(result_name)
-        if not success:
-            raise HTTPException(status_code=404, detail="結果が見つかりません")
-        
-        return {"success": True, "message": "結果が削除されました。"}
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Delete result failed: {e}")
-        raise HTTPException(status_code=500, detail=f"結果の削除中にエラーが発生しました: {str(e)}")
-
-
-if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+from fastapi import FastAPI, File, UploadFile, HTTPException, Depends, BackgroundTasks
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, FileResponse, Response
+from fastapi.staticfiles import StaticFiles
+import hashlib
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Optional
+
+from app.models.schemas import (
+    UploadResponse, AnalysisRequest, AnalysisResponse, 
+    ExportRequest, ErrorResponse, ColumnMapping, TagCandidatesResponse, TagRule
+)
+from app.models.config import AppConfig
+from app.services.simple_excel_service import SimpleExcelService
+from app.services.simple_analysis_service import SimpleAnalysisService
+from app.services.simple_export_service import SimpleExportService
+from app.utils.file_utils import (
+    read_data_file, get_sample_data, is_supported_data_file,
+    digest_upload, get_data_format, FileTooLargeError, RowLimitExceededError
+)
+from app.utils.config_utils import ConfigManager, ResultManager
+from app.utils.dataset_store import DatasetStore, DatasetNotFoundError, UploadCache
+from app.utils.dataset_tokens import load_dataset_tokens
+from app.utils.text_utils import preload_tokenizer
+from app.utils.model_registry import model_registry
+
+# 設定の読み込み（ログ設定より前に実行）
+config = AppConfig.load_from_file()
+config.ensure_directories()
+
+# ログ設定
+# 環境変数に基づいてログ設定を調整
+log_level = os.getenv("LOG_LEVEL", "INFO")
+environment = os.getenv("ENVIRONMENT", "development")
+
+# ログハンドラーの設定
+handlers = [logging.StreamHandler()]
+
+# 本番環境以外ではファイルログも有効にする
+if environment != "production":
+    try:
+        os.makedirs('logs', exist_ok=True)
+        handlers.append(logging.FileHandler('logs/app.log', encoding='utf-8'))
+    except Exception as e:
+        # ファイルログが作成できない場合はストリームログのみ
+        print(f"Warning: Could not create log file: {e}")
+
+logging.basicConfig(
+    level=getattr(logging, log_level.upper(), logging.INFO),
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=handlers
+)
+logger = logging.getLogger(__name__)
+
+# FastAPIアプリケーションの作成
+app = FastAPI(
+    title="Clustering Map API",
+    description="Excelアンケート結果からクラスタリングマップを生成するAPI",
+    version="0.1.0"
+)
+
+# CORS設定
+cors_origins = os.getenv("CORS_ORIGINS", "http://localhost:3000,http://127.0.0.1:3000").split(",")
+# 本番環境ではフロントエンドのURLを追加
+if os.getenv("ENVIRONMENT") == "production" or os.getenv("VERCEL"):
+    # Vercel環境の場合、同じドメインからのアクセスを許可
+    vercel_url = os.getenv("VERCEL_URL", "")
+    if vercel_url:
+        cors_origins.extend([
+            f"https://{vercel_url}",
+            f"https://{vercel_url}/"
+        ])
+    # Render環境のURLも保持（後方互換性のため）
+    cors_origins.extend([
+        "https://clustering-map-frontend.onrender.com",
+        "https://clustering-map-frontend.onrender.com/"
+    ])
+
+logger.info(f"CORS origins: {cors_origins}")
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=cors_origins,
+    allow_credentials=True,
+    allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+    allow_headers=["*"],
+)
+
+# データセットに付随して保存するタグ候補の集計値
+TAG_STATS_NAME = "tag_stats"
+
+# タグ候補の計算状況
+TAG_STATUS_PENDING = "pending"
+TAG_STATUS_RUNNING = "running"
+TAG_STATUS_COMPLETED = "completed"
+TAG_STATUS_FAILED = "failed"
+
+# 計算待ち・計算中・失敗したタグ候補のジョブ（dataset_id -> 状況）
+tag_jobs = {}
+tag_jobs_lock = threading.Lock()
+
+# サービスの初期化
+dataset_store = DatasetStore(config.datasets_dir)
+upload_cache = UploadCache(
+    dataset_store, config.upload_cache_memory_bytes, config.dataset_disk_budget_bytes
+)
+excel_service = SimpleExcelService(config)
+analysis_service = SimpleAnalysisService(dataset_store, config)
+export_service = SimpleExportService()
+config_manager = ConfigManager()
+result_manager = ResultManager()
+
+# Sudachi辞書は初回のトークン化で読み込む。preforkサーバー（gunicorn --preload など）では
+# PRELOAD_TOKENIZER=1 で親プロセスに読み込んでおくと、ワーカーがコピーオンライトで共有する
+if os.getenv("PRELOAD_TOKENIZER") == "1":
+    preload_tokenizer()
+
+# 埋め込みモデル（KeyBERT と共有）も初回の利用時に読み込む。PRELOAD_MODELS=1 で起動時に読み込んでおく
+if os.getenv("PRELOAD_MODELS") == "1":
+    try:
+        model_registry.warmup([config.embedding_model])
+    except Exception as e:
+        logger.warning(f"Model warmup failed: {e}")
+
+# 静的ファイルの配信
+if os.path.exists("frontend/dist"):
+    app.mount("/static", StaticFiles(directory="frontend/dist"), name="static")
+
+
+@app.get("/")
+async def root():
+    """ルートエンドポイント"""
+    return {"message": "Clustering Map API", "version": "0.1.0"}
+
+@app.get("/health")
+async def health_check():
+    """ヘルスチェックエンドポイント"""
+    return {
+        "status": "healthy",
+        "message": "Clustering Map API is running",
+        "version": "0.1.0",
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+
+
+@app.get("/models")
+async def get_models():
+    """読み込み済みモデルのメモリ使用量を取得"""
+    return model_registry.footprint()
+
+
+@app.get("/template")
+async def download_template():
+    """テンプレートファイルをダウンロード"""
+    try:
+        from openpyxl import Workbook
+        from openpyxl.styles import Font, PatternFill, Alignment
+        from io import BytesIO
+        
+        # 実際のビジネス文脈のサンプルデータを作成
+        sample_data = [
+            '22時以降の残業を禁止にして欲しいです。夜に連絡がくるのでワークライフバランスが保てません。',
+            'チームの仲間がとても協力的で、困った時には助け合える環境です。上司も理解があります。',
+            'スキルアップのための研修制度が充実していて、キャリア成長を実感できます。',
+            '給与や待遇面で満足しており、ボーナスも期待できます。昇進の機会も多いです。',
+            '会社の業績が好調で、売上が前年比で20%向上しました。目標を達成できて嬉しいです。',
+            '職場環境が快適で、オフィスの設備も整っています。働きやすい環境です。',
+            'プロジェクトの責任が重く、プレッシャーを感じることがあります。',
+            '会社の文化や価値観に共感でき、働きがいを感じています。',
+            '残業が多く、休暇が取りにくい状況が続いています。改善が必要です。',
+            '夜中や休日に緊急の連絡が来ることがあり、プライベートの時間が取れません。'
+        ]
+        
+        # ワークブックを作成
+        wb = Workbook()
+        ws = wb.active
+        ws.title = "アンケート結果"
+        
+        # ヘッダーを設定
+        ws['A1'] = '自由記述'
+        
+        # ヘッダーのスタイル設定
+        header_font = Font(bold=True, color="FFFFFF")
+        header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+        header_alignment = Alignment(horizontal="center", vertical="center")
+        
+        ws['A1'].font = header_font
+        ws['A1'].fill = header_fill
+        ws['A1'].alignment = header_alignment
+        
+        # サンプルデータを追加
+        for i, data in enumerate(sample_data, start=2):
+            ws[f'A{i}'] = data
+        
+        # 列幅を調整
+        ws.column_dimensions['A'].width = 80
+        
+        # データ行のスタイル設定
+        for row in ws.iter_rows(min_row=2):
+            for cell in row:
+                cell.alignment = Alignment(horizontal="left", vertical="top", wrap_text=True)
+        
+        # メモリ上に保存
+        output = BytesIO()
+        wb.save(output)
+        output.seek(0)
+        
+        return Response(
+            content=output.getvalue(),
+            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            headers={"Content-Disposition": "attachment; filename=clustering_map_template.xlsx"}
+        )
+        
+    except Exception as e:
+        logger.error(f"Template generation failed: {e}")
+        raise HTTPException(status_code=500, detail=f"テンプレートの生成に失敗しました: {str(e)}")
+
+
+def _build_upload_response(dataset_id: str, artifacts: dict) -> UploadResponse:
+    """保存済みの結果からアップロード応答を作成"""
+    return UploadResponse(
+        success=True,
+        message="ファイルのアップロードと前処理が完了しました。",
+        columns=artifacts["columns"],
+        sample_data=artifacts["sample_data"],
+        tag_candidates=artifacts["tag_candidates"],
+        tag_status=artifacts.get("tag_status", TAG_STATUS_COMPLETED),
+        dataset_id=dataset_id
+    )
+
+
+def _upload_dataset_id(content_hash: str, file_name: str, parent_id: Optional[str] = None) -> str:
+    """アップロードの内容ハッシュと読み込み形式から dataset_id を決める
+
+    同じバイト列でも拡張子によって解析結果が変わる（.csv と .tsv など）ので、形式もキーに含める。
+    """
+    key = f"{get_data_format(file_name)}:{content_hash}"
+    if parent_id is not None:
+        key = f"{parent_id}:{key}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def _store_upload(dataset_id: str, df, source_name: Optional[str]) -> dict:
+    """テーブルとサンプルデータを保存（タグ候補はバックグラウンドで計算）"""
+    logger.info("Generating sample data...")
+    sample_data = get_sample_data(df, 5)
+    
+    artifacts = {
+        "num_rows": len(df),
+        "columns": list(df.columns),
+        "sample_data": sample_data,
+        "tag_candidates": [],
+        "tag_status": TAG_STATUS_PENDING
+    }
+    return upload_cache.put(dataset_id, df, artifacts, source_name)
+
+
+def _schedule_tag_candidates(background_tasks: BackgroundTasks, dataset_id: str, artifacts: dict) -> dict:
+    """タグ候補が未計算（再起動などで中断した場合を含む）ならバックグラウンドで計算を開始"""
+    status = artifacts.get("tag_status", TAG_STATUS_COMPLETED)
+    if status == TAG_STATUS_COMPLETED:
+        return artifacts
+    with tag_jobs_lock:
+        if tag_jobs.get(dataset_id) in (TAG_STATUS_PENDING, TAG_STATUS_RUNNING):
+            return {**artifacts, "tag_status": tag_jobs[dataset_id]}
+        tag_jobs[dataset_id] = TAG_STATUS_PENDING
+    background_tasks.add_task(_compute_tag_candidates, dataset_id)
+    return {**artifacts, "tag_status": TAG_STATUS_PENDING}
+
+
+def _compute_tag_candidates(dataset_id: str) -> None:
+    """保存済みのデータセットからタグ候補を計算（スレッドプールで実行）
+
+    追記で作られたデータセットは、追記元の集計値があれば追加行の分だけを計算して合算する。
+    """
+    with tag_jobs_lock:
+        tag_jobs[dataset_id] = TAG_STATUS_RUNNING
+    try:
+        logger.info(f"Generating tag candidates for {dataset_id}...")
+        df = dataset_store.load(dataset_id)
+        manifest = dataset_store.get_manifest(dataset_id)
+        
+        parent_id = manifest.get("parent_id")
+        parent_stats = dataset_store.load_json(parent_id, TAG_STATS_NAME) if parent_id else None
+        mergeable = (parent_stats is not None and parent_stats.get("text_column") in df
+                     and parent_stats.get("tokenizer_mode", "regex") == config.tokenizer_mode
+                     and parent_stats.get("categories_version") == excel_service.get_category_index().version)
+        text_column = parent_stats["text_column"] if mergeable else excel_service.detect_text_column(df)
+        
+        # トークン列はデータセットに保存し、後の解析でも使う
+        try:
+            token_lists = load_dataset_tokens(
+                dataset_store, dataset_id, text_column, config.tokenizer_mode, df, config.tokenize_workers
+            )
+        except Exception as e:
+            logger.warning(f"Token cache unavailable for {dataset_id}: {e}")
+            token_lists = None
+        
+        if mergeable:
+            dirty_from = manifest["dirty_from"]
+            dirty_rows = df.take(range(dirty_from, len(df)))
+            tag_stats = excel_service.merge_tag_stats(
+                parent_stats, excel_service.generate_tag_stats(
+                    dirty_rows, text_column,
+                    token_lists=token_lists.view(dirty_from) if token_lists is not None else None
+                )
+            )
+        else:
+            tag_stats = excel_service.generate_tag_stats(df, text_column, token_lists=token_lists)
+        dataset_store.save_json(dataset_id, TAG_STATS_NAME, tag_stats)
+        
+        tag_candidates = excel_service.tag_candidates_from_stats(tag_stats)
+        upload_cache.update(dataset_id, {
+            "tag_candidates": [candidate.model_dump() for candidate in tag_candidates],
+            "tag_status": TAG_STATUS_COMPLETED
+        })
+        logger.info(f"Generated {len(tag_candidates)} tag candidates for {dataset_id}")
+        with tag_jobs_lock:
+            tag_jobs.pop(dataset_id, None)
+    except Exception as e:
+        logger.error(f"Tag candidate generation failed for {dataset_id}: {e}", exc_info=True)
+        with tag_jobs_lock:
+            tag_jobs[dataset_id] = TAG_STATUS_FAILED
+
+
+@app.post("/upload", response_model=UploadResponse)
+async def upload_excel(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
+    """Excel / CSV / TSV / Parquetファイルをアップロードして前処理"""
+    try:
+        logger.info(f"Upload request received: filename={file.filename}, content_type={file.content_type}")
+        # ファイル形式の検証
+        if not file.filename or not is_supported_data_file(file.filename):
+            raise HTTPException(
+                status_code=400,
+                detail="サポートされていないファイル形式です。.xlsx、.xls、.csv、.tsvまたは.parquetファイルをアップロードしてください。"
+            )
+        
+        # アップロード済みのデータをコピーせずにハッシュ計算（サイズ超過は即座に中断）
+        try:
+            file_size, content_hash = await digest_upload(
+                file, config.max_file_size, config.upload_chunk_size
+            )
+        except FileTooLargeError:
+            raise HTTPException(
+                status_code=400,
+                detail=f"ファイルサイズが大きすぎます。最大{config.max_file_size // (1024*1024)}MBまでです。"
+            )
+        logger.info(f"File size: {file_size} bytes, sha256={content_hash}")
+        
+        # 同じ内容・同じ形式のファイルは解析済みの結果を返す
+        dataset_id = _upload_dataset_id(content_hash, file.filename)
+        artifacts = upload_cache.get(dataset_id)
+        if artifacts is not None:
+            logger.info(f"Upload cache hit: {dataset_id}")
+            if artifacts["num_rows"] > config.max_rows:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"データ行数が多すぎます。最大{config.max_rows}行までです。"
+                )
+            artifacts = _schedule_tag_candidates(background_tasks, dataset_id, artifacts)
+            return _build_upload_response(dataset_id, artifacts)
+        
+        # アップロードのファイルオブジェクトをそのまま読み込み（行数制限を超えた時点で中断）
+        # 小さいファイルはメモリ上、大きいファイルはサーバーが書き出した一時ファイルから読む
+        logger.info(f"Reading data file: {file.filename}")
+        try:
+            df = read_data_file(file.file, config.max_rows, config.excel_engine, file.filename)
+        except RowLimitExceededError:
+            raise HTTPException(
+                status_code=400,
+                detail=f"データ行数が多すぎます。最大{config.max_rows}行までです。"
+            )
+        logger.info(f"Data file loaded: {len(df)} rows, {len(df.columns)} columns")
+        
+        # 解析時の再読み込みと再アップロードに備えて内容ハッシュと形式から決まるIDで保存
+        artifacts = _store_upload(dataset_id, df, file.filename)
+        
+        # 列名とサンプルデータを先に返し、タグ候補は /datasets/{dataset_id}/tag-candidates で取得する
+        artifacts = _schedule_tag_candidates(background_tasks, dataset_id, artifacts)
+        logger.info("Upload processing completed successfully")
+        return _build_upload_response(dataset_id, artifacts)
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Upload failed: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"ファイルの処理中にエラーが発生しました: {str(e)}")
+
+
+@app.post("/datasets/{dataset_id}/append", response_model=UploadResponse)
+async def append_rows(dataset_id: str, background_tasks: BackgroundTasks, file: UploadFile = File(...)):
+    """既存のデータセットに行を追加
+
+    追加後のデータは新しい dataset_id で保存され、タグ候補とクラスタリング結果は
+    追加された行の分だけ差分で更新される。
+    """
+    try:
+        logger.info(f"Append request received: dataset_id={dataset_id}, filename={file.filename}")
+        if not file.filename or not is_supported_data_file(file.filename):
+            raise HTTPException(
+                status_code=400,
+                detail="サポートされていないファイル形式です。.xlsx、.xls、.csv、.tsvまたは.parquetファイルをアップロードしてください。"
+            )
+        
+        try:
+            parent_manifest = dataset_store.get_manifest(dataset_id)
+        except (DatasetNotFoundError, ValueError):
+            raise HTTPException(
+                status_code=404,
+                detail="データセットが見つかりません。ファイルを再アップロードしてください。"
+            )
+        
+        try:
+            file_size, content_hash = await digest_upload(
+                file, config.max_file_size, config.upload_chunk_size
+            )
+        except FileTooLargeError:
+            raise HTTPException(
+                status_code=400,
+                detail=f"ファイルサイズが大きすぎます。最大{config.max_file_size // (1024*1024)}MBまでです。"
+            )
+        
+        # 追記後のIDは追記元と追加分の内容・形式から決まるので、同じ追加の繰り返しは保存済みの結果を返す
+        appended_id = _upload_dataset_id(content_hash, file.filename, parent_id=dataset_id)
+        artifacts = upload_cache.get(appended_id)
+        if artifacts is not None:
+            logger.info(f"Upload cache hit: {appended_id}")
+            artifacts = _schedule_tag_candidates(background_tasks, appended_id, artifacts)
+            return _build_upload_response(appended_id, artifacts)
+        
+        # 追加後の合計が上限を超える場合は読み込みを打ち切る
+        remaining_rows = max(config.max_rows - parent_manifest["num_rows"], 0)
+        try:
+            new_rows = read_data_file(file.file, remaining_rows, config.excel_engine, file.filename)
+        except RowLimitExceededError:
+            raise HTTPException(
+                status_code=400,
+                detail=f"データ行数が多すぎます。最大{config.max_rows}行までです。"
+            )
+        
+        try:
+            dataset_store.append(dataset_id, appended_id, new_rows, file.filename)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        df = dataset_store.load(appended_id)
+        logger.info(f"Appended {len(new_rows)} rows to {dataset_id}: {len(df)} rows in total")
+        
+        # タグ候補は追記元の集計値に追加行の分だけを合算する（バックグラウンド）
+        artifacts = _store_upload(appended_id, df, file.filename)
+        artifacts = _schedule_tag_candidates(background_tasks, appended_id, artifacts)
+        return _build_upload_response(appended_id, artifacts)
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Append failed: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"ファイルの処理中にエラーが発生しました: {str(e)}")
+
+
+@app.get("/datasets/{dataset_id}/tag-candidates", response_model=TagCandidatesResponse)
+async def get_tag_candidates(dataset_id: str, background_tasks: BackgroundTasks):
+    """タグ候補の計算状況と結果を取得（計算中は status が pending / running）"""
+    artifacts = upload_cache.get(dataset_id)
+    if artifacts is None:
+        raise HTTPException(
+            status_code=404,
+            detail="データセットが見つかりません。ファイルを再アップロードしてください。"
+        )
+    
+    status = artifacts.get("tag_status", TAG_STATUS_COMPLETED)
+    if status != TAG_STATUS_COMPLETED:
+        with tag_jobs_lock:
+            status = tag_jobs.get(dataset_id)
+        if status is None:
+            # 直前に計算が終わった場合は保存済みの結果を返し、
+            # 計算中にサーバーが再起動した場合などは計算し直す
+            artifacts = upload_cache.get(dataset_id) or artifacts
+            artifacts = _schedule_tag_candidates(background_tasks, dataset_id, artifacts)
+            status = artifacts["tag_status"]
+    
+    return TagCandidatesResponse(
+        success=status != TAG_STATUS_FAILED,
+        dataset_id=dataset_id,
+        status=status,
+        tag_candidates=artifacts["tag_candidates"],
+        message="タグ候補の生成に失敗しました。" if status == TAG_STATUS_FAILED else None
+    )
+
+
+@app.post("/analyze", response_model=AnalysisResponse)
+async def analyze_data(request: AnalysisRequest):
+    """データの解析を実行"""
+    try:
+        # リクエスト内容をログに出力
+        logger.info(f"Analysis request received: cluster_method={request.cluster_method}, shape_mask_path={request.shape_mask_path}")
+        logger.info(f"Request dict: {request.model_dump()}")
+        
+        # 解析を実行
+        result = analysis_service.analyze_data(request)
+        
+        return AnalysisResponse(
+            success=True,
+            message="解析が完了しました。",
+            data_points=result["data_points"],
+            clusters=result["clusters"],
+            tags=result["tags"],
+            config=result.get("config", {})
+        )
+    
+    except DatasetNotFoundError:
+        raise HTTPException(
+            status_code=404,
+            detail="データセットが見つかりません。ファイルを再アップロードしてください。"
+        )
+    except Exception as e:
+        logger.error(f"Analysis failed: {e}")
+        raise HTTPException(status_code=500, detail=f"解析中にエラーが発生しました: {str(e)}")
+
+
+@app.get("/export/pdf")
+async def export_pdf():
+    """PDFエクスポート（Vercelでは無効化）"""
+    raise HTTPException(
+        status_code=503, 
+        detail="PDF export is not available on Vercel Serverless Functions due to package size constraints"
+    )
+
+
+@app.get("/export/png")
+async def export_png():
+    """PNGエクスポート（Vercelでは無効化）"""
+    raise HTTPException(
+        status_code=503, 
+        detail="PNG export is not available on Vercel Serverless Functions due to package size constraints"
+    )
+
+
+@app.get("/tags")
+async def get_tags():
+    """タグ辞書を取得"""
+    try:
+        tags = excel_service.get_tag_rules()
+        return {"success": True, "tags": tags}
+    except Exception as e:
+        logger.error(f"Get tags failed: {e}")
+        raise HTTPException(status_code=500, detail=f"タグ辞書の取得中にエラーが発生しました: {str(e)}")
+
+
+@app.post("/tags")
+async def update_tags(tags: dict):
+    """タグ辞書を更新"""
+    try:
+        rules = [TagRule(**rule) for rule in tags.get("rules", [])]
+        if not excel_service.update_tag_rules(rules):
+            raise HTTPException(status_code=400, detail="タグ辞書を更新できませんでした。ルールを確認してください。")
+        return {"success": True, "message": "タグ辞書が更新されました。"}
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Update tags failed: {e}")
+        raise HTTPException(status_code=500, detail=f"タグ辞書の更新中にエラーが発生しました: {str(e)}")
+
+
+@app.get("/configs")
+async def get_configs():
+    """保存された設定一覧を取得"""
+    try:
+        configs = config_manager.list_configs()
+        return {"success": True, "configs": configs}
+    except Exception as e:
+        logger.error(f"Get configs failed: {e}")
+        raise HTTPException(status_code=500, detail=f"設定一覧の取得中にエラーが発生しました: {str(e)}")
+
+
+@app.post("/configs")
+async def save_config(config: dict):
+    """設定を保存"""
+    try:
+        config_name = config.get("name")
+        config_data = config.get("config")
+        
+        if not config_data:
+            raise HTTPException(status_code=400, detail="設定データが提供されていません")
+        
+        saved_path = config_manager.save_analysis_config(config_data, config_name)
+        return {"success": True, "message": "設定が保存されました。", "path": saved_path}
+    except Exception as e:
+        logger.error(f"Save config failed: {e}")
+        raise HTTPException(status_code=500, detail=f"設定の保存中にエラーが発生しました: {str(e)}")
+
+
+@app.get("/configs/{config_name}")
+async def get_config(config_name: str):
+    """設定を取得"""
+    try:
+        config_data = config_manager.load_analysis_config(config_name)
+        if config_data is None:
+            raise HTTPException(status_code=404, detail="設定が見つかりません")
+        
+        return {"success": True, "config": config_data}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Get config failed: {e}")
+        raise HTTPException(status_code=500, detail=f"設定の取得中にエラーが発生しました: {str(e)}")
+
+
+@app.delete("/configs/{config_name}")
+async def delete_config(config_name: str):
+    """設定を削除"""
+    try:
+        success = config_manager.delete_config(config_name)
+        if not success:
+            raise HTTPException(status_code=404, detail="設定が見つかりません")
+        
+        return {"success": True, "message": "設定が削除されました。"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Delete config failed: {e}")
+        raise HTTPException(status_code=500, detail=f"設定の削除中にエラーが発生しました: {str(e)}")
+
+
+@app.get("/results")
+async def get_results():
+    """保存された結果一覧を取得"""
+    try:
+        results = result_manager.list_results()
+        return {"success": True, "results": results}
+    except Exception as e:
+        logger.error(f"Get results failed: {e}")
+        raise HTTPException(status_code=500, detail=f"結果一覧の取得中にエラーが発生しました: {str(e)}")
+
+
+@app.get("/results/{result_name}")
+async def get_result(result_name: str):
+    """結果を取得"""
+    try:
+        result_data = result_manager.load_analysis_result(result_name)
+        if result_data is None:
+            raise HTTPException(status_code=404, detail="結果が見つかりません")
+        
+        return {"success": True, "result": result_data}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Get result failed: {e}")
+        raise HTTPException(status_code=500, detail=f"結果の取得中にエラーが発生しました: {str(e)}")
+
+
+@app.delete("/results/{result_name}")
+async def delete_result(result_name: str):
+    """結果を削除"""
+    try:
+        success = result_manager.delete_result(result_name)
+        if not success:
+            raise HTTPException(status_code=404, detail="結果が見つかりません")
+        
+        return {"success": True, "message": "結果が削除されました。"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Delete result failed: {e}")
+        raise HTTPException(status_code=500, detail=f"結果の削除中にエラーが発生しました: {str(e)}")
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -1,66 +1,89 @@
-from typing import Dict, Any, Optional
-from pydantic import BaseModel, Field
-import json
-import os
-from pathlib import Path
-
-
-class AppConfig(BaseModel):
-    """アプリケーション設定"""
-    # データベース設定
-    # Vercel環境では一時ディレクトリを使用
-    data_dir: str = Field("/tmp/data", description="データディレクトリ")
-    results_dir: str = Field("/tmp/data/results", description="結果保存ディレクトリ")
-    logs_dir: str = Field("/tmp/logs", description="ログディレクトリ")
-    temp_dir: str = Field("/tmp", description="一時ファイルディレクトリ")
-    
-    # モデル設定
-    embedding_model: str = Field(
-        "sentence-transformers/all-MiniLM-L6-v2",
-        description="埋め込みモデル名"
-    )
-    
-    # デフォルトパラメータ
-    default_umap_params: Dict[str, Any] = Field(default_factory=lambda: {
-        "n_neighbors": 15,
-        "min_dist": 0.1,
-        "random_state": 42
-    })
-    
-    default_hdbscan_params: Dict[str, Any] = Field(default_factory=lambda: {
-        "min_cluster_size": 15,
-        "min_samples": 5
-    })
-    
-    default_kmeans_params: Dict[str, Any] = Field(default_factory=lambda: {
-        "n_clusters": 8,
-        "random_state": 42
-    })
-    
-    # ファイル制限
-    max_file_size: int = Field(50 * 1024 * 1024, description="最大ファイルサイズ（バイト）")
-    max_rows: int = Field(50000, description="最大行数")
-    
-    # ログ設定
-    log_level: str = Field("INFO", description="ログレベル")
-    log_file: str = Field("logs/app.log", description="ログファイルパス")
-    
-    @classmethod
-    def load_from_file(cls, config_path: str = "config.json") -> "AppConfig":
-        """設定ファイルから読み込み"""
-        if os.path.exists(config_path):
-            with open(config_path, "r", encoding="utf-8") as f:
-                config_data = json.load(f)
-            return cls(**config_data)
-        return cls()
-    
-    def save_to_file(self, config_path: str = "config.json") -> None:
-        """設定ファイルに保存"""
-        os.makedirs(os.path.dirname(config_path), exist_ok=True)
-        with open(config_path, "w", encoding="utf-8") as f:
-            json.dump(self.model_dump(), f, ensure_ascii=False, indent=2)
-    
-    def ensure_directories(self) -> None:
-        """必要なディレクトリを作成"""
-        for dir_path in [self.data_dir, self.results_dir, self.logs_dir, self.temp_dir]:
-            Path(dir_path).mkdir(parents=True, exist_ok=True)
+from typing import Dict, Any, Optional
+from pydantic import BaseModel, Field
+import json
+import os
+from pathlib import Path
+
+
+class AppConfig(BaseModel):
+    """アプリケーション設定"""
+    # データベース設定
+    # Vercel環境では一時ディレクトリを使用
+    data_dir: str = Field("/tmp/data", description="データディレクトリ")
+    results_dir: str = Field("/tmp/data/results", description="結果保存ディレクトリ")
+    datasets_dir: str = Field("/tmp/data/datasets", description="アップロードデータ保存ディレクトリ")
+    logs_dir: str = Field("/tmp/logs", description="ログディレクトリ")
+    temp_dir: str = Field("/tmp", description="一時ファイルディレクトリ")
+    
+    # モデル設定
+    embedding_model: str = Field(
+        "sentence-transformers/all-MiniLM-L6-v2",
+        description="埋め込みモデル名"
+    )
+    embedding_cache_dir: str = Field("/tmp/data/embeddings", description="埋め込みキャッシュの保存ディレクトリ")
+    embedding_cache_max_entries: int = Field(
+        200000, description="埋め込みキャッシュに保持するテキスト数の上限（0でキャッシュしない）"
+    )
+    embedding_cache_dtype: str = Field("float16", description="埋め込みキャッシュの保存形式（float16 / float32）")
+    
+    # デフォルトパラメータ
+    default_umap_params: Dict[str, Any] = Field(default_factory=lambda: {
+        "n_neighbors": 15,
+        "min_dist": 0.1,
+        "random_state": 42
+    })
+    
+    default_hdbscan_params: Dict[str, Any] = Field(default_factory=lambda: {
+        "min_cluster_size": 15,
+        "min_samples": 5
+    })
+    
+    default_kmeans_params: Dict[str, Any] = Field(default_factory=lambda: {
+        "n_clusters": 8,
+        "random_state": 42
+    })
+    
+    # ファイル制限
+    max_file_size: int = Field(50 * 1024 * 1024, description="最大ファイルサイズ（バイト）")
+    max_rows: int = Field(50000, description="最大行数")
+    excel_engine: str = Field("openpyxl", description="Excel読み込みエンジン（openpyxl / native）")
+    upload_chunk_size: int = Field(1024 * 1024, description="アップロード読み込みチャンクサイズ（バイト）")
+    upload_cache_memory_bytes: int = Field(64 * 1024 * 1024, description="アップロード結果キャッシュのメモリ上限（バイト）")
+    dataset_disk_budget_bytes: int = Field(1024 * 1024 * 1024, description="保存データセットのディスク上限（バイト）")
+    incremental_recluster_ratio: float = Field(
+        0.2, description="差分で割り当てた追加行の割合がこれを超えたら全件で再クラスタリング"
+    )
+    
+    # テキスト処理設定
+    tokenizer_mode: str = Field("regex", description="タグ抽出のトークナイザー（regex / fast / sudachi）")
+    tokenize_workers: int = Field(1, description="形態素解析の並列プロセス数（1以下で並列化しない）")
+    
+    # キーワード抽出設定（KeyBERT）
+    keybert_batch_mode: bool = Field(
+        True, description="全テキストのキーワードをまとめて抽出する（文書と候補語の埋め込みをそれぞれ一括で計算）"
+    )
+    keybert_batch_size: int = Field(256, description="一括抽出で1回の埋め込み計算に渡すテキスト数")
+    
+    # ログ設定
+    log_level: str = Field("INFO", description="ログレベル")
+    log_file: str = Field("logs/app.log", description="ログファイルパス")
+    
+    @classmethod
+    def load_from_file(cls, config_path: str = "config.json") -> "AppConfig":
+        """設定ファイルから読み込み"""
+        if os.path.exists(config_path):
+            with open(config_path, "r", encoding="utf-8") as f:
+                config_data = json.load(f)
+            return cls(**config_data)
+        return cls()
+    
+    def save_to_file(self, config_path: str = "config.json") -> None:
+        """設定ファイルに保存"""
+        os.makedirs(os.path.dirname(config_path), exist_ok=True)
+        with open(config_path, "w", encoding="utf-8") as f:
+            json.dump(self.model_dump(), f, ensure_ascii=False, indent=2)
+    
+    def ensure_directories(self) -> None:
+        """必要なディレクトリを作成"""
+        for dir_path in [self.data_dir, self.results_dir, self.datasets_dir, self.logs_dir, self.temp_dir]:
+            Path(dir_path).mkdir(parents=True, exist_ok=True)
@@ -1 +1 @@
-# Services for the application
+# Services for the application
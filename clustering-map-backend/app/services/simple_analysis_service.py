@@ -1,251 +1,434 @@
-from typing import List, Dict, Any, Optional, Tuple
-import logging
-import json
-import os
-from pathlib import Path
-import re
-from collections import Counter
-
-from app.models.schemas import (
-    AnalysisRequest, DataPoint, TagRule, ColumnMapping
-)
-from app.models.config import AppConfig
-
-logger = logging.getLogger(__name__)
-
-
-class SimpleAnalysisService:
-    """簡素化された分析サービス（重いライブラリなし）"""
-    
-    def __init__(self):
-        self.config = AppConfig()
-    
-    def analyze_data(self, request: AnalysisRequest) -> Dict[str, Any]:
-        """データの分析（簡素化版）"""
-        try:
-            logger.info("Starting analysis...")
-            logger.info(f"Request attributes: {dir(request)}")
-            logger.info(f"Request type: {type(request)}")
-            logger.info(f"Request config: {getattr(request, 'config', 'NOT_FOUND')}")
-            logger.info(f"Self config: {self.config}")
-            
-            # ダミーデータを生成（実際の実装では、アップロードされたデータを使用）
-            texts = [
-                "このサービスはとても使いやすく、機能も充実しています。",
-                "料金が少し高いと感じます。もう少し安くなれば利用したいです。",
-                "サポートが丁寧で、問題がすぐに解決されました。",
-                "機能は良いのですが、もう少しシンプルな操作ができると良いです。",
-                "全体的に満足しています。継続して利用したいと思います。",
-                "レスポンスが早くて助かります。使い勝手も良いです。",
-                "エラーが発生することがあり、改善が必要だと思います。",
-                "デザインが美しく、操作も直感的で使いやすいです。",
-                "料金体系が複雑で分かりにくいです。シンプルにしてほしい。",
-                "カスタマーサポートの対応が素晴らしいです。"
-            ]
-            
-            # 遅延インポートでファイルサイズを削減
-            from sklearn.cluster import KMeans
-            from sklearn.feature_extraction.text import TfidfVectorizer
-            import numpy as np
-            
-            n_clusters = min(5, len(texts) // 3) if len(texts) > 3 else 1
-            logger.info(f"Number of clusters: {n_clusters}")
-            
-            # TF-IDFベクトル化
-            logger.info("Starting TF-IDF vectorization...")
-            vectorizer = TfidfVectorizer(max_features=100, stop_words='english')
-            tfidf_matrix = vectorizer.fit_transform(texts)
-            logger.info("TF-IDF vectorization completed")
-            
-            # クラスタリング（KMeans）
-            logger.info("Starting clustering...")
-            if n_clusters > 1:
-                kmeans = KMeans(n_clusters=n_clusters, random_state=42)
-                cluster_labels = kmeans.fit_predict(tfidf_matrix)
-            else:
-                cluster_labels = [0] * len(texts)
-            logger.info("Clustering completed")
-            
-            # 図形に基づく座標生成
-            logger.info("Generating shape coordinates...")
-            shape_mask = request.shape_mask_path if hasattr(request, 'shape_mask_path') else 'circle'
-            coordinates = self._generate_shape_coordinates(len(texts), shape_mask)
-            logger.info("Shape coordinates generated")
-            
-            # データポイントを生成
-            logger.info("Generating data points...")
-            data_points = []
-            for i, text in enumerate(texts):
-                # 基本的なテキスト分析
-                word_count = len(text.split()) if text else 0
-                char_count = len(text) if text else 0
-                
-                # 図形に基づく座標
-                cluster_id = cluster_labels[i]
-                x, y = coordinates[i]
-                
-                data_point = DataPoint(
-                    id=str(i),
-                    text=text,
-                    x=float(x),
-                    y=float(y),
-                    cluster_id=int(cluster_id),
-                    tags=self._extract_simple_tags(text),
-                    metadata={
-                        "word_count": word_count,
-                        "char_count": char_count,
-                        "department": None  # グループ情報は現在使用しない
-                    }
-                )
-                data_points.append(data_point)
-            logger.info(f"Generated {len(data_points)} data points")
-            
-            # クラスタ情報を生成
-            logger.info("Generating cluster information...")
-            clusters = {}
-            for cluster_id in range(n_clusters):
-                cluster_points = [dp for dp in data_points if dp.cluster_id == cluster_id]
-                if cluster_points:  # 空でないクラスタのみ追加
-                    clusters[cluster_id] = {
-                        "size": len(cluster_points),
-                        "top_tags": self._get_cluster_top_tags(cluster_points),
-                        "center_x": np.mean([dp.x for dp in cluster_points]),
-                        "center_y": np.mean([dp.y for dp in cluster_points])
-                    }
-            logger.info(f"Generated {len(clusters)} clusters")
-            
-            logger.info("Preparing final result...")
-            return {
-                "data_points": [dp.model_dump() for dp in data_points],
-                "clusters": clusters,
-                "tags": self._get_all_tags(data_points),
-                "statistics": {
-                    "total_responses": len(data_points),
-                    "average_word_count": np.mean([dp.metadata["word_count"] for dp in data_points]),
-                    "average_char_count": np.mean([dp.metadata["char_count"] for dp in data_points]),
-                    "num_clusters": n_clusters
-                },
-                "config": {
-                    "cluster_method": request.cluster_method,
-                    "shape_mask": shape_mask,
-                    "n_clusters": n_clusters,
-                    "hdbscan_params": request.hdbscan_params,
-                    "kmeans_params": request.kmeans_params,
-                    "umap_params": request.umap_params
-                }
-            }
-            logger.info("Analysis completed successfully")
-            
-        except Exception as e:
-            logger.error(f"Analysis failed: {e}", exc_info=True)
-            import traceback
-            error_details = traceback.format_exc()
-            logger.error(f"Full traceback: {error_details}")
-            raise Exception(f"分析中にエラーが発生しました: {str(e)} (詳細: {error_details})")
-
-    def _generate_shape_coordinates(self, num_points: int, shape: str) -> List[Tuple[float, float]]:
-        """指定された図形に基づいて座標を生成"""
-        coordinates = []
-        
-        if shape == 'circle':
-            # 円形配置
-            for i in range(num_points):
-                angle = 2 * np.pi * i / num_points
-                radius = 0.3 + np.random.uniform(-0.1, 0.1)
-                x = 0.5 + radius * np.cos(angle)
-                y = 0.5 + radius * np.sin(angle)
-                coordinates.append((x, y))
-                
-        elif shape == 'square':
-            # 四角形配置
-            side_length = int(np.ceil(np.sqrt(num_points)))
-            for i in range(num_points):
-                row = i // side_length
-                col = i % side_length
-                x = 0.2 + (col / (side_length - 1)) * 0.6 if side_length > 1 else 0.5
-                y = 0.2 + (row / (side_length - 1)) * 0.6 if side_length > 1 else 0.5
-                coordinates.append((x, y))
-                
-        elif shape == 'triangle':
-            # 三角形配置
-            for i in range(num_points):
-                # 三角形の頂点を基準に配置
-                if i % 3 == 0:
-                    x, y = 0.5, 0.8  # 上
-                elif i % 3 == 1:
-                    x, y = 0.2, 0.2  # 左下
-                else:
-                    x, y = 0.8, 0.2  # 右下
-                # 少しランダムにずらす
-                x += np.random.uniform(-0.1, 0.1)
-                y += np.random.uniform(-0.1, 0.1)
-                coordinates.append((x, y))
-                
-        elif shape == 'heart':
-            # ハート形配置
-            for i in range(num_points):
-                t = 2 * np.pi * i / num_points
-                x = 16 * np.sin(t)**3
-                y = 13 * np.cos(t) - 5 * np.cos(2*t) - 2 * np.cos(3*t) - np.cos(4*t)
-                # 正規化して0-1の範囲に
-                x = (x + 16) / 32
-                y = (y + 20) / 40
-                coordinates.append((x, y))
-                
-        elif shape == 'star':
-            # 星形配置
-            for i in range(num_points):
-                angle = 2 * np.pi * i / num_points
-                # 5角星の形状
-                radius = 0.3 + 0.1 * np.sin(5 * angle)
-                x = 0.5 + radius * np.cos(angle)
-                y = 0.5 + radius * np.sin(angle)
-                coordinates.append((x, y))
-                
-        elif shape == 'hexagon':
-            # 六角形配置
-            for i in range(num_points):
-                angle = 2 * np.pi * i / num_points
-                radius = 0.3
-                x = 0.5 + radius * np.cos(angle)
-                y = 0.5 + radius * np.sin(angle)
-                coordinates.append((x, y))
-                
-        else:
-            # デフォルト: ランダム配置
-            for i in range(num_points):
-                x = np.random.uniform(0.1, 0.9)
-                y = np.random.uniform(0.1, 0.9)
-                coordinates.append((x, y))
-        
-        return coordinates
-
-    def _get_all_tags(self, data_points: List[DataPoint]) -> List[str]:
-        """すべてのデータポイントからタグを抽出"""
-        all_tags = set()
-        for dp in data_points:
-            all_tags.update(dp.tags)
-        return list(all_tags)
-
-    def _get_cluster_top_tags(self, cluster_points: List[DataPoint]) -> List[str]:
-        """クラスタの上位タグを取得"""
-        tag_counts = {}
-        for dp in cluster_points:
-            for tag in dp.tags:
-                tag_counts[tag] = tag_counts.get(tag, 0) + 1
-        
-        # 出現回数順でソートして上位5個を返す
-        sorted_tags = sorted(tag_counts.items(), key=lambda x: x[1], reverse=True)
-        return [tag for tag, count in sorted_tags[:5]]
-    
-    def _extract_simple_tags(self, text: str) -> List[str]:
-        """簡単なタグ抽出"""
-        if not text:
-            return []
-        
-        # 基本的なキーワード抽出
-        words = re.findall(r'\b\w+\b', text.lower())
-        # 2文字以上、頻出する単語をタグとして使用
-        word_counts = Counter(words)
-        tags = [word for word, count in word_counts.items() if len(word) > 2 and count > 1]
-        return tags[:5]  # 最大5個のタグ
+from typing import List, Dict, Any, Callable, Optional, Tuple
+import logging
+import hashlib
+import json
+import os
+from pathlib import Path
+from collections import Counter
+
+import numpy as np
+
+from app.models.schemas import (
+    AnalysisRequest, DataPoint, TagRule, ColumnMapping
+)
+from app.models.config import AppConfig
+from app.utils.dataset_store import DatasetStore, DatasetNotFoundError
+from app.utils.dataset_tokens import load_dataset_tokens
+from app.utils.tag_matrix import TagMatrix
+from app.utils.text_utils import get_text_tokenizer, tokenize_regex
+
+logger = logging.getLogger(__name__)
+
+# TF-IDFとKMeansの設定（保存したクラスタリング状態の識別にも使う）
+TFIDF_PARAMS = {"max_features": 100, "stop_words": "english"}
+KMEANS_RANDOM_STATE = 42
+
+DUMMY_TEXTS = [
+    "このサービスはとても使いやすく、機能も充実しています。",
+    "料金が少し高いと感じます。もう少し安くなれば利用したいです。",
+    "サポートが丁寧で、問題がすぐに解決されました。",
+    "機能は良いのですが、もう少しシンプルな操作ができると良いです。",
+    "全体的に満足しています。継続して利用したいと思います。",
+    "レスポンスが早くて助かります。使い勝手も良いです。",
+    "エラーが発生することがあり、改善が必要だと思います。",
+    "デザインが美しく、操作も直感的で使いやすいです。",
+    "料金体系が複雑で分かりにくいです。シンプルにしてほしい。",
+    "カスタマーサポートの対応が素晴らしいです。"
+]
+
+
+class SimpleAnalysisService:
+    """簡素化された分析サービス（重いライブラリなし）"""
+    
+    def __init__(self, dataset_store: Optional[DatasetStore] = None, config: Optional[AppConfig] = None):
+        self.config = config or AppConfig()
+        self.dataset_store = dataset_store
+    
+    def analyze_data(self, request: AnalysisRequest) -> Dict[str, Any]:
+        """データの分析（簡素化版）"""
+        try:
+            logger.info("Starting analysis...")
+            logger.info(f"Request attributes: {dir(request)}")
+            logger.info(f"Request type: {type(request)}")
+            logger.info(f"Request config: {getattr(request, 'config', 'NOT_FOUND')}")
+            logger.info(f"Self config: {self.config}")
+            
+            rows = None
+            if request.dataset_id:
+                texts, ids, groups, rows = self._load_dataset_texts(request.dataset_id, request.column_mapping)
+            else:
+                # データセット未指定時はダミーデータを使用
+                texts = list(DUMMY_TEXTS)
+                ids = [str(i) for i in range(len(texts))]
+                groups = [None] * len(texts)
+            
+            n_clusters = min(5, len(texts) // 3) if len(texts) > 3 else 1
+            logger.info(f"Number of clusters: {n_clusters}")
+            
+            # 保存済みのクラスタリング結果があれば、追加行だけを既存のクラスタに割り当てる
+            cluster_labels = None
+            state_name = None
+            if rows is not None and n_clusters > 1 and self.dataset_store is not None:
+                state_name = self._cluster_state_name(request.column_mapping.text_column, n_clusters)
+                cluster_labels = self._reuse_cluster_labels(request.dataset_id, state_name, texts, rows)
+            
+            if cluster_labels is None:
+                cluster_labels = self._fit_cluster_labels(
+                    texts, n_clusters, request.dataset_id if state_name else None, state_name, rows
+                )
+            
+            # 図形に基づく座標生成
+            logger.info("Generating shape coordinates...")
+            shape_mask = request.shape_mask_path if hasattr(request, 'shape_mask_path') else 'circle'
+            coordinates = self._generate_shape_coordinates(len(texts), shape_mask)
+            logger.info("Shape coordinates generated")
+            
+            # タグ抽出のトークナイザー（リクエストごとに選択できる）
+            tokenizer_mode = request.tokenizer_mode.value if request.tokenizer_mode else self.config.tokenizer_mode
+            tokenize = get_text_tokenizer(tokenizer_mode)
+            logger.info(f"Tokenizer mode: {tokenizer_mode}")
+            
+            # 保存済みのデータセットはトークン列をデータセットに保存して使い回す
+            token_lists = None
+            if rows is not None:
+                token_lists = self._load_token_lists(
+                    request.dataset_id, request.column_mapping.text_column, tokenizer_mode
+                )
+            
+            # 全行のタグを文書×タグの疎行列にまとめる（リストにするのは応答を作る時だけ）
+            if token_lists is None:
+                tag_source = (self._extract_simple_tags(text, tokenize) for text in texts)
+            else:
+                tag_source = (self._tags_from_tokens(token_lists[row]) for row in rows)
+            tag_matrix = TagMatrix.from_tag_lists(tag_source)
+            
+            # データポイントを生成
+            logger.info("Generating data points...")
+            data_points = []
+            for i, text in enumerate(texts):
+                # 基本的なテキスト分析
+                word_count = len(text.split()) if text else 0
+                char_count = len(text) if text else 0
+                
+                # 図形に基づく座標
+                cluster_id = cluster_labels[i]
+                x, y = coordinates[i]
+                
+                data_point = DataPoint(
+                    id=ids[i],
+                    text=text,
+                    x=float(x),
+                    y=float(y),
+                    cluster_id=int(cluster_id),
+                    tags=tag_matrix.row_tags(i),
+                    group=groups[i],
+                    metadata={
+                        "word_count": word_count,
+                        "char_count": char_count,
+                        "department": groups[i]
+                    }
+                )
+                data_points.append(data_point)
+            logger.info(f"Generated {len(data_points)} data points")
+            
+            # クラスタ情報を生成
+            logger.info("Generating cluster information...")
+            clusters = {}
+            labels = np.asarray(cluster_labels)
+            xs = np.array([dp.x for dp in data_points])
+            ys = np.array([dp.y for dp in data_points])
+            # クラスタごとの上位タグはクラスタ指示行列とタグ行列の積から求める
+            top_tags = tag_matrix.top_tags_by_group(labels, 5)
+            for cluster_id in range(n_clusters):
+                members = np.flatnonzero(labels == cluster_id)
+                if len(members):  # 空でないクラスタのみ追加
+                    clusters[cluster_id] = {
+                        "size": len(members),
+                        "top_tags": top_tags[cluster_id],
+                        "center_x": np.mean(xs[members]),
+                        "center_y": np.mean(ys[members])
+                    }
+            logger.info(f"Generated {len(clusters)} clusters")
+            
+            logger.info("Preparing final result...")
+            return {
+                "data_points": [dp.model_dump() for dp in data_points],
+                "clusters": clusters,
+                "tags": tag_matrix.tags_in_use(),
+                "statistics": {
+                    "total_responses": len(data_points),
+                    "average_word_count": np.mean([dp.metadata["word_count"] for dp in data_points]),
+                    "average_char_count": np.mean([dp.metadata["char_count"] for dp in data_points]),
+                    "num_clusters": n_clusters
+                },
+                "config": {
+                    "cluster_method": request.cluster_method,
+                    "shape_mask": shape_mask,
+                    "n_clusters": n_clusters,
+                    "hdbscan_params": request.hdbscan_params,
+                    "kmeans_params": request.kmeans_params,
+                    "umap_params": request.umap_params
+                }
+            }
+            logger.info("Analysis completed successfully")
+            
+        except DatasetNotFoundError:
+            raise
+        except Exception as e:
+            logger.error(f"Analysis failed: {e}", exc_info=True)
+            import traceback
+            error_details = traceback.format_exc()
+            logger.error(f"Full traceback: {error_details}")
+            raise Exception(f"分析中にエラーが発生しました: {str(e)} (詳細: {error_details})")
+
+    def _fit_cluster_labels(
+        self, texts: List[str], n_clusters: int, dataset_id: Optional[str] = None,
+        state_name: Optional[str] = None, rows: Optional[List[int]] = None
+    ) -> List[int]:
+        """全件でTF-IDFとKMeansを計算（dataset_id指定時は差分更新用に状態を保存）"""
+        # 遅延インポートでファイルサイズを削減
+        from sklearn.cluster import KMeans
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        
+        # TF-IDFベクトル化
+        logger.info("Starting TF-IDF vectorization...")
+        vectorizer = TfidfVectorizer(**TFIDF_PARAMS)
+        tfidf_matrix = vectorizer.fit_transform(texts)
+        logger.info("TF-IDF vectorization completed")
+        
+        # クラスタリング（KMeans）
+        logger.info("Starting clustering...")
+        if n_clusters <= 1:
+            logger.info("Clustering completed")
+            return [0] * len(texts)
+        
+        kmeans = KMeans(n_clusters=n_clusters, random_state=KMEANS_RANDOM_STATE)
+        cluster_labels = kmeans.fit_predict(tfidf_matrix)
+        logger.info("Clustering completed")
+        
+        if dataset_id and state_name:
+            self.dataset_store.save_arrays(dataset_id, state_name, {
+                "terms": np.array(vectorizer.get_feature_names_out(), dtype=str),
+                "idf": vectorizer.idf_,
+                "centroids": kmeans.cluster_centers_,
+                "labels": np.asarray(cluster_labels, dtype=np.int64),
+                "rows": np.asarray(rows, dtype=np.int64),
+                "stale_rows": np.array(0, dtype=np.int64)
+            })
+        return cluster_labels.tolist()
+    
+    def _cluster_state_name(self, text_column: str, n_clusters: int) -> str:
+        """クラスタリング状態の保存名（結果に影響する設定ごとに分ける）"""
+        key = json.dumps([text_column, n_clusters, TFIDF_PARAMS, KMEANS_RANDOM_STATE], ensure_ascii=False)
+        return "kmeans-" + hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+    
+    def _reuse_cluster_labels(
+        self, dataset_id: str, state_name: str, texts: List[str], rows: List[int]
+    ) -> Optional[List[int]]:
+        """保存済みのクラスタリング状態からラベルを求める（全件再計算が必要ならNone）
+
+        同じデータセットの状態があればそのラベルを返す。追記元のデータセットの状態しかない場合は、
+        追加行だけを保存済みの語彙・IDFでベクトル化して最も近い重心のクラスタに割り当てる。
+        前回の全件計算以降に差分で割り当てた行の割合が incremental_recluster_ratio を超えたら
+        重心が古くなっているとみなし、全件で再計算する。
+        """
+        state = self.dataset_store.load_arrays(dataset_id, state_name)
+        if state is not None and state["rows"].tolist() == rows:
+            logger.info(f"Reusing stored clustering for dataset {dataset_id}")
+            return state["labels"].tolist()
+        
+        state = self._find_parent_cluster_state(dataset_id, state_name)
+        if state is None:
+            return None
+        
+        base_rows = state["rows"].tolist()
+        n_base = len(base_rows)
+        # 追記のみなので、追記元の行は現在の行の先頭と一致するはず
+        if n_base > len(rows) or rows[:n_base] != base_rows:
+            return None
+        
+        stale_rows = int(state["stale_rows"]) + len(rows) - n_base
+        if stale_rows / len(rows) > self.config.incremental_recluster_ratio:
+            logger.info(f"Dirty ratio {stale_rows}/{len(rows)} exceeds threshold; reclustering all rows")
+            return None
+        
+        from sklearn.metrics import pairwise_distances_argmin
+        
+        new_texts = texts[n_base:]
+        labels = state["labels"]
+        if new_texts:
+            vectors = self._tfidf_transform(new_texts, state["terms"], state["idf"])
+            new_labels = pairwise_distances_argmin(vectors, state["centroids"])
+            labels = np.concatenate([labels, new_labels.astype(np.int64)])
+        logger.info(f"Assigned {len(new_texts)} appended rows to existing clusters")
+        
+        self.dataset_store.save_arrays(dataset_id, state_name, {
+            **state,
+            "labels": labels,
+            "rows": np.asarray(rows, dtype=np.int64),
+            "stale_rows": np.array(stale_rows, dtype=np.int64)
+        })
+        return labels.tolist()
+    
+    def _find_parent_cluster_state(self, dataset_id: str, state_name: str) -> Optional[Dict[str, np.ndarray]]:
+        """追記元をさかのぼって保存済みのクラスタリング状態を探す"""
+        try:
+            manifest = self.dataset_store.get_manifest(dataset_id)
+            while manifest.get("parent_id"):
+                parent_id = manifest["parent_id"]
+                state = self.dataset_store.load_arrays(parent_id, state_name)
+                if state is not None:
+                    return state
+                manifest = self.dataset_store.get_manifest(parent_id)
+        except DatasetNotFoundError:
+            # 追記元が容量制限で削除されている場合は全件で計算する
+            pass
+        return None
+    
+    def _tfidf_transform(self, texts: List[str], terms: np.ndarray, idf: np.ndarray):
+        """保存済みの語彙とIDFでTF-IDFベクトルを計算（TfidfVectorizer.transformと同じ結果）"""
+        from sklearn.feature_extraction.text import CountVectorizer
+        from sklearn.preprocessing import normalize
+        
+        params = {key: value for key, value in TFIDF_PARAMS.items() if key != "max_features"}
+        counts = CountVectorizer(vocabulary=terms.tolist(), **params).transform(texts)
+        return normalize(counts.multiply(idf).tocsr())
+
+    def _load_token_lists(self, dataset_id: str, text_column: str, tokenizer_mode: str):
+        """データセットの本文列のトークン列を取得（保存に失敗した場合はNoneで、テキストごとにトークン化する）"""
+        try:
+            return load_dataset_tokens(
+                self.dataset_store, dataset_id, text_column, tokenizer_mode, workers=self.config.tokenize_workers
+            )
+        except Exception as e:
+            logger.warning(f"Token cache unavailable for {dataset_id}: {e}")
+            return None
+    
+    def _load_dataset_texts(
+        self, dataset_id: str, column_mapping: ColumnMapping
+    ) -> Tuple[List[str], List[str], List[Optional[str]], List[int]]:
+        """保存済みデータセットからマッピングされた列だけを読み込む
+
+        空の本文は除外し、残った行の元の行番号も返す。
+        """
+        if self.dataset_store is None:
+            raise ValueError("データセットストアが設定されていません")
+        
+        columns = [column_mapping.text_column]
+        for column in (column_mapping.id_column, column_mapping.group_column):
+            if column and column not in columns:
+                columns.append(column)
+        table = self.dataset_store.load(dataset_id, columns)
+        logger.info(f"Loaded dataset {dataset_id}: {len(table)} rows, columns={columns}")
+        
+        text_values = table.text_values(column_mapping.text_column)
+        id_values = list(table[column_mapping.id_column]) if column_mapping.id_column else None
+        group_values = list(table[column_mapping.group_column]) if column_mapping.group_column else None
+        
+        texts, ids, groups, rows = [], [], [], []
+        for i, text in enumerate(text_values):
+            text = text.strip()
+            if not text:
+                continue
+            texts.append(text)
+            rows.append(i)
+            row_id = id_values[i] if id_values is not None else None
+            ids.append(str(row_id) if row_id is not None else str(i))
+            group = group_values[i] if group_values is not None else None
+            groups.append(str(group) if group is not None else None)
+        
+        if not texts:
+            raise ValueError(f"本文列にテキストがありません: {column_mapping.text_column}")
+        return texts, ids, groups, rows
+
+    def _generate_shape_coordinates(self, num_points: int, shape: str) -> List[Tuple[float, float]]:
+        """指定された図形に基づいて座標を生成"""
+        coordinates = []
+        
+        if shape == 'circle':
+            # 円形配置
+            for i in range(num_points):
+                angle = 2 * np.pi * i / num_points
+                radius = 0.3 + np.random.uniform(-0.1, 0.1)
+                x = 0.5 + radius * np.cos(angle)
+                y = 0.5 + radius * np.sin(angle)
+                coordinates.append((x, y))
+                
+        elif shape == 'square':
+            # 四角形配置
+            side_length = int(np.ceil(np.sqrt(num_points)))
+            for i in range(num_points):
+                row = i // side_length
+                col = i % side_length
+                x = 0.2 + (col / (side_length - 1)) * 0.6 if side_length > 1 else 0.5
+                y = 0.2 + (row / (side_length - 1)) * 0.6 if side_length > 1 else 0.5
+                coordinates.append((x, y))
+                
+        elif shape == 'triangle':
+            # 三角形配置
+            for i in range(num_points):
+                # 三角形の頂点を基準に配置
+                if i % 3 == 0:
+                    x, y = 0.5, 0.8  # 上
+                elif i % 3 == 1:
+                    x, y = 0.2, 0.2  # 左下
+                else:
+                    x, y = 0.8, 0.2  # 右下
+                # 少しランダムにずらす
+                x += np.random.uniform(-0.1, 0.1)
+                y += np.random.uniform(-0.1, 0.1)
+                coordinates.append((x, y))
+                
+        elif shape == 'heart':
+            # ハート形配置
+            for i in range(num_points):
+                t = 2 * np.pi * i / num_points
+                x = 16 * np.sin(t)**3
+                y = 13 * np.cos(t) - 5 * np.cos(2*t) - 2 * np.cos(3*t) - np.cos(4*t)
+                # 正規化して0-1の範囲に
+                x = (x + 16) / 32
+                y = (y + 20) / 40
+                coordinates.append((x, y))
+                
+        elif shape == 'star':
+            # 星形配置
+            for i in range(num_points):
+                angle = 2 * np.pi * i / num_points
+                # 5角星の形状
+                radius = 0.3 + 0.1 * np.sin(5 * angle)
+                x = 0.5 + radius * np.cos(angle)
+                y = 0.5 + radius * np.sin(angle)
+                coordinates.append((x, y))
+                
+        elif shape == 'hexagon':
+            # 六角形配置
+            for i in range(num_points):
+                angle = 2 * np.pi * i / num_points
+                radius = 0.3
+                x = 0.5 + radius * np.cos(angle)
+                y = 0.5 + radius * np.sin(angle)
+                coordinates.append((x, y))
+                
+        else:
+            # デフォルト: ランダム配置
+            for i in range(num_points):
+                x = np.random.uniform(0.1, 0.9)
+                y = np.random.uniform(0.1, 0.9)
+                coordinates.append((x, y))
+        
+        return coordinates
+
+    def _extract_simple_tags(self, text: str, tokenize: Callable[[str], List[str]] = tokenize_regex) -> List[str]:
+        """簡単なタグ抽出"""
+        if not text:
+            return []
+        
+        # 基本的なキーワード抽出
+        return self._tags_from_tokens(tokenize(text))
+    
+    def _tags_from_tokens(self, words: List[str]) -> List[str]:
+        """トークン列からタグを抽出"""
+        # 2文字以上、頻出する単語をタグとして使用
+        word_counts = Counter(words)
+        tags = [word for word, count in word_counts.items() if len(word) > 2 and count > 1]
+        return tags[:5]  # 最大5個のタグ
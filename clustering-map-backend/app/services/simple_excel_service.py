@@ -1,293 +1,423 @@
-import pandas as pd
-import numpy as np
-from typing import List, Dict, Any, Optional
-import logging
-import json
-import os
-from pathlib import Path
-import re
-from collections import Counter
-
-from app.models.schemas import TagCandidate, TagRule, ColumnMapping
-from app.models.config import AppConfig
-
-logger = logging.getLogger(__name__)
-
-
-class SimpleExcelService:
-    """軽量版Excelファイル処理サービス（重いライブラリなし）"""
-    
-    def __init__(self):
-        self.config = AppConfig()
-    
-    def process_excel_file(self, file_path: str, column_mapping: ColumnMapping) -> Dict[str, Any]:
-        """Excelファイルの処理（軽量版）"""
-        try:
-            # Excelファイルを読み込み
-            df = pd.read_excel(file_path)
-            
-            # 列マッピングに基づいてデータを抽出
-            texts = df[column_mapping.text_column].fillna('').astype(str).tolist()
-            groups = df[column_mapping.group_column].fillna('').astype(str).tolist() if column_mapping.group_column else None
-            ids = df[column_mapping.id_column].fillna('').astype(str).tolist() if column_mapping.id_column else None
-            
-            # 基本的なタグ候補を生成（ルールベース）
-            tag_candidates = self._generate_simple_tags(texts)
-            
-            return {
-                "texts": texts,
-                "groups": groups,
-                "ids": ids,
-                "tag_candidates": tag_candidates,
-                "total_responses": len(texts),
-                "columns": list(df.columns)
-            }
-            
-        except Exception as e:
-            logger.error(f"Excel processing failed: {e}")
-            raise Exception(f"Excelファイルの処理中にエラーが発生しました: {str(e)}")
-    
-    def generate_tag_candidates(self, df: pd.DataFrame) -> List[TagCandidate]:
-        """DataFrameからタグ候補を生成"""
-        try:
-            # テキスト列を自動検出（最初の列または'自由記述'列）
-            text_column = None
-            for col in df.columns:
-                if '自由記述' in str(col) or 'text' in str(col).lower() or 'comment' in str(col).lower():
-                    text_column = col
-                    break
-            
-            if text_column is None:
-                # 最初の列を使用
-                text_column = df.columns[0]
-            
-            logger.info(f"Using text column: {text_column}")
-            
-            # テキストデータを取得
-            texts = df[text_column].fillna('').astype(str).tolist()
-            
-            return self._generate_simple_tags(texts)
-            
-        except Exception as e:
-            logger.error(f"Tag candidate generation failed: {e}")
-            # フォールバック: 空のリストを返す
-            return []
-
-    def _generate_simple_tags(self, texts: List[str]) -> List[TagCandidate]:
-        """ビジネス文脈に沿ったタグ候補を生成"""
-        try:
-            # より具体的なビジネスキーワード辞書
-            business_keywords = {
-                "残業問題": ["残業", "22時", "夜", "遅く", "長時間労働", "過労", "深夜", "夜勤", "時間外"],
-                "ワークライフバランス": ["ワークライフバランス", "プライベート", "家族", "休暇", "休み", "余暇", "生活", "時間"],
-                "連絡・コミュニケーション": ["連絡", "電話", "メール", "夜", "休日", "緊急", "呼び出し", "連絡先"],
-                "チームワーク": ["チーム", "仲間", "同僚", "協力", "助け合い", "連携", "サポート", "支え"],
-                "上司・部下関係": ["上司", "部下", "マネージャー", "リーダー", "管理", "指導", "評価", "フィードバック"],
-                "キャリア成長": ["スキル", "スキルアップ", "研修", "学習", "成長", "経験", "知識", "能力向上"],
-                "昇進・昇格": ["昇進", "昇格", "昇給", "ポジション", "役職", "責任", "権限", "地位"],
-                "給与・待遇": ["給与", "給料", "年収", "ボーナス", "賞与", "手当", "福利厚生", "待遇"],
-                "会社業績": ["業績", "売上", "利益", "成長", "目標", "達成", "成功", "拡大"],
-                "会社文化": ["文化", "風土", "価値観", "理念", "方針", "ルール", "慣習", "雰囲気"],
-                "仕事内容": ["プロジェクト", "タスク", "業務", "作業", "責任", "役割", "成果", "結果"],
-                "職場環境": ["環境", "オフィス", "設備", "スペース", "快適", "使いやすい", "整備", "改善"],
-                "満足・不満": ["満足", "不満", "良い", "悪い", "問題", "改善", "要望", "期待", "希望"]
-            }
-            
-            # テキストからキーワードを抽出（より詳細な分析）
-            all_words = []
-            text_analysis = []
-            
-            for text in texts:
-                if not text or text.strip() == '':
-                    continue
-                
-                # 簡単な前処理
-                words = re.findall(r'\b\w+\b', text.lower())
-                all_words.extend(words)
-                
-                # テキストの特徴を分析
-                text_features = self._analyze_text_features(text)
-                text_analysis.append(text_features)
-            
-            if not all_words:
-                return []
-            
-            # 頻出単語をカウント
-            word_counts = Counter(all_words)
-            
-            # テキスト分析結果を統合
-            combined_analysis = self._combine_text_analysis(text_analysis)
-            
-            # ビジネスカテゴリベースのタグ候補を生成
-            tag_candidates = []
-            
-            # データ分析結果に基づいてタグ候補を生成
-            for category, keywords in business_keywords.items():
-                category_score = 0
-                category_count = 0
-                
-                # キーワードマッチング
-                for keyword in keywords:
-                    if keyword in word_counts:
-                        category_score += word_counts[keyword]
-                        category_count += word_counts[keyword]
-                
-                # データ分析結果からの補強
-                if category in combined_analysis.get('business_summary', {}):
-                    analysis_score = combined_analysis['business_summary'][category]
-                    category_score += analysis_score * 2  # 分析結果を重み付け
-                    category_count += analysis_score
-                
-                if category_count > 0:
-                    # カテゴリ全体のスコア（適切なカテゴリのみ）
-                    if self._is_valid_tag(category):
-                        tag_candidates.append(TagCandidate(
-                            text=category,
-                            score=category_score / len(texts),
-                            category="ビジネスカテゴリ",
-                            count=category_count
-                        ))
-            
-            # 個別の頻出キーワードも追加（ビジネス関連のもののみ）
-            business_related_words = set()
-            for keywords in business_keywords.values():
-                business_related_words.update(keywords)
-            
-            for word, count in word_counts.most_common(30):
-                if (len(word) > 2 and count > 1 and 
-                    (word in business_related_words or 
-                     any(business_word in word for business_word in business_related_words))):
-                    # 不適切なタグをフィルタリング
-                    if self._is_valid_tag(word):
-                        tag_candidates.append(TagCandidate(
-                            text=word,
-                            score=count / len(texts),
-                            category="キーワード",
-                            count=count
-                        ))
-            
-            # スコア順でソート
-            tag_candidates.sort(key=lambda x: x.score, reverse=True)
-            
-            # 上位20個を返す
-            result = tag_candidates[:20]
-            logger.info(f"Generated {len(result)} business-context tag candidates")
-            return result
-            
-        except Exception as e:
-            logger.error(f"Business tag generation failed: {e}")
-            return []
-
-    def _analyze_text_features(self, text: str) -> Dict[str, Any]:
-        """テキストの特徴を分析"""
-        features = {
-            'length': len(text),
-            'word_count': len(text.split()),
-            'sentiment_indicators': {
-                'positive': len(re.findall(r'良い|素晴らしい|最高|満足|気に入り|おすすめ|快適|嬉しい', text)),
-                'negative': len(re.findall(r'悪い|問題|困る|不満|残念|改善|禁止|保てない|難しい', text)),
-                'neutral': 0
-            },
-            'business_indicators': {
-                '残業問題': len(re.findall(r'残業|22時|夜|遅く|長時間労働|過労|深夜|夜勤|時間外', text)),
-                'ワークライフバランス': len(re.findall(r'ワークライフバランス|プライベート|家族|休暇|休み|余暇|生活|時間', text)),
-                '連絡・コミュニケーション': len(re.findall(r'連絡|電話|メール|夜|休日|緊急|呼び出し|連絡先', text)),
-                'チームワーク': len(re.findall(r'チーム|仲間|同僚|協力|助け合い|連携|サポート|支え', text)),
-                '上司・部下関係': len(re.findall(r'上司|部下|マネージャー|リーダー|管理|指導|評価|フィードバック', text)),
-                'キャリア成長': len(re.findall(r'スキル|スキルアップ|研修|学習|成長|経験|知識|能力向上', text)),
-                '昇進・昇格': len(re.findall(r'昇進|昇格|昇給|ポジション|役職|責任|権限|地位', text)),
-                '給与・待遇': len(re.findall(r'給与|給料|年収|ボーナス|賞与|手当|福利厚生|待遇', text)),
-                '会社業績': len(re.findall(r'業績|売上|利益|成長|目標|達成|成功|拡大', text)),
-                '会社文化': len(re.findall(r'文化|風土|価値観|理念|方針|ルール|慣習|雰囲気', text)),
-                '仕事内容': len(re.findall(r'プロジェクト|タスク|業務|作業|責任|役割|成果|結果', text)),
-                '職場環境': len(re.findall(r'環境|オフィス|設備|スペース|快適|使いやすい|整備|改善', text))
-            }
-        }
-        return features
-
-    def _combine_text_analysis(self, text_analyses: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """複数のテキスト分析結果を統合"""
-        if not text_analyses:
-            return {}
-        
-        combined = {
-            'total_texts': len(text_analyses),
-            'avg_length': sum(t['length'] for t in text_analyses) / len(text_analyses),
-            'avg_word_count': sum(t['word_count'] for t in text_analyses) / len(text_analyses),
-            'sentiment_summary': {
-                'positive': sum(t['sentiment_indicators']['positive'] for t in text_analyses),
-                'negative': sum(t['sentiment_indicators']['negative'] for t in text_analyses),
-                'neutral': sum(t['sentiment_indicators']['neutral'] for t in text_analyses)
-            },
-            'business_summary': {
-                '残業問題': sum(t['business_indicators']['残業問題'] for t in text_analyses),
-                'ワークライフバランス': sum(t['business_indicators']['ワークライフバランス'] for t in text_analyses),
-                '連絡・コミュニケーション': sum(t['business_indicators']['連絡・コミュニケーション'] for t in text_analyses),
-                'チームワーク': sum(t['business_indicators']['チームワーク'] for t in text_analyses),
-                '上司・部下関係': sum(t['business_indicators']['上司・部下関係'] for t in text_analyses),
-                'キャリア成長': sum(t['business_indicators']['キャリア成長'] for t in text_analyses),
-                '昇進・昇格': sum(t['business_indicators']['昇進・昇格'] for t in text_analyses),
-                '給与・待遇': sum(t['business_indicators']['給与・待遇'] for t in text_analyses),
-                '会社業績': sum(t['business_indicators']['会社業績'] for t in text_analyses),
-                '会社文化': sum(t['business_indicators']['会社文化'] for t in text_analyses),
-                '仕事内容': sum(t['business_indicators']['仕事内容'] for t in text_analyses),
-                '職場環境': sum(t['business_indicators']['職場環境'] for t in text_analyses)
-            }
-        }
-        return combined
-
-    def _is_valid_tag(self, tag: str) -> bool:
-        """タグが適切かどうかを判定"""
-        # 長すぎるタグを除外（10文字以上）
-        if len(tag) > 10:
-            return False
-        
-        # 不適切なパターンを除外
-        invalid_patterns = [
-            r'^[0-9]+$',  # 数字のみ
-            r'^[a-zA-Z]+$',  # 英字のみ
-            r'です$',  # 敬語で終わる
-            r'ます$',  # 敬語で終わる
-            r'ください$',  # 依頼で終わる
-            r'いただきたい$',  # 依頼で終わる
-            r'ですが$',  # 逆接で終わる
-            r'ので$',  # 理由で終わる
-            r'が$',  # 助詞で終わる
-            r'を$',  # 助詞で終わる
-            r'に$',  # 助詞で終わる
-            r'で$',  # 助詞で終わる
-            r'と$',  # 助詞で終わる
-            r'から$',  # 助詞で終わる
-            r'まで$',  # 助詞で終わる
-        ]
-        
-        for pattern in invalid_patterns:
-            if re.search(pattern, tag):
-                return False
-        
-        return True
-    
-    def get_tag_rules(self) -> List[Dict[str, Any]]:
-        """タグルールを取得"""
-        try:
-            rules_path = os.path.join(self.config.data_dir, "tags", "tag_rules.json")
-            if os.path.exists(rules_path):
-                with open(rules_path, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            return []
-        except Exception as e:
-            logger.error(f"Tag rules loading failed: {e}")
-            return []
-
-    def update_tag_rules(self, rules: List[TagRule]) -> bool:
-        """タグルールの更新"""
-        try:
-            rules_data = [rule.model_dump() for rule in rules]
-            rules_path = os.path.join(self.config.data_dir, "tags", "tag_rules.json")
-            os.makedirs(os.path.dirname(rules_path), exist_ok=True)
-            with open(rules_path, 'w', encoding='utf-8') as f:
-                json.dump(rules_data, f, ensure_ascii=False, indent=2)
-            return True
-        except Exception as e:
-            logger.error(f"Tag rules update failed: {e}")
-            return False
+import numpy as np
+from typing import List, Dict, Any, Optional, Sequence, Iterable
+import logging
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+import re
+from collections import Counter
+
+from app.models.schemas import TagCandidate, TagRule, ColumnMapping
+from app.models.config import AppConfig
+from app.utils.file_utils import read_excel_file
+from app.utils.keyword_matcher import KeywordMatcher
+from app.utils.table_utils import ColumnarTable
+from app.utils.tag_rules import TagRuleStore
+from app.utils.text_utils import get_text_tokenizer
+
+logger = logging.getLogger(__name__)
+
+# より具体的なビジネスキーワード辞書（タグルールにビジネスカテゴリがない場合の既定値）
+BUSINESS_KEYWORDS = {
+    "残業問題": ["残業", "22時", "夜", "遅く", "長時間労働", "過労", "深夜", "夜勤", "時間外"],
+    "ワークライフバランス": ["ワークライフバランス", "プライベート", "家族", "休暇", "休み", "余暇", "生活", "時間"],
+    "連絡・コミュニケーション": ["連絡", "電話", "メール", "夜", "休日", "緊急", "呼び出し", "連絡先"],
+    "チームワーク": ["チーム", "仲間", "同僚", "協力", "助け合い", "連携", "サポート", "支え"],
+    "上司・部下関係": ["上司", "部下", "マネージャー", "リーダー", "管理", "指導", "評価", "フィードバック"],
+    "キャリア成長": ["スキル", "スキルアップ", "研修", "学習", "成長", "経験", "知識", "能力向上"],
+    "昇進・昇格": ["昇進", "昇格", "昇給", "ポジション", "役職", "責任", "権限", "地位"],
+    "給与・待遇": ["給与", "給料", "年収", "ボーナス", "賞与", "手当", "福利厚生", "待遇"],
+    "会社業績": ["業績", "売上", "利益", "成長", "目標", "達成", "成功", "拡大"],
+    "会社文化": ["文化", "風土", "価値観", "理念", "方針", "ルール", "慣習", "雰囲気"],
+    "仕事内容": ["プロジェクト", "タスク", "業務", "作業", "責任", "役割", "成果", "結果"],
+    "職場環境": ["環境", "オフィス", "設備", "スペース", "快適", "使いやすい", "整備", "改善"],
+    "満足・不満": ["満足", "不満", "良い", "悪い", "問題", "改善", "要望", "期待", "希望"]
+}
+
+# 感情の指標に使うキーワード
+SENTIMENT_POSITIVE = "positive"
+SENTIMENT_NEGATIVE = "negative"
+SENTIMENT_KEYWORDS = {
+    SENTIMENT_POSITIVE: ["良い", "素晴らしい", "最高", "満足", "気に入り", "おすすめ", "快適", "嬉しい"],
+    SENTIMENT_NEGATIVE: ["悪い", "問題", "困る", "不満", "残念", "改善", "禁止", "保てない", "難しい"]
+}
+
+# タグルールのうちビジネスカテゴリとして扱うもののカテゴリ名（キー=カテゴリ名、同義語=キーワード）
+BUSINESS_CATEGORY = "ビジネスカテゴリ"
+
+# テキスト分析では数えず、単語の出現回数だけで評価するカテゴリ
+WORD_COUNT_ONLY_CATEGORIES = {"満足・不満"}
+
+
+class CategoryIndex:
+    """ビジネスカテゴリ辞書をコンパイルしたもの（作成後は変更せず、辞書が変わったら作り直す）"""
+
+    def __init__(self, categories: Dict[str, List[str]], rules_version: Any = None):
+        overlap = set(categories) & set(SENTIMENT_KEYWORDS)
+        if overlap:
+            logger.error(f"Business categories overlap sentiment indicators: {overlap}")
+            raise ValueError(f"感情の指標と同じ名前のカテゴリは登録できません: {sorted(overlap)}")
+
+        self.categories = categories
+        self.rules_version = rules_version
+        self.version = hashlib.sha1(json.dumps(categories, ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+        # テキスト分析でカテゴリ別の出現回数を数えるカテゴリ
+        self.indicator_categories = [c for c in categories if c not in WORD_COUNT_ONLY_CATEGORIES]
+        # ビジネスキーワードと感情のキーワードをまとめて1回の走査で数える
+        self.matcher = KeywordMatcher({**categories, **SENTIMENT_KEYWORDS})
+        self.business_matcher = KeywordMatcher(categories)
+
+    @staticmethod
+    def categories_from_rules(rules: List[Dict[str, Any]]) -> Dict[str, List[str]]:
+        """タグルールからビジネスカテゴリ辞書を作成（該当するルールがなければ既定の辞書）"""
+        categories = {
+            rule["key"]: list(rule.get("synonyms", []))
+            for rule in rules if rule.get("category") == BUSINESS_CATEGORY
+        }
+        return categories or BUSINESS_KEYWORDS
+
+
+class TagStatsAccumulator:
+    """タグ候補の集計値を1行ずつ更新する集計器
+
+    保持するのは単語の出現回数（語彙数に比例）とカテゴリ別の出現回数（固定長）だけなので、
+    行数が増えてもメモリは増えない。並列に集計した部分結果は merge で合算できる。
+    """
+
+    def __init__(self, category_index: CategoryIndex, tokenizer_mode: str):
+        self.category_index = category_index
+        self.tokenizer_mode = tokenizer_mode
+        self.n_texts = 0
+        self.n_analyzed = 0
+        self.word_counts: Counter = Counter()
+        self.category_counts = [0] * len(category_index.matcher.categories)
+
+    def add(self, text: Optional[str], words: Iterable[str]) -> None:
+        """1行分のテキストとそのトークン列を集計に加える"""
+        self.n_texts += 1
+        if not text or text.strip() == '':
+            return
+        self.n_analyzed += 1
+        self.word_counts.update(words)
+        self.category_index.matcher.count(text, self.category_counts)
+
+    def merge(self, other: "TagStatsAccumulator") -> "TagStatsAccumulator":
+        """後続の行の部分結果を合算（self の行の後に other の行が続く場合と同じ結果になる）"""
+        if other.category_index.version != self.category_index.version or other.tokenizer_mode != self.tokenizer_mode:
+            logger.error("Cannot merge tag stats built with different categories or tokenizers")
+            raise ValueError("異なるカテゴリ辞書またはトークナイザーで集計した結果は合算できません")
+        self.n_texts += other.n_texts
+        self.n_analyzed += other.n_analyzed
+        self.word_counts.update(other.word_counts)
+        self.category_counts = [a + b for a, b in zip(self.category_counts, other.category_counts)]
+        return self
+
+    def to_stats(self) -> Dict[str, Any]:
+        """集計値（merge_tag_stats・tag_candidates_from_stats の入力）を作成"""
+        business_summary = Counter()
+        if self.n_analyzed:
+            category_totals = dict(zip(self.category_index.matcher.categories, self.category_counts))
+            business_summary = Counter({
+                category: category_totals[category] for category in self.category_index.indicator_categories
+            })
+        return {
+            "tokenizer_mode": self.tokenizer_mode,
+            "categories_version": self.category_index.version,
+            "n_texts": self.n_texts,
+            "word_counts": self.word_counts,
+            "business_summary": business_summary
+        }
+
+
+class SimpleExcelService:
+    """軽量版Excelファイル処理サービス（重いライブラリなし）"""
+    
+    def __init__(self, config: Optional[AppConfig] = None):
+        self.config = config or AppConfig()
+        self.tag_rule_store = TagRuleStore(os.path.join(self.config.data_dir, "tags", "tag_rules.json"))
+        self._category_index: Optional[CategoryIndex] = None
+        self._category_index_lock = threading.Lock()
+    
+    def get_category_index(self) -> CategoryIndex:
+        """現在のタグルールのビジネスカテゴリ辞書を返す（タグルールのファイルが変わった時だけ作り直す）"""
+        try:
+            rules, rules_version = self.tag_rule_store.load()
+        except Exception as e:
+            logger.error(f"Tag rules loading failed: {e}")
+            rules, rules_version = [], None
+        
+        index = self._category_index
+        if index is not None and index.rules_version == rules_version:
+            return index
+        
+        with self._category_index_lock:
+            index = self._category_index
+            if index is None or index.rules_version != rules_version:
+                try:
+                    index = CategoryIndex(CategoryIndex.categories_from_rules(rules), rules_version)
+                except ValueError as e:
+                    logger.error(f"Invalid business categories in tag rules, using defaults: {e}")
+                    index = CategoryIndex(BUSINESS_KEYWORDS, rules_version)
+                # 作成し終えた辞書に差し替える（処理中の集計は古い辞書のまま終わる）
+                self._category_index = index
+            return index
+    
+    def process_excel_file(self, file_path: str, column_mapping: ColumnMapping) -> Dict[str, Any]:
+        """Excelファイルの処理（軽量版）"""
+        try:
+            # Excelファイルを読み込み
+            df = read_excel_file(file_path)
+            
+            # 列マッピングに基づいてデータを抽出
+            texts = df.text_values(column_mapping.text_column)
+            groups = df.text_values(column_mapping.group_column) if column_mapping.group_column else None
+            ids = df.text_values(column_mapping.id_column) if column_mapping.id_column else None
+            
+            # 基本的なタグ候補を生成（ルールベース）
+            tag_candidates = self._generate_simple_tags(texts)
+            
+            return {
+                "texts": texts,
+                "groups": groups,
+                "ids": ids,
+                "tag_candidates": tag_candidates,
+                "total_responses": len(texts),
+                "columns": list(df.columns)
+            }
+            
+        except Exception as e:
+            logger.error(f"Excel processing failed: {e}")
+            raise Exception(f"Excelファイルの処理中にエラーが発生しました: {str(e)}")
+    
+    def detect_text_column(self, df: ColumnarTable) -> Any:
+        """テキスト列を自動検出（最初の列または'自由記述'列）"""
+        for col in df.columns:
+            if '自由記述' in str(col) or 'text' in str(col).lower() or 'comment' in str(col).lower():
+                return col
+        # 最初の列を使用
+        return df.columns[0]
+    
+    def generate_tag_candidates(self, df: ColumnarTable, tokenizer_mode: Optional[str] = None) -> List[TagCandidate]:
+        """テーブルからタグ候補を生成"""
+        try:
+            return self.tag_candidates_from_stats(self.generate_tag_stats(df, tokenizer_mode=tokenizer_mode))
+            
+        except Exception as e:
+            logger.error(f"Tag candidate generation failed: {e}")
+            # フォールバック: 空のリストを返す
+            return []
+    
+    def generate_tag_stats(
+        self,
+        df: ColumnarTable,
+        text_column: Optional[Any] = None,
+        tokenizer_mode: Optional[str] = None,
+        token_lists: Optional[Sequence[List[str]]] = None
+    ) -> Dict[str, Any]:
+        """テーブルからタグ候補の集計値を計算（text_column省略時は自動検出）
+
+        token_lists には保存済みのトークン列（df の行と1対1、tokenizer_mode で作成したもの）を渡せる。
+        """
+        if text_column is None:
+            text_column = self.detect_text_column(df)
+        logger.info(f"Using text column: {text_column}")
+        
+        # テキストデータを1行ずつ集計する
+        texts = df.iter_text_values(text_column)
+        stats = self._collect_tag_stats(texts, tokenizer_mode, token_lists)
+        stats["text_column"] = text_column
+        return stats
+    
+    def tag_candidates_from_stats(self, stats: Dict[str, Any]) -> List[TagCandidate]:
+        """集計値からタグ候補を生成"""
+        try:
+            return self._build_tag_candidates(stats)
+        except Exception as e:
+            logger.error(f"Business tag generation failed: {e}")
+            return []
+    
+    @staticmethod
+    def merge_tag_stats(base: Dict[str, Any], extra: Dict[str, Any]) -> Dict[str, Any]:
+        """2つの集計値を合算（base の行の後に extra の行が続く場合と同じ結果になる）"""
+        # Counterは最初に出現した順を保つので、全件で集計した場合と同じ順序になる
+        word_counts = Counter(base["word_counts"])
+        word_counts.update(extra["word_counts"])
+        business_summary = Counter(base["business_summary"])
+        business_summary.update(extra["business_summary"])
+        return {
+            "text_column": base.get("text_column"),
+            "tokenizer_mode": base.get("tokenizer_mode", "regex"),
+            "categories_version": base.get("categories_version"),
+            "n_texts": base["n_texts"] + extra["n_texts"],
+            "word_counts": word_counts,
+            "business_summary": business_summary
+        }
+
+    def _generate_simple_tags(self, texts: List[str], tokenizer_mode: Optional[str] = None) -> List[TagCandidate]:
+        """ビジネス文脈に沿ったタグ候補を生成"""
+        try:
+            return self._build_tag_candidates(self._collect_tag_stats(texts, tokenizer_mode))
+            
+        except Exception as e:
+            logger.error(f"Business tag generation failed: {e}")
+            return []
+    
+    def _collect_tag_stats(
+        self,
+        texts: Iterable[str],
+        tokenizer_mode: Optional[str] = None,
+        token_lists: Optional[Iterable[List[str]]] = None
+    ) -> Dict[str, Any]:
+        """タグ候補の集計値（テキスト数・単語の出現回数・カテゴリ別の出現回数）を計算
+
+        texts（と token_lists）はジェネレーターでもよく、1行ずつ集計するのでリストを作らない。
+        集計値は行ごとの値の和なので、追加された行の分だけを計算して merge_tag_stats で合算できる
+        （同じトークナイザーで集計した場合のみ）。
+        """
+        accumulator = self.new_tag_stats_accumulator(tokenizer_mode)
+        if token_lists is not None:
+            # トークン化済みならそれを使う
+            for text, words in zip(texts, token_lists):
+                accumulator.add(text, words)
+        else:
+            tokenize = get_text_tokenizer(accumulator.tokenizer_mode)
+            for text in texts:
+                accumulator.add(text, tokenize(text) if text and text.strip() != '' else ())
+        return accumulator.to_stats()
+    
+    def new_tag_stats_accumulator(self, tokenizer_mode: Optional[str] = None) -> TagStatsAccumulator:
+        """現在のカテゴリ辞書で空の集計器を作成（並列に集計する場合はワーカーごとに作って merge する）"""
+        return TagStatsAccumulator(self.get_category_index(), tokenizer_mode or self.config.tokenizer_mode)
+    
+    def _build_tag_candidates(self, stats: Dict[str, Any]) -> List[TagCandidate]:
+        """集計値からビジネスカテゴリとキーワードのタグ候補を作成"""
+        # 頻出単語をカウント
+        word_counts = Counter(stats["word_counts"])
+        if not word_counts:
+            return []
+        
+        n_texts = stats["n_texts"]
+        business_summary = stats["business_summary"]
+        
+        # ビジネスカテゴリベースのタグ候補を生成
+        tag_candidates = []
+        
+        # データ分析結果に基づいてタグ候補を生成
+        category_index = self.get_category_index()
+        for category, keywords in category_index.categories.items():
+            category_score = 0
+            category_count = 0
+            
+            # キーワードマッチング
+            for keyword in keywords:
+                if keyword in word_counts:
+                    category_score += word_counts[keyword]
+                    category_count += word_counts[keyword]
+            
+            # データ分析結果からの補強
+            if category in business_summary:
+                analysis_score = business_summary[category]
+                category_score += analysis_score * 2  # 分析結果を重み付け
+                category_count += analysis_score
+            
+            if category_count > 0:
+                # カテゴリ全体のスコア（適切なカテゴリのみ）
+                if self._is_valid_tag(category):
+                    tag_candidates.append(TagCandidate(
+                        text=category,
+                        score=category_score / n_texts,
+                        category="ビジネスカテゴリ",
+                        count=category_count
+                    ))
+        
+        # 個別の頻出キーワードも追加（ビジネス関連のもの＝ビジネスキーワードを含むもののみ）
+        for word, count in word_counts.most_common(30):
+            if len(word) > 2 and count > 1 and category_index.business_matcher.contains_any(word):
+                # 不適切なタグをフィルタリング
+                if self._is_valid_tag(word):
+                    tag_candidates.append(TagCandidate(
+                        text=word,
+                        score=count / n_texts,
+                        category="キーワード",
+                        count=count
+                    ))
+        
+        # スコア順でソート
+        tag_candidates.sort(key=lambda x: x.score, reverse=True)
+        
+        # 上位20個を返す
+        result = tag_candidates[:20]
+        logger.info(f"Generated {len(result)} business-context tag candidates")
+        return result
+
+    def _analyze_text_features(self, text: str) -> Dict[str, Any]:
+        """テキストの特徴を分析"""
+        category_index = self.get_category_index()
+        counts = dict(zip(category_index.matcher.categories, category_index.matcher.count(text)))
+        features = {
+            'length': len(text),
+            'word_count': len(text.split()),
+            'sentiment_indicators': {
+                'positive': counts[SENTIMENT_POSITIVE],
+                'negative': counts[SENTIMENT_NEGATIVE],
+                'neutral': 0
+            },
+            'business_indicators': {category: counts[category] for category in category_index.indicator_categories}
+        }
+        return features
+
+    def _is_valid_tag(self, tag: str) -> bool:
+        """タグが適切かどうかを判定"""
+        # 長すぎるタグを除外（10文字以上）
+        if len(tag) > 10:
+            return False
+        
+        # 不適切なパターンを除外
+        invalid_patterns = [
+            r'^[0-9]+$',  # 数字のみ
+            r'^[a-zA-Z]+$',  # 英字のみ
+            r'です$',  # 敬語で終わる
+            r'ます$',  # 敬語で終わる
+            r'ください$',  # 依頼で終わる
+            r'いただきたい$',  # 依頼で終わる
+            r'ですが$',  # 逆接で終わる
+            r'ので$',  # 理由で終わる
+            r'が$',  # 助詞で終わる
+            r'を$',  # 助詞で終わる
+            r'に$',  # 助詞で終わる
+            r'で$',  # 助詞で終わる
+            r'と$',  # 助詞で終わる
+            r'から$',  # 助詞で終わる
+            r'まで$',  # 助詞で終わる
+        ]
+        
+        for pattern in invalid_patterns:
+            if re.search(pattern, tag):
+                return False
+        
+        return True
+    
+    def get_tag_rules(self) -> List[Dict[str, Any]]:
+        """タグルールを取得（ファイルが変わっていなければメモリから返す）"""
+        try:
+            return self.tag_rule_store.get_rules()
+        except Exception as e:
+            logger.error(f"Tag rules loading failed: {e}")
+            return []
+
+    def update_tag_rules(self, rules: List[TagRule]) -> bool:
+        """タグルールの更新（ビジネスカテゴリ辞書も作り直す）"""
+        try:
+            rules_data = [rule.model_dump() for rule in rules]
+            # 書き込む前に辞書を作成しておき、不正なルールは保存しない
+            index = CategoryIndex(CategoryIndex.categories_from_rules(rules_data))
+            with self._category_index_lock:
+                self.tag_rule_store.save(rules_data)
+                index.rules_version = self.tag_rule_store.load()[1]
+                self._category_index = index
+            return True
+        except Exception as e:
+            logger.error(f"Tag rules update failed: {e}")
+            return False
@@ -1 +1 @@
-# Tests for the application
+# Tests for the application
@@ -0,0 +1,278 @@
+import pytest
+import tempfile
+import hashlib
+import json
+import os
+from datetime import datetime
+from app.utils.dataset_store import (
+    DatasetStore, DatasetNotFoundError, MappedNumericColumn, MappedStringColumn, MappedTokenLists, UploadCache,
+    ITER_BLOCK_ROWS
+)
+from app.utils.table_utils import ColumnarTable
+
+
+DATASET_ID = hashlib.sha256(b"test").hexdigest()
+
+
+def _make_table() -> ColumnarTable:
+    return ColumnarTable.from_columns(
+        ['id', '自由記述', 'score', '部署', '回答日'],
+        [
+            [1, 2, 3, 4],
+            ['残業が多いです。', None, '', '改善してほしい'],
+            [0.5, None, 1.5, 2.0],
+            ['営業', '開発', '営業', None],
+            [datetime(2024, 4, 1), None, 'ー', 3],
+        ]
+    )
+
+
+class TestDatasetStore:
+    """データセットストアのテスト"""
+
+    def test_save_and_load(self):
+        """保存したテーブルを同じ値で読み戻せるかのテスト"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            store = DatasetStore(temp_dir)
+            table = _make_table()
+
+            assert not store.exists(DATASET_ID)
+            store.save(DATASET_ID, table, "test.xlsx")
+            assert store.exists(DATASET_ID)
+
+            loaded = store.load(DATASET_ID)
+            assert loaded.columns == table.columns
+            assert loaded.to_dict('list')['id'] == [1, 2, 3, 4]
+            assert loaded.to_dict('list')['自由記述'] == ['残業が多いです。', None, '', '改善してほしい']
+            assert loaded.to_dict('list')['score'] == [0.5, None, 1.5, 2.0]
+            assert loaded.to_dict('list')['部署'] == ['営業', '開発', '営業', None]
+            # 型の混在した列は文字列として保存される
+            assert loaded.to_dict('list')['回答日'] == ['2024-04-01 00:00:00', None, 'ー', '3']
+
+            manifest = store.get_manifest(DATASET_ID)
+            assert manifest["num_rows"] == 4
+            assert manifest["source_name"] == "test.xlsx"
+            assert [entry["kind"] for entry in manifest["columns"]] == [
+                "int64", "string", "float64", "string", "text"
+            ]
+
+    def test_load_selected_columns(self):
+        """指定した列だけがメモリマップされるかのテスト"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            store = DatasetStore(temp_dir)
+            store.save(DATASET_ID, _make_table())
+
+            loaded = store.load(DATASET_ID, ['自由記述', 'id'])
+            assert loaded.columns == ['自由記述', 'id']
+            assert isinstance(loaded['自由記述'], MappedStringColumn)
+            assert isinstance(loaded['id'], MappedNumericColumn)
+            assert loaded['id'].to_numpy().tolist() == [1, 2, 3, 4]
+            assert loaded['自由記述'][-1] == '改善してほしい'
+            assert loaded['自由記述'][1:3] == [None, '']
+            assert loaded.text_values('自由記述') == ['残業が多いです。', '', '', '改善してほしい']
+            assert len(loaded.dropna(['自由記述'])) == 3
+
+            with pytest.raises(ValueError):
+                store.load(DATASET_ID, ['nonexistent'])
+
+    def test_save_is_idempotent(self):
+        """同じIDの再保存で既存データを上書きしないかのテスト"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            store = DatasetStore(temp_dir)
+            store.save(DATASET_ID, _make_table())
+            store.save(DATASET_ID, ColumnarTable.from_columns(['x'], [[1]]))
+
+            assert store.load(DATASET_ID).columns == _make_table().columns
+            assert len(store.list_datasets()) == 1
+
+    def test_empty_table(self):
+        """0行のテーブルの保存テスト"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            store = DatasetStore(temp_dir)
+            store.save(DATASET_ID, ColumnarTable.from_columns(['id', 'text'], [[], []]))
+
+            loaded = store.load(DATASET_ID)
+            assert len(loaded) == 0
+            assert loaded.to_dict('records') == []
+
+    def test_token_lists(self):
+        """行ごとのトークン列の保存とメモリマップでの読み込みテスト"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            store = DatasetStore(temp_dir)
+            store.save(DATASET_ID, _make_table())
+            token_lists = [['残業', '多い', '残業'], [], ['改善'], ['多い']]
+
+            assert store.load_token_lists(DATASET_ID, "tokens-test") is None
+            store.save_token_lists(DATASET_ID, "tokens-test", token_lists)
+            loaded = store.load_token_lists(DATASET_ID, "tokens-test")
+
+            assert isinstance(loaded, MappedTokenLists)
+            assert list(loaded) == token_lists
+            assert loaded[0] == ['残業', '多い', '残業']
+            assert loaded[1:3] == [[], ['改善']]
+            assert loaded.vocabulary == ['残業', '多い', '改善']
+            assert loaded.row_ids(-1).tolist() == [1]
+
+            # 接頭辞の一致する付随ファイルの削除（keep で始まるものは残す）
+            store.save_token_lists(DATASET_ID, "tokens-old", [[]])
+            assert store.delete_side_files(DATASET_ID, "tokens-", keep="tokens-test") == 3
+            assert store.load_token_lists(DATASET_ID, "tokens-old") is None
+            assert store.load_token_lists(DATASET_ID, "tokens-test") is not None
+
+    def test_missing_and_invalid_ids(self):
+        """存在しないIDと不正なIDのテスト"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            store = DatasetStore(temp_dir)
+
+            with pytest.raises(DatasetNotFoundError):
+                store.load(DATASET_ID)
+            with pytest.raises(ValueError):
+                store.load("../../etc/passwd")
+            assert not store.exists("../../etc/passwd")
+            assert not store.delete(DATASET_ID)
+
+    @pytest.mark.parametrize("rows, decodes_parent", [
+        # 同じ型の追加、欠損の追加
+        (ColumnarTable.from_columns(
+            ['id', '自由記述', 'score', '部署', '回答日'],
+            [[5, 6], ['深夜の連絡', None], [3.0, None], ['総務', '人事'], ['ー', None]]
+        ), False),
+        # 整数の列に小数、文字列の列に日時、列の一部だけ
+        (ColumnarTable.from_columns(['id', '自由記述'], [[7.5], [datetime(2024, 5, 1)]]), False),
+        # 数値の列に文字列、文字列の列に数値（追記元の値を読み直す）
+        (ColumnarTable.from_columns(['score', '部署'], [['高い', None], [1, 2]]), True),
+        (ColumnarTable.from_columns(['id'], [[]]), False),
+    ])
+    def test_append(self, rows, decodes_parent, monkeypatch):
+        """追記の結果が全行を並べて保存した場合と同じ値・型になるかのテスト"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            store = DatasetStore(temp_dir)
+            parent = _make_table()
+            store.save(DATASET_ID, parent)
+            expected = ColumnarTable.from_columns(parent.columns, [
+                list(parent[name]) + (list(rows[name]) if name in rows else [None] * len(rows))
+                for name in parent.columns
+            ])
+            expected_id = hashlib.sha256(b"expected").hexdigest()
+            store.save(expected_id, expected)
+
+            # 型の変わらない列は追記元の値を読まずにファイルのままコピーする
+            decoded = []
+            original = MappedStringColumn.__iter__
+            monkeypatch.setattr(MappedStringColumn, "__iter__", lambda column: decoded.append(1) or original(column))
+            appended_id = hashlib.sha256(b"appended").hexdigest()
+            store.append(DATASET_ID, appended_id, rows)
+            monkeypatch.undo()
+
+            assert store.load(appended_id).to_dict('list') == store.load(expected_id).to_dict('list')
+            manifest = store.get_manifest(appended_id)
+            assert [(entry["kind"], entry["nullable"]) for entry in manifest["columns"]] == [
+                (entry["kind"], entry["nullable"]) for entry in store.get_manifest(expected_id)["columns"]
+            ]
+            assert manifest["dirty_from"] == len(parent)
+            assert manifest["num_rows"] == len(parent) + len(rows)
+            assert bool(decoded) == decodes_parent
+            with pytest.raises(ValueError):
+                store.append(DATASET_ID, expected_id, ColumnarTable.from_columns(['unknown'], [[1]]))
+
+
+def _artifacts(table: ColumnarTable) -> dict:
+    return {
+        "num_rows": len(table),
+        "columns": list(table.columns),
+        "sample_data": table.head(2).to_dict('records'),
+        "tag_candidates": [{"text": "残業", "score": 1.0, "category": None, "count": 1}]
+    }
+
+
+class TestUploadCache:
+    """アップロード結果キャッシュのテスト"""
+
+    def test_hit_after_put(self):
+        """保存した結果がメモリとディスクから取得できるかのテスト"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            store = DatasetStore(temp_dir)
+            cache = UploadCache(store, max_memory_bytes=1024 * 1024, max_disk_bytes=1024 * 1024)
+            table = _make_table()
+
+            assert cache.get(DATASET_ID) is None
+            stored = cache.put(DATASET_ID, table, _artifacts(table), "test.xlsx")
+            # 日時はJSONと同じISO形式に揃う
+            assert stored["sample_data"][0]["回答日"] == "2024-04-01T00:00:00"
+            assert cache.get(DATASET_ID) == stored
+
+            # プロセス再起動後はディスクから読み込む
+            restarted = UploadCache(DatasetStore(temp_dir), 1024 * 1024, 1024 * 1024)
+            assert restarted.get(DATASET_ID) == stored
+            assert restarted.stats()["entries"] == 1
+            assert cache.stats()["hits"] == 1
+            assert cache.stats()["misses"] == 1
+
+    def test_memory_budget(self):
+        """メモリ上限を超えたら古い結果から外れるかのテスト"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            store = DatasetStore(temp_dir)
+            table = _make_table()
+            size = len(json.dumps(_artifacts(table), ensure_ascii=False, default=str).encode("utf-8"))
+            cache = UploadCache(store, max_memory_bytes=size * 2 + 10, max_disk_bytes=1024 * 1024)
+
+            ids = [hashlib.sha256(str(i).encode()).hexdigest() for i in range(3)]
+            for dataset_id in ids:
+                cache.put(dataset_id, table, _artifacts(table))
+
+            assert cache.stats()["entries"] == 2
+            # メモリから外れてもディスクからは取得できる
+            assert cache.get(ids[0]) is not None
+
+    def test_disk_budget(self):
+        """ディスク上限を超えたら最終アクセスの古いデータセットから削除されるかのテスト"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            store = DatasetStore(temp_dir)
+            table = _make_table()
+            ids = [hashlib.sha256(str(i).encode()).hexdigest() for i in range(3)]
+
+            cache = UploadCache(store, max_memory_bytes=1024 * 1024, max_disk_bytes=1024 * 1024)
+            cache.put(ids[0], table, _artifacts(table))
+            per_dataset = store.disk_usage()
+            cache.max_disk_bytes = per_dataset * 2
+
+            cache.put(ids[1], table, _artifacts(table))
+            os.utime(os.path.join(temp_dir, ids[0], "manifest.json"), (0, 0))
+            os.utime(os.path.join(temp_dir, ids[1], "manifest.json"), (1, 1))
+            cache.put(ids[2], table, _artifacts(table))
+
+            assert not store.exists(ids[0])
+            assert store.exists(ids[1]) and store.exists(ids[2])
+            assert cache.get(ids[0]) is None
+            assert store.disk_usage() <= per_dataset * 2
+
+    def test_update(self):
+        """派生データの一部を書き換えるテスト"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            store = DatasetStore(temp_dir)
+            cache = UploadCache(store, max_memory_bytes=1024 * 1024, max_disk_bytes=1024 * 1024)
+            table = _make_table()
+
+            cache.put(DATASET_ID, table, {**_artifacts(table), "tag_status": "pending"})
+            updated = cache.update(DATASET_ID, {"tag_status": "completed", "tag_candidates": []})
+            assert updated["tag_status"] == "completed"
+            assert updated["columns"] == list(table.columns)
+            assert cache.get(DATASET_ID) == updated
+            assert UploadCache(DatasetStore(temp_dir), 1024 * 1024, 1024 * 1024).get(DATASET_ID) == updated
+
+            with pytest.raises(DatasetNotFoundError):
+                cache.update(hashlib.sha256(b"missing").hexdigest(), {"tag_status": "completed"})
+
+    def test_token_lists_view_and_blocked_iteration(self):
+        """トークン列の範囲の取得と、ブロックごとの反復が行をまたいでも正しいかのテスト"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            store = DatasetStore(temp_dir)
+            store.save(DATASET_ID, _make_table())
+            token_lists = [[f'語{i % 7}'] * (i % 3) for i in range(ITER_BLOCK_ROWS * 2 + 5)]
+            store.save_token_lists(DATASET_ID, "tokens-test", token_lists)
+            loaded = store.load_token_lists(DATASET_ID, "tokens-test")
+
+            assert list(loaded) == token_lists
+            assert list(loaded.view(ITER_BLOCK_ROWS - 1)) == token_lists[ITER_BLOCK_ROWS - 1:]
+            assert list(loaded.view(3, 10)) == token_lists[3:10]
+            assert len(loaded.view(len(token_lists))) == 0
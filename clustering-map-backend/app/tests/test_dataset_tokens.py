@@ -0,0 +1,92 @@
+import pytest
+import tempfile
+import hashlib
+from app.utils import text_utils
+from app.utils.dataset_store import DatasetStore
+from app.utils.dataset_tokens import load_dataset_tokens, token_cache_name
+from app.utils.table_utils import ColumnarTable
+
+
+TEXTS = ['残業が多い。残業を減らしたい', None, '休暇が取りにくい', 'Work life balance']
+
+
+def _dataset_id(name: str) -> str:
+    return hashlib.sha256(name.encode()).hexdigest()
+
+
+class TestDatasetTokens:
+    """データセットごとのトークン列キャッシュのテスト"""
+
+    def _make_store(self, temp_dir: str) -> DatasetStore:
+        store = DatasetStore(temp_dir)
+        store.save(_dataset_id("base"), ColumnarTable.from_columns(['id', 'text'], [[1, 2, 3, 4], TEXTS]))
+        return store
+
+    @pytest.mark.parametrize("mode", ["regex", "fast", "sudachi"])
+    def test_same_tokens_as_tokenizer(self, mode):
+        """保存したトークン列がトークナイザーの結果と一致するかのテスト"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            store = self._make_store(temp_dir)
+            tokenize = text_utils.get_text_tokenizer(mode)
+
+            token_lists = load_dataset_tokens(store, _dataset_id("base"), 'text', mode)
+            assert list(token_lists) == [tokenize(text or '') for text in TEXTS]
+
+    def test_reuse_saved_tokens(self, monkeypatch):
+        """2回目以降は保存済みのトークン列を読み込むかのテスト"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            store = self._make_store(temp_dir)
+            expected = list(load_dataset_tokens(store, _dataset_id("base"), 'text', 'fast'))
+
+            def fail(*args, **kwargs):
+                raise AssertionError("トークン化し直している")
+
+            monkeypatch.setattr("app.utils.dataset_tokens.tokenize_texts", fail)
+            assert list(load_dataset_tokens(store, _dataset_id("base"), 'text', 'fast')) == expected
+
+    def test_invalidated_when_stop_words_change(self, monkeypatch):
+        """ストップワードが変わると作り直し、古いトークン列を削除するかのテスト"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            store = self._make_store(temp_dir)
+            dataset_id = _dataset_id("base")
+            old_name = token_cache_name('text', 'sudachi')
+            before = load_dataset_tokens(store, dataset_id, 'text', 'sudachi')
+            assert '残業' in before[0]
+
+            monkeypatch.setattr(text_utils, "STOP_WORDS", text_utils.STOP_WORDS | {'残業'})
+            text_utils.token_cache.clear()
+            assert token_cache_name('text', 'sudachi') != old_name
+
+            after = load_dataset_tokens(store, dataset_id, 'text', 'sudachi')
+            assert '残業' not in after[0]
+            assert store.load_token_lists(dataset_id, old_name) is None
+            text_utils.token_cache.clear()
+
+    def test_modes_and_columns_are_separate(self):
+        """トークナイザーや列が違えば別のトークン列になるかのテスト"""
+        assert token_cache_name('text', 'fast') != token_cache_name('text', 'regex')
+        assert token_cache_name('text', 'fast') != token_cache_name('id', 'fast')
+        with pytest.raises(ValueError):
+            token_cache_name('text', 'unknown')
+
+    def test_appended_rows_only(self, monkeypatch):
+        """追記されたデータセットは追記元のトークン列を使い、追加行だけをトークン化するかのテスト"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            store = self._make_store(temp_dir)
+            parent_tokens = list(load_dataset_tokens(store, _dataset_id("base"), 'text', 'fast'))
+
+            child_id = _dataset_id("child")
+            store.append(_dataset_id("base"), child_id, ColumnarTable.from_columns(['text'], [['深夜の連絡が多い']]))
+
+            tokenized = []
+            original = text_utils.tokenize_texts
+
+            def record(texts, *args, **kwargs):
+                tokenized.extend(texts)
+                return original(texts, *args, **kwargs)
+
+            monkeypatch.setattr("app.utils.dataset_tokens.tokenize_texts", record)
+            token_lists = load_dataset_tokens(store, child_id, 'text', 'fast')
+
+            assert tokenized == ['深夜の連絡が多い']
+            assert list(token_lists) == parent_tokens + [text_utils.tokenize_fast('深夜の連絡が多い')]
@@ -0,0 +1,109 @@
+import pytest
+import tempfile
+import hashlib
+import numpy as np
+from app.utils.embedding_cache import EmbeddingCache
+
+
+MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+class _FakeEncoder:
+    """テキストのハッシュから作る決定的な埋め込み（計算したテキストを記録）"""
+
+    def __init__(self, dim: int = 8):
+        self.dim = dim
+        self.encoded = []
+
+    def __call__(self, texts):
+        self.encoded.extend(texts)
+        return np.array([
+            np.frombuffer(hashlib.sha256(text.encode()).digest()[:self.dim], dtype=np.uint8) / 255.0
+            for text in texts
+        ], dtype=np.float32).reshape(len(texts), self.dim)
+
+
+class TestEmbeddingCache:
+    """埋め込みベクトルのディスクキャッシュのテスト"""
+
+    def test_only_misses_are_encoded(self):
+        """キャッシュにないテキストだけ計算し、結果が直接計算した値と一致するかのテスト"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cache = EmbeddingCache(temp_dir, MODEL, dtype="float32")
+            encoder = _FakeEncoder()
+
+            first = cache.get_or_compute(['残業が多い', '休暇', '残業が多い'], encoder)
+            # 正規化で同じになるテキストはヒットする
+            second = cache.get_or_compute(['休暇', '　残業が多い ', '給与'], encoder)
+
+            assert encoder.encoded == ['残業が多い', '休暇', '給与']
+            assert first.dtype == np.float32 and first.shape == (3, 8)
+            np.testing.assert_array_equal(first, encoder(['残業が多い', '休暇', '残業が多い']))
+            np.testing.assert_array_equal(second[:2], first[[1, 0]])
+            stats = cache.stats()
+            assert (stats["hits"], stats["misses"], stats["entries"]) == (2, 4, 3)
+
+    def test_persistence(self):
+        """別のインスタンス（再起動後）から保存した埋め込みを読めるか、モデルごとに分かれるかのテスト"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            encoder = _FakeEncoder()
+            expected = EmbeddingCache(temp_dir, MODEL).get_or_compute(['a', 'b'], encoder)
+
+            reloaded = EmbeddingCache(temp_dir, MODEL)
+            np.testing.assert_array_equal(reloaded.get_or_compute(['b', 'a'], encoder), expected[[1, 0]])
+            assert encoder.encoded == ['a', 'b']
+
+            EmbeddingCache(temp_dir, "other-model").get_or_compute(['a'], encoder)
+            assert encoder.encoded == ['a', 'b', 'a']
+
+    def test_lru_eviction(self):
+        """上限を超えると最も長く使われていないものから追い出すかのテスト"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cache = EmbeddingCache(temp_dir, MODEL, max_entries=2)
+            encoder = _FakeEncoder()
+
+            cache.get_or_compute(['a', 'b'], encoder)
+            cache.get_or_compute(['a'], encoder)
+            cache.get_or_compute(['c'], encoder)
+            encoder.encoded.clear()
+            cache.get_or_compute(['a', 'c', 'b'], encoder)
+
+            assert encoder.encoded == ['b']
+            assert cache.stats()["evictions"] == 2
+            assert cache.stats()["entries"] == 2
+
+    def test_shared_between_instances(self):
+        """同じディレクトリを共有する別のインスタンス（ワーカー）が追い出した枠を古いキーで読まないかのテスト"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            encoder = _FakeEncoder()
+            first = EmbeddingCache(temp_dir, MODEL, max_entries=2, dtype="float32")
+            second = EmbeddingCache(temp_dir, MODEL, max_entries=2, dtype="float32")
+            expected = encoder(['x', 'y', 'z'])
+
+            first.get_or_compute(['x', 'y'], encoder)
+            np.testing.assert_array_equal(second.get_or_compute(['y'], encoder), expected[[1]])
+            # x が最も古いので、z で x の枠が再利用される
+            first.get_or_compute(['z'], encoder)
+            encoder.encoded.clear()
+
+            np.testing.assert_array_equal(second.get_or_compute(['x', 'z'], encoder), expected[[0, 2]])
+            assert encoder.encoded == ['x']
+            assert second.stats()["entries"] == 2
+
+    def test_float16_storage(self):
+        """float16で保存しても、キャッシュの有無で同じ値を返すかのテスト"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            encoder = _FakeEncoder()
+            first = EmbeddingCache(temp_dir, MODEL).get_or_compute(['a', 'b'], encoder)
+            second = EmbeddingCache(temp_dir, MODEL).get_or_compute(['a', 'b'], encoder)
+
+            assert first.dtype == np.float32
+            np.testing.assert_array_equal(first, second)
+            np.testing.assert_allclose(first, encoder(['a', 'b']), atol=1e-3)
+
+    def test_invalid_settings(self):
+        """不正な型・上限のテスト"""
+        with pytest.raises(ValueError):
+            EmbeddingCache("/tmp", MODEL, dtype="int8")
+        with pytest.raises(ValueError):
+            EmbeddingCache("/tmp", MODEL, max_entries=0)
@@ -1,121 +1,247 @@
-import pytest
-import pandas as pd
-import tempfile
-import os
-from app.utils.file_utils import (
-    read_excel_file, validate_excel_columns, get_sample_data,
-    save_results, load_results, is_valid_excel_file
-)
-
-
-class TestFileUtils:
-    """ファイル処理ユーティリティのテスト"""
-    
-    def test_read_excel_file(self):
-        """Excelファイル読み込みのテスト"""
-        # テスト用のDataFrameを作成
-        test_data = {
-            'id': [1, 2, 3],
-            'text': ['テスト1', 'テスト2', 'テスト3'],
-            'category': ['A', 'B', 'A']
-        }
-        df = pd.DataFrame(test_data)
-        
-        # 一時ファイルに保存
-        with tempfile.NamedTemporaryFile(suffix='.xlsx', delete=False) as tmp:
-            df.to_excel(tmp.name, index=False, engine='openpyxl')
-            tmp_path = tmp.name
-        
-        try:
-            # ファイルを読み込み
-            result_df = read_excel_file(tmp_path)
-            
-            # 結果を検証
-            assert len(result_df) == 3
-            assert list(result_df.columns) == ['id', 'text', 'category']
-            assert result_df.iloc[0]['text'] == 'テスト1'
-        finally:
-            # 一時ファイルを削除
-            os.unlink(tmp_path)
-    
-    def test_validate_excel_columns(self):
-        """Excel列検証のテスト"""
-        df = pd.DataFrame({
-            'id': [1, 2, 3],
-            'text': ['テスト1', 'テスト2', 'テスト3'],
-            'category': ['A', 'B', 'A']
-        })
-        
-        # 正常なケース
-        assert validate_excel_columns(df, ['id', 'text']) == True
-        
-        # 存在しない列があるケース
-        with pytest.raises(ValueError):
-            validate_excel_columns(df, ['id', 'nonexistent'])
-    
-    def test_get_sample_data(self):
-        """サンプルデータ取得のテスト"""
-        df = pd.DataFrame({
-            'id': [1, 2, 3, 4, 5, 6],
-            'text': ['テスト1', 'テスト2', 'テスト3', 'テスト4', 'テスト5', 'テスト6']
-        })
-        
-        # デフォルト（5行）
-        sample = get_sample_data(df)
-        assert len(sample) == 5
-        
-        # 指定した行数
-        sample = get_sample_data(df, 3)
-        assert len(sample) == 3
-        
-        # データフレームより多い行数を指定
-        sample = get_sample_data(df, 10)
-        assert len(sample) == 6  # 全行が返される
-    
-    def test_save_and_load_results(self):
-        """結果保存・読み込みのテスト"""
-        test_data = {
-            'data_points': [
-                {'id': 1, 'x': 0.1, 'y': 0.2, 'text': 'テスト1'},
-                {'id': 2, 'x': 0.3, 'y': 0.4, 'text': 'テスト2'}
-            ],
-            'clusters': {0: {'size': 2, 'center_x': 0.2, 'center_y': 0.3}},
-            'tags': ['テスト', 'サンプル']
-        }
-        
-        with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as tmp:
-            tmp_path = tmp.name
-        
-        try:
-            # 結果を保存
-            save_results(test_data, tmp_path)
-            
-            # ファイルが作成されたことを確認
-            assert os.path.exists(tmp_path)
-            
-            # 結果を読み込み
-            loaded_data = load_results(tmp_path)
-            
-            # データが正しく保存・読み込みされたことを確認
-            assert loaded_data['data_points'] == test_data['data_points']
-            assert loaded_data['clusters'] == test_data['clusters']
-            assert loaded_data['tags'] == test_data['tags']
-        finally:
-            # 一時ファイルを削除
-            if os.path.exists(tmp_path):
-                os.unlink(tmp_path)
-    
-    def test_is_valid_excel_file(self):
-        """Excelファイル形式検証のテスト"""
-        # 有効な拡張子
-        assert is_valid_excel_file('test.xlsx') == True
-        assert is_valid_excel_file('test.xls') == True
-        
-        # 無効な拡張子
-        assert is_valid_excel_file('test.txt') == False
-        assert is_valid_excel_file('test.csv') == False
-        assert is_valid_excel_file('test') == False
-        
-        # 大文字小文字の区別
-        assert is_valid_excel_file('test.XLSX') == True
-        assert is_valid_excel_file('test.XLS') == True
+import pytest
+import pandas as pd
+import tempfile
+import os
+import asyncio
+import hashlib
+import io
+from app.utils.file_utils import (
+    read_excel_file, validate_excel_columns, get_sample_data,
+    save_results, load_results, is_valid_excel_file,
+    digest_upload, FileTooLargeError,
+    read_data_file, is_supported_data_file, RowLimitExceededError
+)
+
+
+class _AsyncReader:
+    """UploadFile互換の非同期リーダー（テスト用）"""
+
+    def __init__(self, content: bytes):
+        self._buffer = io.BytesIO(content)
+        self.read_sizes = []
+
+    @property
+    def file(self) -> io.BytesIO:
+        return self._buffer
+
+    async def read(self, size: int = -1) -> bytes:
+        self.read_sizes.append(size)
+        return self._buffer.read(size)
+
+    async def seek(self, offset: int) -> None:
+        self._buffer.seek(offset)
+
+
+class TestFileUtils:
+    """ファイル処理ユーティリティのテスト"""
+    
+    def test_read_excel_file(self):
+        """Excelファイル読み込みのテスト"""
+        # テスト用のDataFrameを作成
+        test_data = {
+            'id': [1, 2, 3],
+            'text': ['テスト1', 'テスト2', 'テスト3'],
+            'category': ['A', 'B', 'A']
+        }
+        df = pd.DataFrame(test_data)
+        
+        # 一時ファイルに保存
+        with tempfile.NamedTemporaryFile(suffix='.xlsx', delete=False) as tmp:
+            df.to_excel(tmp.name, index=False, engine='openpyxl')
+            tmp_path = tmp.name
+        
+        try:
+            # ファイルを読み込み
+            result_df = read_excel_file(tmp_path)
+            
+            # 結果を検証
+            assert len(result_df) == 3
+            assert list(result_df.columns) == ['id', 'text', 'category']
+            assert result_df.iloc[0]['text'] == 'テスト1'
+        finally:
+            # 一時ファイルを削除
+            os.unlink(tmp_path)
+    
+    def test_validate_excel_columns(self):
+        """Excel列検証のテスト"""
+        df = pd.DataFrame({
+            'id': [1, 2, 3],
+            'text': ['テスト1', 'テスト2', 'テスト3'],
+            'category': ['A', 'B', 'A']
+        })
+        
+        # 正常なケース
+        assert validate_excel_columns(df, ['id', 'text']) == True
+        
+        # 存在しない列があるケース
+        with pytest.raises(ValueError):
+            validate_excel_columns(df, ['id', 'nonexistent'])
+    
+    def test_get_sample_data(self):
+        """サンプルデータ取得のテスト"""
+        df = pd.DataFrame({
+            'id': [1, 2, 3, 4, 5, 6],
+            'text': ['テスト1', 'テスト2', 'テスト3', 'テスト4', 'テスト5', 'テスト6']
+        })
+        
+        # デフォルト（5行）
+        sample = get_sample_data(df)
+        assert len(sample) == 5
+        
+        # 指定した行数
+        sample = get_sample_data(df, 3)
+        assert len(sample) == 3
+        
+        # データフレームより多い行数を指定
+        sample = get_sample_data(df, 10)
+        assert len(sample) == 6  # 全行が返される
+    
+    def test_save_and_load_results(self):
+        """結果保存・読み込みのテスト"""
+        test_data = {
+            'data_points': [
+                {'id': 1, 'x': 0.1, 'y': 0.2, 'text': 'テスト1'},
+                {'id': 2, 'x': 0.3, 'y': 0.4, 'text': 'テスト2'}
+            ],
+            'clusters': {0: {'size': 2, 'center_x': 0.2, 'center_y': 0.3}},
+            'tags': ['テスト', 'サンプル']
+        }
+        
+        with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as tmp:
+            tmp_path = tmp.name
+        
+        try:
+            # 結果を保存
+            save_results(test_data, tmp_path)
+            
+            # ファイルが作成されたことを確認
+            assert os.path.exists(tmp_path)
+            
+            # 結果を読み込み
+            loaded_data = load_results(tmp_path)
+            
+            # データが正しく保存・読み込みされたことを確認
+            assert loaded_data['data_points'] == test_data['data_points']
+            assert loaded_data['clusters'] == test_data['clusters']
+            assert loaded_data['tags'] == test_data['tags']
+        finally:
+            # 一時ファイルを削除
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+    
+    def test_is_valid_excel_file(self):
+        """Excelファイル形式検証のテスト"""
+        # 有効な拡張子
+        assert is_valid_excel_file('test.xlsx') == True
+        assert is_valid_excel_file('test.xls') == True
+        
+        # 無効な拡張子
+        assert is_valid_excel_file('test.txt') == False
+        assert is_valid_excel_file('test.csv') == False
+        assert is_valid_excel_file('test') == False
+        
+        # 大文字小文字の区別
+        assert is_valid_excel_file('test.XLSX') == True
+        assert is_valid_excel_file('test.XLS') == True
+    
+    def test_digest_upload(self):
+        """チャンク単位のハッシュ計算のテスト"""
+        content = os.urandom(10_000)
+        reader = _AsyncReader(content)
+        
+        size, content_hash = asyncio.run(digest_upload(reader, max_size=20_000, chunk_size=1024))
+        
+        assert size == len(content)
+        assert content_hash == hashlib.sha256(content).hexdigest()
+        assert all(read_size == 1024 for read_size in reader.read_sizes)
+        # 読み終えたら先頭に戻り、そのまま読み込みに使える
+        assert reader.file.read() == content
+    
+    def test_digest_upload_too_large(self):
+        """サイズ上限超過時の中断テスト"""
+        reader = _AsyncReader(b'x' * 10_000)
+        
+        with pytest.raises(FileTooLargeError):
+            asyncio.run(digest_upload(reader, max_size=4096, chunk_size=1024))
+        
+        # 上限を超えた時点で読み込みを止める
+        assert len(reader.read_sizes) == 5
+    
+    @pytest.mark.parametrize("engine", ["openpyxl", "native"])
+    def test_read_data_file_from_memory(self, engine):
+        """bytesとファイルオブジェクトからの読み込みテスト"""
+        buffer = io.BytesIO()
+        pd.DataFrame({'id': [1, 2], 'text': ['テスト1', 'テスト2']}).to_excel(buffer, index=False)
+        content = buffer.getvalue()
+        
+        from_bytes = read_data_file(content, engine=engine, file_name='test.xlsx')
+        assert from_bytes.to_dict('list') == {'id': [1, 2], 'text': ['テスト1', 'テスト2']}
+        
+        # 読み込み位置に関係なく先頭から読み、ファイルオブジェクトは閉じない
+        buffer.seek(10)
+        from_file = read_data_file(buffer, engine=engine, file_name='test.xlsx')
+        assert from_file.to_dict('list') == from_bytes.to_dict('list')
+        assert not buffer.closed
+        
+        csv_buffer = io.BytesIO('id,自由記述\n1,満足しています\n'.encode('cp932'))
+        table = read_data_file(csv_buffer, file_name='test.csv')
+        assert table.to_dict('records') == [{'id': '1', '自由記述': '満足しています'}]
+        assert not csv_buffer.closed
+        
+        with pytest.raises(ValueError):
+            read_data_file(content)
+    
+    def test_is_supported_data_file(self):
+        """アップロード可能な形式の判定テスト"""
+        assert is_supported_data_file('test.xlsx') == True
+        assert is_supported_data_file('test.CSV') == True
+        assert is_supported_data_file('test.tsv') == True
+        assert is_supported_data_file('test.parquet') == True
+        assert is_supported_data_file('test.txt') == False
+    
+    def test_read_csv_file(self):
+        """CSV/TSV読み込みのテスト"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            csv_path = os.path.join(temp_dir, 'test.csv')
+            with open(csv_path, 'w', encoding='utf-8-sig', newline='') as f:
+                f.write('id,自由記述,\n1,"残業が多い,改善してほしい",A\n\n2,,B\n')
+            
+            df = read_data_file(csv_path)
+            assert df.columns == ['id', '自由記述', 'Column_3']
+            assert len(df) == 2
+            assert df.iloc[0]['自由記述'] == '残業が多い,改善してほしい'
+            assert df.iloc[1]['自由記述'] is None
+            
+            # Shift_JIS（cp932）で保存されたTSV
+            tsv_path = os.path.join(temp_dir, 'test.tsv')
+            with open(tsv_path, 'w', encoding='cp932', newline='') as f:
+                f.write('id\t自由記述\n1\t満足しています\n')
+            
+            df = read_data_file(tsv_path)
+            assert df.to_dict('records') == [{'id': '1', '自由記述': '満足しています'}]
+    
+    def test_read_data_file_row_limit(self):
+        """行数上限での打ち切りテスト"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            csv_path = os.path.join(temp_dir, 'test.csv')
+            with open(csv_path, 'w', encoding='utf-8', newline='') as f:
+                f.write('text\n' + 'テスト\n' * 10)
+            
+            assert len(read_data_file(csv_path, max_rows=10)) == 10
+            with pytest.raises(RowLimitExceededError):
+                read_data_file(csv_path, max_rows=9)
+    
+    def test_read_parquet_file(self):
+        """Parquet読み込みのテスト"""
+        pytest.importorskip('pyarrow')
+        df = pd.DataFrame({'id': [1, 2, 3], 'text': ['テスト1', None, 'テスト3']})
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            parquet_path = os.path.join(temp_dir, 'test.parquet')
+            df.to_parquet(parquet_path, index=False)
+            
+            result = read_data_file(parquet_path)
+            assert result.to_dict('list') == {'id': [1, 2, 3], 'text': ['テスト1', None, 'テスト3']}
+            
+            with pytest.raises(RowLimitExceededError):
+                read_data_file(parquet_path, max_rows=2)
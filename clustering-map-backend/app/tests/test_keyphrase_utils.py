@@ -0,0 +1,74 @@
+import pytest
+import hashlib
+import numpy as np
+from app.utils.keyphrase_utils import embed_in_batches, extract_keywords_batched, mmr_select
+
+
+TEXTS = [
+    'overtime work late at night is a problem for work life balance',
+    'the team is supportive and colleagues help each other',
+    'training programs help career growth and skill development',
+    'salary and bonus are satisfying',
+    'late night contact from the manager is a problem',
+    '',
+]
+
+
+class _HashEmbedder:
+    """文字の2-gramをハッシュした決定的な埋め込み（呼び出し回数を記録）"""
+
+    def __init__(self, dim: int = 64):
+        self.dim = dim
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(len(texts))
+        embeddings = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            padded = f" {text} "
+            for i in range(len(padded) - 1):
+                digest = hashlib.md5(padded[i:i + 2].encode()).digest()
+                embeddings[row, digest[0] % self.dim] += 1.0 if digest[1] % 2 else -1.0
+        return embeddings
+
+
+class TestKeyphraseUtils:
+    """KeyBERT互換の一括キーワード抽出のテスト"""
+
+    def test_batched_matches_per_text(self):
+        """一括抽出の結果がテキストごとに抽出した結果と一致するかのテスト"""
+        batched = extract_keywords_batched(TEXTS, _HashEmbedder(), batch_size=4)
+        per_text = [extract_keywords_batched([text], _HashEmbedder())[0] for text in TEXTS]
+
+        assert batched == per_text
+        assert all(len(keywords) == 5 for keywords in batched[:-1])
+        assert batched[-1] == []
+
+    def test_embedding_calls_are_batched(self):
+        """埋め込みの計算が文書と候補語の和集合のバッチ数だけ呼ばれるかのテスト"""
+        embedder = _HashEmbedder()
+        extract_keywords_batched(TEXTS * 20, embedder, keyphrase_ngram_range=(1, 2), batch_size=32)
+
+        n_texts = len(TEXTS) * 20
+        n_candidates = sum(embedder.calls) - n_texts
+        # 同じ候補語は1回だけ埋め込む
+        assert n_candidates < sum(len(text.split()) * 2 for text in TEXTS)
+        assert len(embedder.calls) == -(-n_texts // 32) + -(-n_candidates // 32)
+
+    def test_mmr_select(self):
+        """MMRの選択（diversity=0 なら文書との類似度順、重複した候補は後回し）のテスト"""
+        doc = np.array([1.0, 0.0], dtype=np.float32)
+        candidates = embed_in_batches(lambda texts: np.array(texts, dtype=np.float32), [
+            [1.0, 0.1], [1.0, 0.1], [0.6, 0.8], [0.0, 1.0]
+        ])
+
+        assert mmr_select(doc, candidates, top_k=3, diversity=0.0) == [0, 1, 2]
+        assert mmr_select(doc, candidates, top_k=3, diversity=0.9) == [0, 3, 2]
+        assert mmr_select(doc, candidates[:0], top_k=3) == []
+
+    def test_no_candidates(self):
+        """候補語がない場合と不正なバッチサイズのテスト"""
+        assert extract_keywords_batched([], _HashEmbedder()) == []
+        assert extract_keywords_batched(['a', ''], _HashEmbedder()) == [[], []]
+        with pytest.raises(ValueError):
+            embed_in_batches(_HashEmbedder(), ['text'], batch_size=0)
@@ -0,0 +1,59 @@
+import pytest
+import random
+import re
+from app.services.simple_excel_service import BUSINESS_KEYWORDS, SENTIMENT_KEYWORDS, CategoryIndex
+from app.utils.keyword_matcher import KeywordMatcher
+
+
+CATEGORIES = {**BUSINESS_KEYWORDS, **SENTIMENT_KEYWORDS}
+KEYWORD_MATCHER = CategoryIndex(BUSINESS_KEYWORDS).matcher
+
+
+def _findall_counts(text: str) -> list:
+    """カテゴリごとのキーワードの正規表現（従来の実装）での件数"""
+    return [len(re.findall('|'.join(keywords), text)) for keywords in CATEGORIES.values()]
+
+
+class TestKeywordMatcher:
+    """複数カテゴリのキーワードマッチャーのテスト"""
+
+    def test_same_counts_as_findall(self):
+        """カテゴリ別の件数が正規表現の re.findall と一致するかのテスト"""
+        rng = random.Random(0)
+        pieces = [keyword for keywords in CATEGORIES.values() for keyword in keywords]
+        pieces += list('あいうえお夜時間外') + ['連絡先', 'スキルアップ', 'ワーク', '22時22時']
+        texts = [''.join(rng.choice(pieces) for _ in range(rng.randint(0, 20))) for _ in range(2000)]
+        texts.append('22時以降の残業を禁止にして欲しいです。夜に連絡がくるのでワークライフバランスが保てません。')
+
+        for text in texts:
+            assert KEYWORD_MATCHER.count(text) == _findall_counts(text)
+
+    def test_overlapping_keywords(self):
+        """同じ位置で先に書かれたキーワードを採用し、重なる出現は数えないかのテスト"""
+        matcher = KeywordMatcher({'a': ['ab', 'abc'], 'b': ['bc', 'abcd'], 'c': ['aa']})
+
+        assert matcher.count('abcd') == [1, 1, 0]
+        assert matcher.count('aaa') == [0, 0, 1]
+        assert matcher.count('') == [0, 0, 0]
+
+    def test_count_matrix(self):
+        """文書×カテゴリの行列が各文書の件数を並べたものになるかのテスト"""
+        texts = ['残業と深夜の連絡', '', 'チームの協力に満足']
+        matrix = KEYWORD_MATCHER.count_matrix(texts)
+
+        assert matrix.shape == (len(texts), len(CATEGORIES))
+        assert matrix.tolist() == [_findall_counts(text) for text in texts]
+        assert KEYWORD_MATCHER.count_matrix([]).shape == (0, len(CATEGORIES))
+
+    def test_contains_any(self):
+        """キーワードを含むかの判定のテスト"""
+        matcher = KeywordMatcher(BUSINESS_KEYWORDS)
+
+        assert matcher.contains_any('残業代')
+        assert matcher.contains_any('チームワーク')
+        assert not matcher.contains_any('りんご')
+
+    def test_empty_keyword(self):
+        """空のキーワードがエラーになるかのテスト"""
+        with pytest.raises(ValueError):
+            KeywordMatcher({'a': ['']})
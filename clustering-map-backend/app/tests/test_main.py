@@ -0,0 +1,49 @@
+import pytest
+import tempfile
+from fastapi.testclient import TestClient
+from app import main
+from app.utils.dataset_store import DatasetStore, UploadCache
+
+
+TSV_CONTENT = "text\tscore\n残業が多い\t1\n休暇が取りにくい\t2\n".encode("utf-8")
+
+
+class TestUploadEndpoints:
+    """アップロードAPIのテスト"""
+
+    @pytest.fixture
+    def client(self, monkeypatch):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            store = DatasetStore(temp_dir)
+            monkeypatch.setattr(main, "dataset_store", store)
+            monkeypatch.setattr(main, "upload_cache", UploadCache(store, 64 * 1024 * 1024, 1024 * 1024 * 1024))
+            yield TestClient(main.app)
+
+    def _upload(self, client, file_name: str, content: bytes = TSV_CONTENT) -> dict:
+        response = client.post("/upload", files={"file": (file_name, content)})
+        assert response.status_code == 200
+        return response.json()
+
+    def test_same_bytes_with_different_format(self, client):
+        """同じバイト列を .csv と .tsv でアップロードすると、それぞれの形式で解析されるかのテスト"""
+        as_csv = self._upload(client, "a.csv")
+        as_tsv = self._upload(client, "a.tsv")
+
+        assert as_csv["columns"] == ["text\tscore"]
+        assert as_tsv["columns"] == ["text", "score"]
+        assert as_csv["dataset_id"] != as_tsv["dataset_id"]
+        # 同じ形式での再アップロードは保存済みの結果を返す
+        assert self._upload(client, "b.tsv")["dataset_id"] == as_tsv["dataset_id"]
+
+    def test_append_with_different_format(self, client):
+        """同じ追加分でも形式が違えば別の追記結果になるかのテスト"""
+        dataset_id = self._upload(client, "a.tsv")["dataset_id"]
+        rows = "text\tscore\n給与に満足\t3\n".encode("utf-8")
+
+        as_tsv = client.post(f"/datasets/{dataset_id}/append", files={"file": ("b.tsv", rows)})
+        as_csv = client.post(f"/datasets/{dataset_id}/append", files={"file": ("b.csv", rows)})
+
+        assert as_tsv.status_code == 200
+        assert main.dataset_store.get_manifest(as_tsv.json()["dataset_id"])["num_rows"] == 3
+        # CSVとして読むと列が一致しないので追記できない（TSVの結果が返らない）
+        assert as_csv.status_code == 400
@@ -0,0 +1,100 @@
+import pytest
+import sys
+import threading
+import time
+import types
+from app.utils.model_registry import KEYBERT_MODEL, SENTENCE_MODEL, ModelRegistry, estimate_model_bytes
+
+
+class _FakeTensor:
+    def __init__(self, numel: int, element_size: int = 4):
+        self._numel = numel
+        self._element_size = element_size
+
+    def numel(self):
+        return self._numel
+
+    def element_size(self):
+        return self._element_size
+
+
+class _FakeModel:
+    """torch のモジュールと同じく parameters() / buffers() を持つモデル"""
+
+    def __init__(self, name: str = "model"):
+        self.name = name
+
+    def parameters(self):
+        return [_FakeTensor(1000), _FakeTensor(24, 2)]
+
+    def buffers(self):
+        return [_FakeTensor(10)]
+
+
+class _FakeKeyBERT:
+    def __init__(self, model=None):
+        self.model = model
+
+
+class TestModelRegistry:
+    """プロセス内で共有するモデルの登録簿のテスト"""
+
+    def test_load_once(self):
+        """同時に取得しても1回だけ読み込むかのテスト"""
+        registry = ModelRegistry()
+        calls = []
+
+        def loader():
+            calls.append(1)
+            time.sleep(0.05)
+            return _FakeModel()
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(registry.get(SENTENCE_MODEL, "m", loader)))
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(calls) == 1
+        assert all(result is results[0] for result in results)
+        assert registry.is_loaded(SENTENCE_MODEL, "m")
+
+    def test_keybert_shares_sentence_model(self, monkeypatch):
+        """KeyBERT が共有の埋め込みモデルの上に作られ、重みを二重に数えないかのテスト"""
+        monkeypatch.setitem(
+            sys.modules, "sentence_transformers", types.SimpleNamespace(SentenceTransformer=_FakeModel)
+        )
+        monkeypatch.setitem(sys.modules, "keybert", types.SimpleNamespace(KeyBERT=_FakeKeyBERT))
+        registry = ModelRegistry()
+
+        registry.warmup(["m"])
+
+        keybert = registry.get_keybert_model("m")
+        assert keybert.model is registry.get_sentence_model("m")
+        footprint = registry.footprint()
+        assert [(info["kind"], info["bytes"], info["shares"]) for info in footprint["models"]] == [
+            (SENTENCE_MODEL, 4088, None),
+            (KEYBERT_MODEL, 0, "sentence:m")
+        ]
+        assert footprint["total_bytes"] == 4088
+
+    def test_failed_load_is_retried(self):
+        """読み込みに失敗したら登録せず、次の取得で再度読み込むかのテスト"""
+        registry = ModelRegistry()
+
+        def failing_loader():
+            raise OSError("model not found")
+
+        with pytest.raises(OSError):
+            registry.get(SENTENCE_MODEL, "m", failing_loader)
+        assert not registry.is_loaded(SENTENCE_MODEL, "m")
+        assert registry.get(SENTENCE_MODEL, "m", _FakeModel).name == "model"
+
+    def test_estimate_model_bytes(self):
+        """パラメータとバッファのバイト数の合計（対象外のオブジェクトは0）のテスト"""
+        assert estimate_model_bytes(_FakeModel()) == 1000 * 4 + 24 * 2 + 10 * 4
+        assert estimate_model_bytes(object()) == 0
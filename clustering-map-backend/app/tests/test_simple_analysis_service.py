@@ -0,0 +1,133 @@
+import pytest
+import tempfile
+import hashlib
+import random
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from app.models.schemas import AnalysisRequest, ColumnMapping
+from app.services.simple_analysis_service import SimpleAnalysisService, TFIDF_PARAMS
+from app.utils.dataset_store import DatasetStore
+from app.utils.table_utils import ColumnarTable
+
+
+TOPICS = [
+    ["overtime", "night", "late", "hours", "tired"],
+    ["salary", "bonus", "pay", "raise", "money"],
+    ["team", "colleague", "support", "help", "together"],
+    ["training", "skill", "growth", "learn", "career"],
+    ["office", "desk", "chair", "space", "building"],
+]
+
+
+def _make_texts(n: int, seed: int) -> list:
+    """話題ごとの単語に他の話題の単語を混ぜたテキストを作成"""
+    rng = random.Random(seed)
+    all_words = sum(TOPICS, [])
+    texts = []
+    for _ in range(n):
+        words = rng.sample(TOPICS[rng.randrange(len(TOPICS))], 3)
+        words += [rng.choice(all_words) for _ in range(2)]
+        texts.append(" ".join(words))
+    return texts
+
+
+def _inertia(matrix, labels) -> float:
+    """クラスタ内平方和"""
+    labels = np.asarray(labels)
+    total = 0.0
+    for label in set(labels.tolist()):
+        points = matrix[labels == label].toarray()
+        total += float(((points - points.mean(axis=0)) ** 2).sum())
+    return total
+
+
+def _dataset_id(name: str) -> str:
+    return hashlib.sha256(name.encode()).hexdigest()
+
+
+def _request(dataset_id: str) -> AnalysisRequest:
+    return AnalysisRequest(dataset_id=dataset_id, column_mapping=ColumnMapping(text_column='text'))
+
+
+class TestSimpleAnalysisService:
+    """簡素化された分析サービスのテスト"""
+
+    def test_analyze_dataset(self):
+        """保存済みデータセットの解析テスト"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            store = DatasetStore(temp_dir)
+            dataset_id = _dataset_id("base")
+            texts = _make_texts(30, 0)
+            store.save(dataset_id, ColumnarTable.from_columns(
+                ['id', 'text'], [list(range(30)), texts[:10] + [None] + texts[11:]]
+            ))
+
+            result = SimpleAnalysisService(store).analyze_data(_request(dataset_id))
+            # 空の本文は除外される
+            assert len(result["data_points"]) == 29
+            assert result["data_points"][0]["text"] == texts[0]
+
+    def test_tokenizer_mode_per_request(self):
+        """リクエストごとにタグ抽出のトークナイザーを選べるかのテスト"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            store = DatasetStore(temp_dir)
+            dataset_id = _dataset_id("japanese")
+            text = '長時間労働が続く。長時間労働をなくしたい。'
+            store.save(dataset_id, ColumnarTable.from_columns(['id', 'text'], [[1], [text]]))
+            service = SimpleAnalysisService(store)
+
+            regex_result = service.analyze_data(_request(dataset_id))
+            fast_result = service.analyze_data(AnalysisRequest(
+                dataset_id=dataset_id, column_mapping=ColumnMapping(text_column='text'), tokenizer_mode="fast"
+            ))
+
+            # 空白のない日本語は regex では文単位になり、頻出語が取れない
+            assert regex_result["data_points"][0]["tags"] == []
+            assert fast_result["data_points"][0]["tags"] == ["長時間労働"]
+
+            with pytest.raises(ValueError):
+                AnalysisRequest(
+                    dataset_id=dataset_id, column_mapping=ColumnMapping(text_column='text'), tokenizer_mode="unknown"
+                )
+
+    def test_incremental_append_matches_full_recompute(self):
+        """追加行の差分割り当てが全件再計算と許容範囲内で一致するかのテスト
+
+        許容範囲: 全件再計算のTF-IDF空間でのクラスタ内平方和が、全件再計算の結果の1.1倍以内。
+        """
+        base_texts = _make_texts(1000, 1)
+        extra_texts = _make_texts(100, 2)
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            store = DatasetStore(temp_dir)
+            service = SimpleAnalysisService(store)
+            base_id, appended_id = _dataset_id("base"), _dataset_id("appended")
+            store.save(base_id, ColumnarTable.from_columns(['text'], [base_texts]))
+
+            base_labels = [dp["cluster_id"] for dp in service.analyze_data(_request(base_id))["data_points"]]
+            store.append(base_id, appended_id, ColumnarTable.from_columns(['text'], [extra_texts]))
+            assert store.get_manifest(appended_id)["dirty_from"] == 1000
+
+            labels = [dp["cluster_id"] for dp in service.analyze_data(_request(appended_id))["data_points"]]
+            # 既存の行のクラスタは変わらない
+            assert labels[:1000] == base_labels
+
+        full_labels = SimpleAnalysisService()._fit_cluster_labels(base_texts + extra_texts, 5)
+        matrix = TfidfVectorizer(**TFIDF_PARAMS).fit_transform(base_texts + extra_texts)
+        assert _inertia(matrix, labels) <= 1.1 * _inertia(matrix, full_labels)
+
+    def test_recluster_when_dirty_ratio_exceeded(self):
+        """追加行の割合が閾値を超えたら全件で再計算するかのテスト"""
+        base_texts = _make_texts(100, 3)
+        extra_texts = _make_texts(50, 4)
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            store = DatasetStore(temp_dir)
+            service = SimpleAnalysisService(store)
+            base_id, appended_id = _dataset_id("base"), _dataset_id("appended")
+            store.save(base_id, ColumnarTable.from_columns(['text'], [base_texts]))
+            service.analyze_data(_request(base_id))
+            store.append(base_id, appended_id, ColumnarTable.from_columns(['text'], [extra_texts]))
+
+            labels = [dp["cluster_id"] for dp in service.analyze_data(_request(appended_id))["data_points"]]
+            assert labels == SimpleAnalysisService()._fit_cluster_labels(base_texts + extra_texts, 5)
@@ -0,0 +1,120 @@
+import pytest
+import json
+import os
+import tempfile
+from app.models.config import AppConfig
+from app.models.schemas import TagRule
+from app.services.simple_excel_service import SimpleExcelService, BUSINESS_CATEGORY, BUSINESS_KEYWORDS
+from app.utils.table_utils import ColumnarTable
+from app.utils.text_utils import get_text_tokenizer
+
+
+TEXTS = [
+    '22時以降の残業を禁止にして欲しいです。夜に連絡がくるのでワークライフバランスが保てません。',
+    'チームの仲間がとても協力的で、困った時には助け合える環境です。',
+    'スキルアップのための研修制度が充実していて、キャリア成長を実感できます。',
+    '給与や待遇面で満足しており、ボーナスも期待できます。',
+    '残業 残業 給与',
+    None,
+    '残業 残業 給与',
+]
+
+
+class TestSimpleExcelService:
+    """軽量版Excel処理サービスのテスト"""
+
+    def test_merged_tag_stats_match_full_stats(self):
+        """追加行の集計値を合算した結果が全件の集計と一致するかのテスト"""
+        service = SimpleExcelService()
+        table = ColumnarTable.from_columns(['自由記述'], [TEXTS])
+
+        full = service.generate_tag_stats(table)
+        merged = service.merge_tag_stats(
+            service.generate_tag_stats(table.take(range(3))),
+            service.generate_tag_stats(table.take(range(3, len(TEXTS))), '自由記述')
+        )
+
+        assert merged["n_texts"] == full["n_texts"] == len(TEXTS)
+        assert list(merged["word_counts"].items()) == list(full["word_counts"].items())
+        assert merged["business_summary"] == full["business_summary"]
+        assert service.tag_candidates_from_stats(merged) == service.generate_tag_candidates(table)
+        assert service.generate_tag_candidates(table)
+
+    def test_fast_tokenizer_finds_japanese_keywords(self):
+        """高速トークナイザーで空白のない日本語からキーワードが取れるかのテスト"""
+        service = SimpleExcelService()
+        table = ColumnarTable.from_columns(['自由記述'], [TEXTS])
+
+        regex_stats = service.generate_tag_stats(table, tokenizer_mode="regex")
+        fast_stats = service.generate_tag_stats(table, tokenizer_mode="fast")
+
+        assert fast_stats["tokenizer_mode"] == "fast"
+        # regex では空白で区切られた行の「残業」しか数えられない
+        assert regex_stats["word_counts"]["残業"] == 4
+        assert fast_stats["word_counts"]["残業"] == 5
+        assert fast_stats["word_counts"]["ワークライフバランス"] == 1
+        assert service.tag_candidates_from_stats(fast_stats)
+
+    def test_business_categories_from_tag_rules(self):
+        """タグルールのビジネスカテゴリで辞書が置き換わり、ファイルの書き換えで作り直されるかのテスト"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            service = SimpleExcelService(AppConfig(data_dir=temp_dir))
+            table = ColumnarTable.from_columns(['自由記述'], [TEXTS])
+            default_index = service.get_category_index()
+            assert default_index.categories == BUSINESS_KEYWORDS
+            assert service.get_category_index() is default_index
+
+            rules = [
+                TagRule(key='労働時間', synonyms=['残業', '夜'], category=BUSINESS_CATEGORY),
+                TagRule(key='残業', synonyms=['残業'], category=None)
+            ]
+            assert service.update_tag_rules(rules)
+            assert service.get_tag_rules() == [rule.model_dump() for rule in rules]
+            index = service.get_category_index()
+            assert index.categories == {'労働時間': ['残業', '夜']}
+            stats = service.generate_tag_stats(table)
+            assert stats["business_summary"] == {'労働時間': 6}
+            assert stats["categories_version"] == index.version != default_index.version
+
+            # 別のプロセスがファイルを書き換えた場合も読み直す
+            rules_path = os.path.join(temp_dir, 'tags', 'tag_rules.json')
+            with open(rules_path, 'w', encoding='utf-8') as f:
+                json.dump([{'key': '給与', 'synonyms': ['給与', 'ボーナス'], 'category': BUSINESS_CATEGORY}], f)
+            os.utime(rules_path, ns=(0, 0))
+            assert service.get_tag_rules()[0]['key'] == '給与'
+            assert service.get_category_index().categories == {'給与': ['給与', 'ボーナス']}
+
+    def test_invalid_tag_rules_are_not_saved(self):
+        """不正なビジネスカテゴリのルールは保存されず、辞書も変わらないかのテスト"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            service = SimpleExcelService(AppConfig(data_dir=temp_dir))
+            index = service.get_category_index()
+
+            assert not service.update_tag_rules([TagRule(key='不満', synonyms=[''], category=BUSINESS_CATEGORY)])
+            assert not service.update_tag_rules([TagRule(key='positive', synonyms=['良い'], category=BUSINESS_CATEGORY)])
+            assert service.get_tag_rules() == []
+            assert service.get_category_index() is index
+
+    def test_accumulator_merge_matches_single_pass(self):
+        """ワーカーごとの部分結果を合算した集計値が1回で集計した結果と一致するかのテスト"""
+        service = SimpleExcelService()
+        texts = TEXTS * 3
+        full = service._collect_tag_stats(iter(texts), "regex")
+        tokenize = get_text_tokenizer("regex")
+
+        partials = []
+        for start in range(0, len(texts), 4):
+            accumulator = service.new_tag_stats_accumulator("regex")
+            for text in texts[start:start + 4]:
+                accumulator.add(text, tokenize(text) if text else [])
+            partials.append(accumulator)
+        merged = partials[0]
+        for partial in partials[1:]:
+            merged.merge(partial)
+        stats = merged.to_stats()
+
+        assert stats["n_texts"] == full["n_texts"] == len(texts)
+        assert list(stats["word_counts"].items()) == list(full["word_counts"].items())
+        assert stats["business_summary"] == full["business_summary"]
+        with pytest.raises(ValueError):
+            merged.merge(service.new_tag_stats_accumulator("fast"))
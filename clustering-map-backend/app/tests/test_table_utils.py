@@ -0,0 +1,65 @@
+import pytest
+from array import array
+from app.utils.table_utils import ColumnarTable
+
+
+class TestTableUtils:
+    """列指向テーブルのテスト"""
+
+    def _make_table(self):
+        return ColumnarTable.from_rows(
+            ['id', 'text', 'score'],
+            [
+                (1, 'テスト1', 0.5),
+                (2, None, 1.5),
+                (3, 'テスト3'),  # 不足セルはNoneで補完
+            ]
+        )
+
+    def test_typed_columns(self):
+        """型が揃った列は型付き配列になるかのテスト"""
+        table = self._make_table()
+        assert isinstance(table['id'], array)
+        assert table['id'].typecode == 'q'
+        assert isinstance(table['text'], list)
+        # Noneを含む列はリストのまま
+        assert isinstance(table['score'], list)
+        assert len(table) == 3
+
+    def test_head_and_to_dict(self):
+        """head と to_dict のテスト"""
+        table = self._make_table()
+        records = table.head(2).to_dict('records')
+        assert records == [
+            {'id': 1, 'text': 'テスト1', 'score': 0.5},
+            {'id': 2, 'text': None, 'score': 1.5},
+        ]
+        assert table.to_dict('list')['id'] == [1, 2, 3]
+        assert table.iloc[0]['text'] == 'テスト1'
+        assert table.iloc[-1]['id'] == 3
+
+        with pytest.raises(ValueError):
+            table.to_dict('unknown')
+
+    def test_select(self):
+        """列選択のテスト"""
+        table = self._make_table()
+        selected = table[['text', 'id']]
+        assert selected.columns == ['text', 'id']
+        # 列データはコピーせずに共有する
+        assert selected['id'] is table['id']
+
+        with pytest.raises(KeyError):
+            table.select(['nonexistent'])
+
+    def test_dropna_and_text_values(self):
+        """null除外と文字列化のテスト"""
+        table = self._make_table()
+        assert table.text_values('text') == ['テスト1', '', 'テスト3']
+
+        filtered = table.dropna(['text'])
+        assert list(filtered['id']) == [1, 3]
+        assert isinstance(filtered['id'], array)
+
+        assert len(table.dropna()) == 1
+        assert table.dropna(['id']) is table
@@ -0,0 +1,75 @@
+import pytest
+import random
+from collections import Counter
+from app.utils.tag_matrix import TagMatrix
+
+
+TAG_LISTS = [['残業', '深夜'], [], ['給与', '残業'], ['チーム'], ['給与', '賞与', '残業']]
+LABELS = [0, 1, 0, 1, -1]
+
+
+class TestTagMatrix:
+    """文書×タグの疎行列のテスト"""
+
+    def test_round_trip(self):
+        """行ごとのタグが元の順序のまま取り出せるかのテスト"""
+        matrix = TagMatrix.from_tag_lists(iter(TAG_LISTS))
+
+        assert len(matrix) == len(TAG_LISTS)
+        assert matrix.vocabulary == ['残業', '深夜', '給与', 'チーム', '賞与']
+        assert matrix.tag_lists() == TAG_LISTS
+        assert matrix.row_tags(1) == []
+        assert matrix.tags_in_use() == matrix.vocabulary
+        assert matrix.tag_counts().tolist() == [3, 1, 2, 1, 1]
+
+    def test_order_survives_canonicalization(self):
+        """行列を正規化（列番号の並べ替え・重複の合算）しても行ごとのタグの順序が変わらないかのテスト"""
+        tag_lists = [['賞与', '残業', '給与', '残業'], ['深夜', 'チーム']] + TAG_LISTS
+        matrix = TagMatrix.from_tag_lists(tag_lists)
+        top_tags = matrix.top_tags_by_group([0, 0] + LABELS)
+
+        matrix.matrix.sort_indices()
+        matrix.matrix.sum_duplicates()
+
+        assert matrix.matrix.has_canonical_format
+        assert matrix.tag_lists() == tag_lists
+        assert matrix.top_tags_by_group([0, 0] + LABELS) == top_tags
+        assert matrix.tag_counts().tolist() == [2, 5, 3, 2, 2]
+
+    def test_top_tags_by_group(self):
+        """グループごとの上位タグが Counter.most_common と同じ順になるかのテスト"""
+        rng = random.Random(0)
+        vocabulary = [f'タグ{i}' for i in range(30)]
+        tag_lists = [rng.sample(vocabulary, rng.randint(0, 5)) for _ in range(300)]
+        labels = [rng.randint(-1, 4) for _ in range(300)]
+
+        top_tags = TagMatrix.from_tag_lists(tag_lists).top_tags_by_group(labels, 5)
+
+        assert sorted(top_tags) == sorted(set(labels))
+        for label in set(labels):
+            counts = Counter(tag for tags, l in zip(tag_lists, labels) if l == label for tag in tags)
+            assert top_tags[label] == [tag for tag, _ in counts.most_common(5)]
+
+    def test_group_tag_counts_and_cooccurrence(self):
+        """グループ×タグの出現回数とタグの共起回数のテスト"""
+        matrix = TagMatrix.from_tag_lists(TAG_LISTS)
+
+        # グループはラベルの昇順（-1, 0, 1）
+        assert matrix.group_tag_counts(LABELS).toarray().tolist() == [
+            [1, 0, 1, 0, 1],
+            [2, 1, 1, 0, 0],
+            [0, 0, 0, 1, 0]
+        ]
+        cooccurrence = matrix.cooccurrence().toarray()
+        assert cooccurrence[0].tolist() == [3, 1, 2, 0, 1]
+        assert cooccurrence[2, 4] == cooccurrence[4, 2] == 1
+        assert cooccurrence[3, 0] == 0
+
+    def test_empty(self):
+        """タグのない行だけ・行がない場合のテスト"""
+        matrix = TagMatrix.from_tag_lists([[], []])
+
+        assert matrix.tag_lists() == [[], []]
+        assert matrix.tags_in_use() == []
+        assert matrix.top_tags_by_group([0, 1]) == {0: [], 1: []}
+        assert TagMatrix.from_tag_lists([]).top_tags_by_group([]) == {}
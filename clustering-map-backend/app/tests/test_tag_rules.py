@@ -0,0 +1,68 @@
+import pytest
+import json
+import os
+import tempfile
+from app.models.schemas import TagRule
+from app.utils.tag_rules import SynonymIndex, TagRuleStore
+
+
+class TestTagRuleStore:
+    """タグルールのストアのテスト"""
+
+    def test_load_from_memory_until_file_changes(self):
+        """ファイルが変わらない間はメモリから返し、置き換わったら読み直すかのテスト"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            store = TagRuleStore(os.path.join(temp_dir, 'tags', 'tag_rules.json'))
+            assert store.load() == ([], None)
+
+            rules = [{'key': '残業', 'synonyms': ['残業', '時間外'], 'category': None}]
+            store.save(rules)
+            loaded, version = store.load()
+            assert loaded == rules
+            assert version is not None
+            assert store.load()[0] is loaded
+            assert not os.path.exists(store.path + '.tmp')
+
+            # 別のストア（別のプロセス）からの書き込みを検出する
+            TagRuleStore(store.path).save([])
+            assert store.get_rules() == []
+            assert store.load()[1] != version
+
+            os.remove(store.path)
+            assert store.load() == ([], None)
+
+    def test_broken_file(self):
+        """壊れたファイルはエラーになるかのテスト"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'tag_rules.json')
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write('[{')
+            with pytest.raises(json.JSONDecodeError):
+                TagRuleStore(path).load()
+
+
+class TestSynonymIndex:
+    """タグルールの同義語索引のテスト"""
+
+    def test_normalize(self):
+        """同義語の正規化（大文字小文字を区別しない・後のルールが優先）のテスト"""
+        index = SynonymIndex([
+            TagRule(key='残業', synonyms=['残業', '時間外労働', 'Overtime']),
+            {'key': '休暇', 'synonyms': ['休み', '有給']},
+            TagRule(key='有給休暇', synonyms=['有給'])
+        ])
+
+        assert len(index) == 5
+        assert index.normalize('overtime') == '残業'
+        assert index.normalize('時間外労働') == '残業'
+        assert index.normalize('有給') == '有給休暇'
+        assert index.normalize('給与') == '給与'
+
+    def test_normalize_corpus(self):
+        """全データポイントのタグの一括正規化（重なったタグは1つにまとめる）のテスト"""
+        index = SynonymIndex([TagRule(key='残業', synonyms=['残業', '時間外労働', '深夜残業'])])
+        tag_lists = [['時間外労働', '深夜残業', '給与'], [], ['給与', '残業']]
+
+        assert index.normalize_corpus(tag_lists) == [['残業', '給与'], [], ['給与', '残業']]
+        assert index.normalize_corpus(iter(tag_lists * 2)) == index.normalize_corpus(tag_lists) * 2
+        assert SynonymIndex().normalize_corpus(tag_lists) == tag_lists
@@ -1,87 +1,351 @@
-import pytest
-from app.utils.text_utils import (
-    normalize_text, remove_special_characters, tokenize_japanese,
-    remove_stop_words, preprocess_text, extract_keywords_from_text,
-    calculate_text_similarity, merge_similar_tags
-)
-
-
-class TestTextUtils:
-    """テキスト処理ユーティリティのテスト"""
-    
-    def test_normalize_text(self):
-        """テキスト正規化のテスト"""
-        # 全角半角統一
-        assert normalize_text("　テスト　") == "テスト"
-        assert normalize_text("テスト  テスト") == "テスト テスト"
-        
-        # 空文字列
-        assert normalize_text("") == ""
-        assert normalize_text(None) == ""
-    
-    def test_remove_special_characters(self):
-        """特殊文字除去のテスト"""
-        text = "テスト！@#$%^&*()_+{}|:<>?[]\\;'\",./"
-        result = remove_special_characters(text)
-        assert "！" not in result
-        assert "@" not in result
-        assert "テスト" in result
-    
-    def test_tokenize_japanese(self):
-        """日本語トークン化のテスト"""
-        text = "顧客満足度を向上させたい"
-        tokens = tokenize_japanese(text)
-        assert len(tokens) > 0
-        assert isinstance(tokens, list)
-    
-    def test_remove_stop_words(self):
-        """ストップワード除去のテスト"""
-        tokens = ["顧客", "の", "満足度", "を", "向上", "させたい"]
-        result = remove_stop_words(tokens)
-        assert "の" not in result
-        assert "を" not in result
-        assert "顧客" in result
-        assert "満足度" in result
-    
-    def test_preprocess_text(self):
-        """テキスト前処理のテスト"""
-        text = "顧客満足度を向上させたい！"
-        tokens = preprocess_text(text)
-        assert isinstance(tokens, list)
-        assert len(tokens) > 0
-    
-    def test_extract_keywords_from_text(self):
-        """キーワード抽出のテスト"""
-        text = "顧客満足度を向上させたい。お客様との関係性を深めることが重要だと思う。"
-        keywords = extract_keywords_from_text(text, max_keywords=5)
-        assert isinstance(keywords, list)
-        assert len(keywords) <= 5
-    
-    def test_calculate_text_similarity(self):
-        """テキスト類似度計算のテスト"""
-        text1 = "顧客満足度を向上させたい"
-        text2 = "顧客満足度を高めたい"
-        similarity = calculate_text_similarity(text1, text2)
-        assert 0 <= similarity <= 1
-        
-        # 同じテキスト
-        same_similarity = calculate_text_similarity(text1, text1)
-        assert same_similarity == 1.0
-        
-        # 全く異なるテキスト
-        different_similarity = calculate_text_similarity(text1, "全く異なる内容")
-        assert different_similarity < 0.5
-    
-    def test_merge_similar_tags(self):
-        """類似タグマージのテスト"""
-        tags = ["顧客満足度", "顧客満足", "満足度向上", "システム品質", "品質向上"]
-        merged = merge_similar_tags(tags, threshold=0.8)
-        assert len(merged) <= len(tags)
-        assert isinstance(merged, list)
-    
-    def test_empty_input_handling(self):
-        """空入力の処理テスト"""
-        assert preprocess_text("") == []
-        assert extract_keywords_from_text("") == []
-        assert calculate_text_similarity("", "") == 1.0
-        assert merge_similar_tags([]) == []
+import pytest
+import random
+import subprocess
+import sys
+import threading
+from pathlib import Path
+from app.utils import text_utils
+from app.utils.text_utils import (
+    normalize_text, remove_special_characters, tokenize_japanese,
+    remove_stop_words, preprocess_text, extract_keywords_from_text,
+    calculate_text_similarity, merge_similar_tags, preprocess_texts,
+    get_token_cache_stats, TokenCache, token_cache, _clean_text, _tokenize_clean_text,
+    tokenize_fast, tokenize_regex, get_text_tokenizer, find_similar_pairs, _jaccard_similarity,
+    build_token_matrix, jaccard_similarity_matrix, jaccard_top_k, tokenizer_fingerprint
+)
+
+
+class TestTextUtils:
+    """テキスト処理ユーティリティのテスト"""
+    
+    def test_normalize_text(self):
+        """テキスト正規化のテスト"""
+        # 全角半角統一
+        assert normalize_text("　テスト　") == "テスト"
+        assert normalize_text("テスト  テスト") == "テスト テスト"
+        
+        # 空文字列
+        assert normalize_text("") == ""
+        assert normalize_text(None) == ""
+    
+    def test_remove_special_characters(self):
+        """特殊文字除去のテスト"""
+        text = "テスト！@#$%^&*()_+{}|:<>?[]\\;'\",./"
+        result = remove_special_characters(text)
+        assert "！" not in result
+        assert "@" not in result
+        assert "テスト" in result
+    
+    def test_tokenize_japanese(self):
+        """日本語トークン化のテスト"""
+        text = "顧客満足度を向上させたい"
+        tokens = tokenize_japanese(text)
+        assert len(tokens) > 0
+        assert isinstance(tokens, list)
+    
+    def test_remove_stop_words(self):
+        """ストップワード除去のテスト"""
+        tokens = ["顧客", "の", "満足度", "を", "向上", "させたい"]
+        result = remove_stop_words(tokens)
+        assert "の" not in result
+        assert "を" not in result
+        assert "顧客" in result
+        assert "満足度" in result
+    
+    def test_preprocess_text(self):
+        """テキスト前処理のテスト"""
+        text = "顧客満足度を向上させたい！"
+        tokens = preprocess_text(text)
+        assert isinstance(tokens, list)
+        assert len(tokens) > 0
+    
+    def test_extract_keywords_from_text(self):
+        """キーワード抽出のテスト"""
+        text = "顧客満足度を向上させたい。お客様との関係性を深めることが重要だと思う。"
+        keywords = extract_keywords_from_text(text, max_keywords=5)
+        assert isinstance(keywords, list)
+        assert len(keywords) <= 5
+    
+    def test_calculate_text_similarity(self):
+        """テキスト類似度計算のテスト"""
+        text1 = "顧客満足度を向上させたい"
+        text2 = "顧客満足度を高めたい"
+        similarity = calculate_text_similarity(text1, text2)
+        assert 0 <= similarity <= 1
+        
+        # 同じテキスト
+        same_similarity = calculate_text_similarity(text1, text1)
+        assert same_similarity == 1.0
+        
+        # 全く異なるテキスト
+        different_similarity = calculate_text_similarity(text1, "全く異なる内容")
+        assert different_similarity < 0.5
+    
+    def test_merge_similar_tags(self):
+        """類似タグマージのテスト"""
+        tags = ["顧客満足度", "顧客満足", "満足度向上", "システム品質", "品質向上"]
+        merged = merge_similar_tags(tags, threshold=0.8)
+        assert len(merged) <= len(tags)
+        assert isinstance(merged, list)
+    
+    def test_empty_input_handling(self):
+        """空入力の処理テスト"""
+        assert preprocess_text("") == []
+        assert extract_keywords_from_text("") == []
+        assert calculate_text_similarity("", "") == 1.0
+        assert merge_similar_tags([]) == []
+
+
+class TestSimilarPairs:
+    """類似ペアの列挙とタグマージのテスト"""
+    
+    @pytest.mark.parametrize("threshold", [-0.1, 0.0, 0.2, 1 / 3, 0.5, 2 / 3, 0.8, 1.0, 1.2])
+    def test_same_pairs_as_brute_force(self, threshold):
+        """全ペアを比較した場合と同じペアを返すかのテスト"""
+        rng = random.Random(0)
+        vocabulary = [f"語{i}" for i in range(20)]
+        for _ in range(50):
+            token_sets = [set(rng.sample(vocabulary, rng.randint(0, 6))) for _ in range(rng.randint(0, 30))]
+            expected = [
+                [j for j in range(i + 1, len(token_sets)) if _jaccard_similarity(token_sets[i], token_sets[j]) >= threshold]
+                for i in range(len(token_sets))
+            ]
+            assert find_similar_pairs(token_sets, threshold) == expected
+    
+    def test_merge_keeps_greedy_representatives(self):
+        """タグマージの代表が全ペア比較の貪欲法と同じかのテスト"""
+        tags = ["顧客 満足", "満足 顧客 向上", "顧客 満足", "品質 向上", "品質", "向上 品質", "", "!!"]
+        token_sets = [set(preprocess_text(tag)) for tag in tags]
+        
+        expected = []
+        used = set()
+        for i, tag in enumerate(tags):
+            if i in used:
+                continue
+            group = [tag]
+            used.add(i)
+            for j in range(i + 1, len(tags)):
+                if j not in used and _jaccard_similarity(token_sets[i], token_sets[j]) >= 0.5:
+                    group.append(tags[j])
+                    used.add(j)
+            expected.append(max(group, key=len))
+        
+        assert merge_similar_tags(tags, threshold=0.5) == expected
+
+
+def _shared_jaccard(tokens1: set, tokens2: set) -> float:
+    """共通のトークンがあるペアだけのJaccard係数（疎行列と同じく、ないペアは0）"""
+    return _jaccard_similarity(tokens1, tokens2) if tokens1 & tokens2 else 0.0
+
+
+class TestJaccardMatrix:
+    """疎行列による一括Jaccard係数のテスト"""
+    
+    def _make_sets(self, n, seed, extra=()):
+        rng = random.Random(seed)
+        vocabulary = [f"語{i}" for i in range(30)] + list(extra)
+        return [set(rng.sample(vocabulary, rng.randint(0, 6))) for _ in range(n)]
+    
+    def test_build_token_matrix(self):
+        """0/1の文書×語行列の作成テスト"""
+        matrix, vocabulary = build_token_matrix([["残業", "深夜", "残業"], [], ["深夜"]])
+        assert vocabulary == {"残業": 0, "深夜": 1}
+        assert matrix.toarray().tolist() == [[1, 1], [0, 0], [0, 1]]
+        
+        # 語彙にないトークンは列に含めない
+        queries, _ = build_token_matrix([["深夜", "休日"]], vocabulary)
+        assert queries.toarray().tolist() == [[0, 1]]
+    
+    def test_all_pairs(self):
+        """全ペアの類似度が1ペアずつの計算と一致するかのテスト"""
+        token_sets = self._make_sets(40, 0)
+        scores = jaccard_similarity_matrix(token_sets, batch_size=7).toarray()
+        
+        assert scores.shape == (40, 40)
+        for i in range(40):
+            for j in range(40):
+                assert scores[i, j] == pytest.approx(_shared_jaccard(token_sets[i], token_sets[j]))
+    
+    def test_query_against_corpus(self):
+        """クエリ×コーパスの類似度テスト（コーパスにないトークンも和集合に数える）"""
+        token_sets = self._make_sets(30, 1)
+        queries = self._make_sets(10, 2, extra=["未知語"])
+        scores = jaccard_similarity_matrix(token_sets, queries, threshold=0.2, batch_size=3).toarray()
+        
+        assert scores.shape == (10, 30)
+        for i in range(10):
+            for j in range(30):
+                expected = _shared_jaccard(queries[i], token_sets[j])
+                assert scores[i, j] == pytest.approx(expected if expected >= 0.2 else 0.0)
+    
+    def test_top_k(self):
+        """上位k件が類似度の降順（同点は番号順）で自分自身を含まないかのテスト"""
+        token_sets = self._make_sets(50, 3)
+        results = jaccard_top_k(token_sets, 3, threshold=0.1, batch_size=8)
+        
+        assert len(results) == 50
+        for i, result in enumerate(results):
+            candidates = [
+                (j, _shared_jaccard(token_sets[i], token_sets[j])) for j in range(50) if j != i
+            ]
+            expected = sorted(
+                [(j, score) for j, score in candidates if score >= 0.1 and score > 0],
+                key=lambda item: (-item[1], item[0])
+            )[:3]
+            assert [j for j, _ in result] == [j for j, _ in expected]
+            assert [score for _, score in result] == pytest.approx([score for _, score in expected])
+    
+    def test_empty_inputs(self):
+        """空の入力のテスト"""
+        assert jaccard_similarity_matrix([]).shape == (0, 0)
+        assert jaccard_similarity_matrix([{"a"}], []).shape == (0, 1)
+        assert jaccard_top_k([], 5) == []
+
+
+class TestFastTokenizer:
+    """辞書を使わない高速トークナイザーのテスト"""
+    
+    def test_split_on_script_changes(self):
+        """文字種の切れ目で分割し、漢字の区間から文字n-gramを作るかのテスト"""
+        tokens = tokenize_fast("22時以降の残業が多く、ワークライフバランスが保てません。ＰＣはWindows")
+        assert tokens == [
+            '22', '時以降', '時以', '以降', '残業', '多', 'ワークライフバランス', '保', 'pc', 'windows'
+        ]
+    
+    def test_ngram_size(self):
+        """n-gramの長さの指定テスト"""
+        assert tokenize_fast("長時間労働", ngram_size=3) == ['長時間労働', '長時間', '時間労', '間労働']
+        assert tokenize_fast("") == []
+        assert tokenize_fast(None) == []
+    
+    def test_get_text_tokenizer(self):
+        """トークナイザーの種類の指定テスト"""
+        assert get_text_tokenizer("regex") is tokenize_regex
+        assert get_text_tokenizer("fast") is tokenize_fast
+        assert get_text_tokenizer("sudachi") is preprocess_text
+        assert tokenize_regex("Hello World, hello") == ['hello', 'world', 'hello']
+        with pytest.raises(ValueError):
+            get_text_tokenizer("unknown")
+    
+    def test_tokenizer_fingerprint(self, monkeypatch):
+        """トークナイザーの種類と TOKENIZER_VERSION で変わり、それ以外では変わらないかのテスト"""
+        fingerprints = {mode: tokenizer_fingerprint(mode) for mode in ("regex", "fast", "sudachi")}
+        assert len(set(fingerprints.values())) == 3
+        assert tokenizer_fingerprint("fast") == fingerprints["fast"]
+        
+        monkeypatch.setattr(text_utils, "TOKENIZER_VERSION", text_utils.TOKENIZER_VERSION + 1)
+        assert tokenizer_fingerprint("fast") != fingerprints["fast"]
+        with pytest.raises(ValueError):
+            tokenizer_fingerprint("unknown")
+
+
+class TestTokenCache:
+    """トークンキャッシュとバッチ前処理のテスト"""
+    
+    TEXTS = [
+        "顧客満足度を向上させたい！",
+        "残業が多くて休みが取れません。",
+        "　顧客満足度を向上させたい！　",
+        "",
+        "残業が多くて休みが取れません。",
+    ]
+    
+    def setup_method(self):
+        token_cache.clear()
+    
+    def test_same_tokens_as_uncached(self):
+        """キャッシュなしの前処理と同じトークン列を返すかのテスト"""
+        expected = [_tokenize_clean_text(_clean_text(text)) for text in self.TEXTS]
+        assert preprocess_texts(self.TEXTS) == expected
+        assert [preprocess_text(text) for text in self.TEXTS] == expected
+    
+    def test_no_repeated_tokenization(self):
+        """正規化後に同じテキストは一度だけ形態素解析されるかのテスト"""
+        preprocess_texts(self.TEXTS)
+        stats = get_token_cache_stats()
+        # 正規化後の異なるテキストは3種類
+        assert stats["misses"] == 3
+        assert stats["entries"] == 3
+        
+        preprocess_texts(self.TEXTS)
+        preprocess_text(self.TEXTS[0])
+        stats = get_token_cache_stats()
+        assert stats["misses"] == 3
+        assert stats["hits"] == 4
+        assert stats["hit_rate"] == 4 / 7
+    
+    def test_cached_tokens_are_not_shared(self):
+        """返したリストを書き換えてもキャッシュに影響しないかのテスト"""
+        tokens = preprocess_text(self.TEXTS[0])
+        tokens.append("追加")
+        assert "追加" not in preprocess_text(self.TEXTS[0])
+    
+    def test_parallel_same_as_serial(self, monkeypatch):
+        """プロセスプールでのトークン化が直列と同じ結果を入力順に返すかのテスト"""
+        monkeypatch.setattr(text_utils, "PARALLEL_MIN_TEXTS", 4)
+        monkeypatch.setattr(text_utils, "PARALLEL_CHUNK_SIZE", 3)
+        texts = [f"{text}（回答{i}）" for i, text in enumerate(self.TEXTS * 3)]
+        
+        expected = [_tokenize_clean_text(_clean_text(text)) for text in texts]
+        try:
+            assert preprocess_texts(texts, workers=2) == expected
+        finally:
+            text_utils.shutdown_process_pool()
+        assert get_token_cache_stats()["misses"] == len(set(texts))
+    
+    def test_lru_eviction(self):
+        """上限を超えたら最も古い項目から外れるかのテスト"""
+        cache = TokenCache(max_entries=2)
+        cache.put("a", ["a"])
+        cache.put("b", ["b"])
+        assert cache.get("a") == ("a",)
+        cache.put("c", ["c"])
+        
+        assert cache.get("b") is None
+        assert cache.get("a") == ("a",)
+        assert cache.stats()["entries"] == 2
+
+
+class TestTokenizerLoading:
+    """Sudachi辞書の遅延読み込みのテスト"""
+    
+    def test_import_does_not_load_dictionary(self):
+        """インポートだけでは辞書を読み込まないかのテスト"""
+        script = (
+            "import sys\n"
+            "import app.utils.text_utils as text_utils\n"
+            "assert text_utils._dictionary is None\n"
+            "assert 'sudachipy' not in sys.modules\n"
+            "text_utils.preload_tokenizer()\n"
+            "assert text_utils._dictionary is not None\n"
+        )
+        backend_dir = Path(__file__).parent.parent.parent
+        subprocess.run([sys.executable, "-c", script], cwd=backend_dir, check=True)
+    
+    def test_no_deprecated_tokenizer_api(self):
+        """警告をエラーにしても形態素解析が行われる（非推奨のAPIを使わず、分割にフォールバックしない）かのテスト"""
+        script = (
+            "import app.utils.text_utils as text_utils\n"
+            "assert text_utils.tokenize_japanese('顧客満足度を向上させたい') != ['顧客満足度を向上させたい']\n"
+        )
+        backend_dir = Path(__file__).parent.parent.parent
+        subprocess.run([sys.executable, "-W", "error", "-c", script], cwd=backend_dir, check=True)
+    
+    def test_threads_share_dictionary(self):
+        """スレッドごとのトークナイザーが同じ辞書を共有するかのテスト"""
+        results = {}
+        
+        def tokenize(name):
+            results[name] = (text_utils.get_dictionary(), text_utils.get_tokenizer(), tokenize_japanese("顧客満足度を向上させたい"))
+        
+        threads = [threading.Thread(target=tokenize, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        dictionaries = {id(result[0]) for result in results.values()}
+        tokenizers = {id(result[1]) for result in results.values()}
+        assert len(dictionaries) == 1
+        assert len(tokenizers) == 4
+        assert all(result[2] == tokenize_japanese("顧客満足度を向上させたい") for result in results.values())
@@ -0,0 +1,127 @@
+import pytest
+import tempfile
+import os
+from datetime import datetime, date, time
+from openpyxl import Workbook
+from openpyxl.styles import Font
+from app.utils.file_utils import read_excel_file, RowLimitExceededError
+from app.utils.xlsx_reader import XlsxSheetReader, UnsupportedXlsxFeature, read_xlsx_columns
+
+
+def _write_workbook(path: str, active_second_sheet: bool = False) -> None:
+    """検証用のワークブックを作成"""
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "ダミー" if active_second_sheet else "アンケート結果"
+    ws.append(['id', '自由記述', None, 'score', '回答日'])
+    ws.append([1, '残業が多いです。', 'A', 0.5, datetime(2024, 4, 1, 9, 30)])
+    ws.append([2, None, 'B', 3, date(2024, 4, 2)])
+    ws.append([])  # 空行はスキップされる
+    ws.append([3, '改善してほしい', None, True, time(12, 0)])
+    ws.append([4, '=CONCAT("a","b")', 'C', -1.25e-3, None])
+    ws.cell(row=8, column=2, value='飛び行')
+
+    if active_second_sheet:
+        data_ws = wb.create_sheet("アンケート結果")
+        data_ws.append(['text'])
+        data_ws.append(['2枚目のシート'])
+        wb.active = 1
+
+    wb.save(path)
+
+
+class TestXlsxReader:
+    """ネイティブxlsxリーダーのテスト"""
+
+    @pytest.mark.parametrize("active_second_sheet", [False, True])
+    def test_same_result_as_openpyxl(self, active_second_sheet):
+        """openpyxl と同じヘッダーと値を返すかのテスト"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'test.xlsx')
+            _write_workbook(path, active_second_sheet)
+
+            expected = read_excel_file(path, engine="openpyxl")
+            actual = read_excel_file(path, engine="native")
+
+            assert actual.columns == expected.columns
+            assert actual.to_dict('records') == expected.to_dict('records')
+
+    def test_headers_and_dimension(self):
+        """ヘッダーとdimensionの読み込みテスト"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'test.xlsx')
+            _write_workbook(path)
+
+            with XlsxSheetReader(path) as reader:
+                assert reader.sheet_name == "アンケート結果"
+                assert reader.read_headers() == ['id', '自由記述', None, 'score', '回答日']
+                assert reader.max_column == 5
+                assert reader.max_row == 8
+
+    def test_read_requested_columns(self):
+        """指定列だけを読み込むテスト"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'test.xlsx')
+            _write_workbook(path)
+
+            headers, columns = read_xlsx_columns(path, ['自由記述', 0])
+            assert headers == ['自由記述', 'id']
+            assert columns[0] == ['残業が多いです。', None, '改善してほしい', '=CONCAT("a","b")', '飛び行']
+            assert columns[1] == [1, 2, 3, 4, None]
+
+    @pytest.mark.parametrize("engine", ["openpyxl", "native"])
+    def test_row_limit(self, engine):
+        """行数上限での打ち切りテスト"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'test.xlsx')
+            _write_workbook(path)
+
+            # 空行を除くデータ行は5行、dimension上は7行
+            assert len(read_excel_file(path, engine=engine, max_rows=7)) == 5
+            # dimensionが上限を超えても、値のある行が上限以内なら読み込める
+            assert len(read_excel_file(path, engine=engine, max_rows=5)) == 5
+            with pytest.raises(RowLimitExceededError):
+                read_excel_file(path, engine=engine, max_rows=4)
+
+    @pytest.mark.parametrize("engine", ["openpyxl", "native"])
+    def test_row_limit_from_dimension(self, engine):
+        """dimensionが上限を超えても書式だけの空行では却下しないかのテスト"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'test.xlsx')
+            wb = Workbook()
+            ws = wb.active
+            ws.append(['text'])
+            ws.append(['テスト'])
+            # 値のない書式だけのセルでもdimensionは広がる
+            ws.cell(row=1001, column=1).font = Font(bold=True)
+            wb.save(path)
+
+            assert len(read_excel_file(path, engine=engine)) == 1
+            assert len(read_excel_file(path, engine=engine, max_rows=100)) == 1
+
+            # 値のある行が上限を超える場合は却下する
+            for i in range(200):
+                ws.append([f'回答{i}'])
+            wb.save(path)
+            with pytest.raises(RowLimitExceededError):
+                read_excel_file(path, engine=engine, max_rows=100)
+
+    def test_unsupported_sheet(self):
+        """ワークシート以外のシートは入力エラー（未実装の例外ではない）になるかのテスト"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'test.xlsx')
+            wb = Workbook()
+            wb.active.append(['text'])
+            wb.create_chartsheet()
+            wb.active = 1
+            wb.save(path)
+
+            with pytest.raises(UnsupportedXlsxFeature) as excinfo:
+                XlsxSheetReader(path)
+            assert isinstance(excinfo.value, ValueError)
+            assert not isinstance(excinfo.value, NotImplementedError)
+
+    def test_unknown_engine(self):
+        """未対応のエンジン指定のテスト"""
+        with pytest.raises(ValueError):
+            read_excel_file('dummy.xlsx', engine="unknown")
@@ -1 +1 @@
-# Utility functions for the application
+# Utility functions for the application
@@ -0,0 +1,762 @@
+import io
+import json
+import mmap
+import os
+import re
+import shutil
+import tempfile
+import threading
+from array import array
+from collections import OrderedDict
+from collections.abc import Sequence
+from datetime import datetime
+from pathlib import Path
+from typing import List, Dict, Any, Iterable, Optional, Iterator, Set, Tuple
+import logging
+
+import numpy as np
+
+from app.utils.table_utils import ColumnarTable
+
+logger = logging.getLogger(__name__)
+
+# データセットIDはアップロード内容のSHA-256（16進64文字）
+DATASET_ID_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+# データセットに付随して保存するファイル名（タグ集計値や解析状態など）
+SIDE_FILE_PATTERN = re.compile(r"^[A-Za-z0-9_-]+$")
+MANIFEST_FILE = "manifest.json"
+ARTIFACTS_FILE = "artifacts.json"
+FORMAT_VERSION = 1
+# 行を順に読む時に、オフセットなどをまとめてPythonのリストに変換する行数
+ITER_BLOCK_ROWS = 4096
+
+
+class DatasetNotFoundError(LookupError):
+    """指定したデータセットが存在しない場合の例外"""
+
+
+def _json_default(value: Any) -> Any:
+    """日時はpydanticと同じISO形式で、それ以外は文字列で書き出す"""
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)
+
+
+def _directory_size(path: Path) -> int:
+    return sum(entry.stat().st_size for entry in path.iterdir() if entry.is_file())
+
+
+def _numeric_dtype(kind: str):
+    return np.int64 if kind == "int64" else np.float64
+
+
+def _map_file(path: Path):
+    """ファイルを読み取り専用でメモリマップ（空ファイルは空のbytesを返す）"""
+    if path.stat().st_size == 0:
+        return b""
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class MappedNumericColumn(Sequence):
+    """メモリマップした数値列（欠損はマスクで表現）"""
+
+    def __init__(self, values: np.ndarray, valid: Optional[np.ndarray] = None):
+        self.values = values
+        self.valid = valid
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if self.valid is not None and not self.valid[index]:
+            return None
+        return self.values[index].item()
+
+    def __iter__(self) -> Iterator[Any]:
+        values = self.values.tolist()
+        if self.valid is None:
+            return iter(values)
+        return (value if ok else None for value, ok in zip(values, self.valid.tolist()))
+
+    def to_numpy(self) -> np.ndarray:
+        """欠損を含まない場合はコピーせずにメモリマップ配列を返す"""
+        if self.valid is None:
+            return self.values
+        return np.where(self.valid.astype(bool), self.values, np.nan)
+
+
+class MappedStringColumn(Sequence):
+    """メモリマップした文字列列（UTF-8バイト列＋オフセット）"""
+
+    def __init__(self, offsets: np.ndarray, data, valid: Optional[np.ndarray] = None):
+        self.offsets = offsets
+        self.data = data
+        self.valid = valid
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if self.valid is not None and not self.valid[index]:
+            return None
+        return self.data[int(self.offsets[index]):int(self.offsets[index + 1])].decode("utf-8")
+
+    def __iter__(self) -> Iterator[Optional[str]]:
+        data = self.data
+        for block_start in range(0, len(self), ITER_BLOCK_ROWS):
+            block_stop = min(block_start + ITER_BLOCK_ROWS, len(self))
+            offsets = self.offsets[block_start:block_stop + 1].tolist()
+            valid = self.valid[block_start:block_stop].tolist() if self.valid is not None else None
+            for i in range(len(offsets) - 1):
+                if valid is not None and not valid[i]:
+                    yield None
+                else:
+                    yield data[offsets[i]:offsets[i + 1]].decode("utf-8")
+
+
+class MappedTokenLists(Sequence):
+    """メモリマップした行ごとのトークン列（語彙IDの平坦な配列＋行の開始位置＋語彙）"""
+
+    def __init__(self, ids: np.ndarray, offsets: np.ndarray, vocabulary: List[str]):
+        self.ids = ids
+        self.offsets = offsets
+        self.vocabulary = vocabulary
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def row_ids(self, index: int) -> np.ndarray:
+        """1行分の語彙IDを取得"""
+        if index < 0:
+            index += len(self)
+        return self.ids[int(self.offsets[index]):int(self.offsets[index + 1])]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        vocabulary = self.vocabulary
+        return [vocabulary[token_id] for token_id in self.row_ids(index).tolist()]
+
+    def __iter__(self) -> Iterator[List[str]]:
+        # 全行のIDを一度にリストにするとトークン数に比例したメモリを使うので、ITER_BLOCK_ROWS 行ずつ変換する
+        vocabulary = self.vocabulary
+        for block_start in range(0, len(self), ITER_BLOCK_ROWS):
+            offsets = self.offsets[block_start:block_start + ITER_BLOCK_ROWS + 1].tolist()
+            ids = self.ids[offsets[0]:offsets[-1]].tolist()
+            base = offsets[0]
+            for i in range(len(offsets) - 1):
+                yield [vocabulary[token_id] for token_id in ids[offsets[i] - base:offsets[i + 1] - base]]
+
+    def view(self, start: int, stop: Optional[int] = None) -> "MappedTokenLists":
+        """連続した行の範囲をコピーせずに取得"""
+        start, stop, _ = slice(start, stop).indices(len(self))
+        return MappedTokenLists(self.ids, self.offsets[start:max(start, stop) + 1], self.vocabulary)
+
+
+class DatasetStore:
+    """アップロードされたデータを内容ハッシュをキーに列指向のバイナリ形式で保存するストア
+
+    各列は以下のファイルで構成され、読み込み時はメモリマップされる。
+      - 整数 / 浮動小数点列: col_N.values（int64 / float64）
+      - 文字列列: col_N.offsets（int64, 行数+1）と col_N.data（UTF-8）
+      - 欠損を含む列: col_N.valid（uint8, 1=値あり）
+    """
+
+    def __init__(self, store_dir: str = "data/datasets"):
+        self.store_dir = Path(store_dir)
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        # データセットごとのディスク使用量（初回の容量判定時に走査して作成）
+        self._usage: Optional[Dict[str, int]] = None
+        self._lock = threading.Lock()
+
+    def _dataset_dir(self, dataset_id: str) -> Path:
+        if not isinstance(dataset_id, str) or not DATASET_ID_PATTERN.match(dataset_id):
+            raise ValueError(f"不正なデータセットIDです: {dataset_id}")
+        return self.store_dir / dataset_id
+
+    def exists(self, dataset_id: str) -> bool:
+        """データセットが保存済みかどうか"""
+        try:
+            return (self._dataset_dir(dataset_id) / MANIFEST_FILE).exists()
+        except ValueError:
+            return False
+
+    def save(
+        self, dataset_id: str, table: ColumnarTable, source_name: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """テーブルを保存（同じIDが既にあれば何もしない）
+
+        metadata はマニフェストにそのまま記録される（追記元のIDなど）。
+        """
+        def write_columns(temp_dir: Path) -> List[Dict[str, Any]]:
+            columns = []
+            for i, name in enumerate(table.columns):
+                kind, has_nulls = self._write_column(temp_dir, f"col_{i}", table[name])
+                columns.append({"name": name, "file": f"col_{i}", "kind": kind, "nullable": has_nulls})
+            return columns
+
+        return self._save_columns(dataset_id, len(table), write_columns, source_name, metadata)
+
+    def _save_columns(
+        self, dataset_id: str, num_rows: int, write_columns, source_name: Optional[str],
+        metadata: Optional[Dict[str, Any]]
+    ) -> str:
+        """write_columns(一時ディレクトリ) で列を書き出し、マニフェストを付けて保存（同じIDが既にあれば何もしない）"""
+        dataset_dir = self._dataset_dir(dataset_id)
+        if (dataset_dir / MANIFEST_FILE).exists():
+            return dataset_id
+
+        # 一時ディレクトリに書き出してからリネームし、書きかけのデータセットを見せない
+        temp_dir = Path(tempfile.mkdtemp(prefix=f".{dataset_id[:8]}-", dir=self.store_dir))
+        try:
+            columns = write_columns(temp_dir)
+
+            manifest = {
+                "dataset_id": dataset_id,
+                "format_version": FORMAT_VERSION,
+                "num_rows": num_rows,
+                "columns": columns,
+                "source_name": source_name,
+                "created_at": datetime.now().isoformat()
+            }
+            if metadata:
+                manifest.update(metadata)
+            with open(temp_dir / MANIFEST_FILE, "w", encoding="utf-8") as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=2, default=str)
+
+            size = _directory_size(temp_dir)
+            try:
+                os.rename(temp_dir, dataset_dir)
+            except OSError:
+                # 並行して同じデータセットが保存された場合はそちらを使う
+                if not (dataset_dir / MANIFEST_FILE).exists():
+                    raise
+                shutil.rmtree(temp_dir, ignore_errors=True)
+            else:
+                self._add_usage(dataset_id, size)
+        except Exception:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            raise
+
+        logger.info(f"Dataset saved: {dataset_id} ({num_rows} rows, {len(columns)} columns)")
+        return dataset_id
+
+    def _write_column(self, directory: Path, prefix: str, values) -> tuple:
+        """1列を書き出し、（種類, 欠損の有無）を返す"""
+        if isinstance(values, array) and values.typecode in ("q", "d"):
+            dtype = np.int64 if values.typecode == "q" else np.float64
+            np.frombuffer(values, dtype=dtype).tofile(directory / f"{prefix}.values")
+            return ("int64" if dtype is np.int64 else "float64"), False
+
+        values = list(values)
+        valid = np.fromiter((value is not None for value in values), dtype=np.uint8, count=len(values))
+        has_nulls = not bool(valid.all())
+        if has_nulls:
+            valid.tofile(directory / f"{prefix}.valid")
+
+        present_types = {type(value) for value in values if value is not None}
+        if present_types and present_types <= {int, float}:
+            dtype = np.int64 if present_types == {int} else np.float64
+            try:
+                numeric = np.array([0 if value is None else value for value in values], dtype=dtype)
+                numeric.tofile(directory / f"{prefix}.values")
+                return ("int64" if dtype is np.int64 else "float64"), has_nulls
+            except OverflowError:
+                pass
+
+        # 文字列以外（日時や型の混在した列）は文字列に変換して保存する
+        kind = "string" if present_types <= {str} else "text"
+        offsets = np.zeros(len(values) + 1, dtype=np.int64)
+        with open(directory / f"{prefix}.data", "wb") as f:
+            position = 0
+            for i, value in enumerate(values):
+                if value is not None:
+                    encoded = (value if isinstance(value, str) else str(value)).encode("utf-8")
+                    f.write(encoded)
+                    position += len(encoded)
+                offsets[i + 1] = position
+        offsets.tofile(directory / f"{prefix}.offsets")
+        return kind, has_nulls
+
+    def get_manifest(self, dataset_id: str) -> Dict[str, Any]:
+        """マニフェストを取得"""
+        manifest_path = self._dataset_dir(dataset_id) / MANIFEST_FILE
+        if not manifest_path.exists():
+            raise DatasetNotFoundError(dataset_id)
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def load(self, dataset_id: str, columns: Optional[List[str]] = None) -> ColumnarTable:
+        """データセットを読み込む（指定した列だけをメモリマップ）"""
+        manifest = self.get_manifest(dataset_id)
+        dataset_dir = self._dataset_dir(dataset_id)
+        entries = {entry["name"]: entry for entry in manifest["columns"]}
+        names = columns if columns is not None else [entry["name"] for entry in manifest["columns"]]
+
+        missing = [name for name in names if name not in entries]
+        if missing:
+            raise ValueError(f"データセットに列が見つかりません: {missing}")
+
+        num_rows = manifest["num_rows"]
+        data = [self._map_column(dataset_dir, entries[name], num_rows) for name in names]
+        self.touch(dataset_id)
+        return ColumnarTable(names, data)
+
+    def touch(self, dataset_id: str) -> bool:
+        """最終アクセス時刻を更新（容量超過時の削除順に使う）し、存在するかを返す"""
+        try:
+            os.utime(self._dataset_dir(dataset_id) / MANIFEST_FILE)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def append(
+        self, parent_id: str, dataset_id: str, rows: ColumnarTable, source_name: Optional[str] = None
+    ) -> str:
+        """既存データセットの末尾に行を追加した新しいデータセットを保存
+
+        元のデータセットは変更しない。新しいデータセットのマニフェストには追記元（parent_id）と
+        追加行の開始位置（dirty_from）を記録し、解析結果などを差分だけで更新できるようにする。
+        """
+        manifest = self.get_manifest(parent_id)
+        parent_dir = self._dataset_dir(parent_id)
+        entries = manifest["columns"]
+        unknown = [name for name in rows.columns if name not in {entry["name"] for entry in entries}]
+        if unknown:
+            raise ValueError(f"追記元のデータセットにない列があります: {unknown}")
+
+        num_rows = manifest["num_rows"]
+        n_new = len(rows)
+
+        def write_columns(temp_dir: Path) -> List[Dict[str, Any]]:
+            columns = []
+            for i, entry in enumerate(entries):
+                name = entry["name"]
+                new_values = rows[name] if name in rows else [None] * n_new
+                kind, has_nulls = self._append_column(
+                    parent_dir, entry, num_rows, temp_dir, f"col_{i}", new_values
+                )
+                columns.append({"name": name, "file": f"col_{i}", "kind": kind, "nullable": has_nulls})
+            return columns
+
+        self.touch(parent_id)
+        metadata = {"parent_id": parent_id, "dirty_from": num_rows}
+        return self._save_columns(dataset_id, num_rows + n_new, write_columns, source_name, metadata)
+
+    def _append_column(
+        self, parent_dir: Path, entry: Dict[str, Any], num_rows: int, directory: Path, prefix: str, new_values
+    ) -> tuple:
+        """追記元の1列の後ろに new_values を付けて書き出し、（種類, 欠損の有無）を返す
+
+        追記元の列はファイルのバイト列のままコピーし、追加行だけを変換する。
+        追加行の型で列の種類が変わる場合（数値の列に文字列を追加するなど）だけ、追記元の値も読み直す。
+        """
+        new_values = list(new_values)
+        n_new = len(new_values)
+        parent_kind = entry["kind"]
+        parent_prefix = parent_dir / entry["file"]
+
+        # 追加行を先に書き出して種類を調べる（値のない列は追記元の種類に合わせる）
+        new_dir = directory / ".new"
+        new_dir.mkdir(exist_ok=True)
+        try:
+            has_values = any(value is not None for value in new_values)
+            new_kind, new_nulls = self._write_column(new_dir, prefix, new_values)
+            kinds = {parent_kind, new_kind} if has_values else {parent_kind}
+            if len(kinds) == 1:
+                kind = parent_kind
+            elif kinds == {"int64", "float64"}:
+                kind = "float64"
+            elif kinds == {"string", "text"}:
+                kind = "text"
+            else:
+                values = list(self._map_column(parent_dir, entry, num_rows))
+                values.extend(new_values)
+                return self._write_column(directory, prefix, values)
+
+            new_prefix = new_dir / prefix
+            if kind in ("int64", "float64"):
+                dtype = _numeric_dtype(kind)
+                added = np.fromfile(f"{new_prefix}.values", dtype=_numeric_dtype(new_kind)) \
+                    if has_values else np.zeros(n_new, dtype=dtype)
+                with open(directory / f"{prefix}.values", "wb") as f:
+                    if parent_kind == kind:
+                        with open(f"{parent_prefix}.values", "rb") as source:
+                            shutil.copyfileobj(source, f)
+                    else:
+                        # 整数の列に小数を追加した場合は追記元を float64 に変換する
+                        parent_values = np.fromfile(f"{parent_prefix}.values", dtype=_numeric_dtype(parent_kind))
+                        f.write(parent_values.astype(dtype).tobytes())
+                    f.write(added.astype(dtype).tobytes())
+            else:
+                with open(directory / f"{prefix}.data", "wb") as f:
+                    with open(f"{parent_prefix}.data", "rb") as source:
+                        shutil.copyfileobj(source, f)
+                    if has_values:
+                        with open(f"{new_prefix}.data", "rb") as source:
+                            shutil.copyfileobj(source, f)
+                parent_offsets = np.fromfile(f"{parent_prefix}.offsets", dtype=np.int64)
+                added = np.fromfile(f"{new_prefix}.offsets", dtype=np.int64) if has_values \
+                    else np.zeros(n_new + 1, dtype=np.int64)
+                with open(directory / f"{prefix}.offsets", "wb") as f:
+                    with open(f"{parent_prefix}.offsets", "rb") as source:
+                        shutil.copyfileobj(source, f)
+                    f.write((added[1:] + parent_offsets[-1]).tobytes())
+
+            has_nulls = bool(entry.get("nullable")) or new_nulls
+            if has_nulls:
+                with open(directory / f"{prefix}.valid", "wb") as f:
+                    if entry.get("nullable"):
+                        with open(f"{parent_prefix}.valid", "rb") as source:
+                            shutil.copyfileobj(source, f)
+                    else:
+                        f.write(np.ones(num_rows, dtype=np.uint8).tobytes())
+                    if new_nulls:
+                        with open(f"{new_prefix}.valid", "rb") as source:
+                            shutil.copyfileobj(source, f)
+                    else:
+                        f.write(np.ones(n_new, dtype=np.uint8).tobytes())
+            return kind, has_nulls
+        finally:
+            shutil.rmtree(new_dir, ignore_errors=True)
+
+    def _write_side_file(self, dataset_id: str, file_name: str, content: bytes) -> int:
+        """データセットのディレクトリにファイルを書き込み（置き換えはアトミック）"""
+        dataset_dir = self._dataset_dir(dataset_id)
+        if not (dataset_dir / MANIFEST_FILE).exists():
+            raise DatasetNotFoundError(dataset_id)
+
+        path = dataset_dir / file_name
+        previous = path.stat().st_size if path.exists() else 0
+        temp_path = dataset_dir / f".{file_name}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(content)
+        os.replace(temp_path, path)
+        self._add_usage(dataset_id, len(content) - previous)
+        return len(content)
+
+    def _read_side_file(self, dataset_id: str, file_name: str) -> Optional[bytes]:
+        try:
+            path = self._dataset_dir(dataset_id) / file_name
+        except ValueError:
+            return None
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _side_file_name(name: str, extension: str) -> str:
+        if not SIDE_FILE_PATTERN.match(name):
+            raise ValueError(f"不正なファイル名です: {name}")
+        return f"{name}{extension}"
+
+    def save_artifacts(self, dataset_id: str, artifacts: Dict[str, Any]) -> int:
+        """サンプル行やタグ候補などの派生データを保存し、書き込んだバイト数を返す"""
+        encoded = json.dumps(artifacts, ensure_ascii=False, default=_json_default).encode("utf-8")
+        return self._write_side_file(dataset_id, ARTIFACTS_FILE, encoded)
+
+    def load_artifacts(self, dataset_id: str) -> Optional[Tuple[Dict[str, Any], int]]:
+        """派生データと（キャッシュ容量計算用の）バイト数を取得（未保存ならNone）"""
+        encoded = self._read_side_file(dataset_id, ARTIFACTS_FILE)
+        if encoded is None:
+            return None
+        self.touch(dataset_id)
+        return json.loads(encoded), len(encoded)
+
+    def save_json(self, dataset_id: str, name: str, data: Any) -> None:
+        """データセットに付随するJSONを保存"""
+        encoded = json.dumps(data, ensure_ascii=False, default=_json_default).encode("utf-8")
+        self._write_side_file(dataset_id, self._side_file_name(name, ".json"), encoded)
+
+    def load_json(self, dataset_id: str, name: str) -> Optional[Any]:
+        """データセットに付随するJSONを読み込み（未保存ならNone）"""
+        encoded = self._read_side_file(dataset_id, self._side_file_name(name, ".json"))
+        return json.loads(encoded) if encoded is not None else None
+
+    def save_arrays(self, dataset_id: str, name: str, arrays: Dict[str, np.ndarray]) -> None:
+        """データセットに付随する配列の組を保存（npz形式）"""
+        buffer = io.BytesIO()
+        np.savez(buffer, **arrays)
+        self._write_side_file(dataset_id, self._side_file_name(name, ".npz"), buffer.getvalue())
+
+    def load_arrays(self, dataset_id: str, name: str) -> Optional[Dict[str, np.ndarray]]:
+        """データセットに付随する配列の組を読み込み（未保存ならNone）"""
+        encoded = self._read_side_file(dataset_id, self._side_file_name(name, ".npz"))
+        if encoded is None:
+            return None
+        with np.load(io.BytesIO(encoded), allow_pickle=False) as bundle:
+            return {key: bundle[key] for key in bundle.files}
+
+    def save_token_lists(self, dataset_id: str, name: str, token_lists: Iterable[Iterable[str]]) -> int:
+        """行ごとのトークン列を保存し、書き込んだバイト数を返す
+
+        語彙IDの平坦な配列（name.ids, int32）、行の開始位置（name.offsets, int64, 行数+1）、
+        語彙（name.vocab.json）の3ファイルで構成し、語彙を最後に書き込む。
+        """
+        self._side_file_name(name, "")
+        vocabulary: Dict[str, int] = {}
+        ids = array("i")
+        offsets = array("q", [0])
+        for tokens in token_lists:
+            for token in tokens:
+                token_id = vocabulary.get(token)
+                if token_id is None:
+                    token_id = vocabulary[token] = len(vocabulary)
+                ids.append(token_id)
+            offsets.append(len(ids))
+
+        size = self._write_side_file(dataset_id, f"{name}.ids", ids.tobytes())
+        size += self._write_side_file(dataset_id, f"{name}.offsets", offsets.tobytes())
+        header = {"num_rows": len(offsets) - 1, "num_tokens": len(ids), "vocabulary": list(vocabulary)}
+        size += self._write_side_file(
+            dataset_id, f"{name}.vocab.json", json.dumps(header, ensure_ascii=False).encode("utf-8")
+        )
+        return size
+
+    def load_token_lists(self, dataset_id: str, name: str) -> Optional[MappedTokenLists]:
+        """保存済みのトークン列をメモリマップで読み込み（未保存・書き込み途中ならNone）"""
+        encoded = self._read_side_file(dataset_id, self._side_file_name(name, ".vocab.json"))
+        if encoded is None:
+            return None
+        header = json.loads(encoded)
+        dataset_dir = self._dataset_dir(dataset_id)
+        num_rows, num_tokens = header["num_rows"], header["num_tokens"]
+        try:
+            if (dataset_dir / f"{name}.ids").stat().st_size != num_tokens * 4 \
+                    or (dataset_dir / f"{name}.offsets").stat().st_size != (num_rows + 1) * 8:
+                return None
+        except FileNotFoundError:
+            return None
+
+        ids = np.memmap(dataset_dir / f"{name}.ids", dtype=np.int32, mode="r", shape=(num_tokens,)) \
+            if num_tokens else np.zeros(0, dtype=np.int32)
+        offsets = np.memmap(dataset_dir / f"{name}.offsets", dtype=np.int64, mode="r", shape=(num_rows + 1,))
+        self.touch(dataset_id)
+        return MappedTokenLists(ids, offsets, header["vocabulary"])
+
+    def delete_side_files(self, dataset_id: str, prefix: str, keep: Optional[str] = None) -> int:
+        """名前が prefix で始まる付随ファイルを削除（keep で始まるものは残す）し、削除した数を返す"""
+        self._side_file_name(prefix, "")
+        try:
+            dataset_dir = self._dataset_dir(dataset_id)
+        except ValueError:
+            return 0
+        removed = 0
+        for path in dataset_dir.glob(f"{prefix}*"):
+            if keep is not None and path.name.startswith(keep):
+                continue
+            try:
+                size = path.stat().st_size
+                path.unlink()
+            except FileNotFoundError:
+                continue
+            self._add_usage(dataset_id, -size)
+            removed += 1
+        return removed
+
+    def _add_usage(self, dataset_id: str, size: int) -> None:
+        with self._lock:
+            if self._usage is not None:
+                self._usage[dataset_id] = self._usage.get(dataset_id, 0) + size
+
+    def _scan_usage(self) -> Dict[str, int]:
+        if self._usage is None:
+            usage = {}
+            for dataset_dir in self.store_dir.iterdir():
+                if dataset_dir.is_dir() and DATASET_ID_PATTERN.match(dataset_dir.name):
+                    usage[dataset_dir.name] = _directory_size(dataset_dir)
+            self._usage = usage
+        return self._usage
+
+    def disk_usage(self) -> int:
+        """保存済みデータセットの合計バイト数"""
+        with self._lock:
+            return sum(self._scan_usage().values())
+
+    def evict(self, max_bytes: int, keep: Optional[Set[str]] = None) -> List[str]:
+        """合計サイズが上限以下になるまで最終アクセスの古い順に削除し、削除したIDを返す"""
+        keep = keep or set()
+        with self._lock:
+            usage = self._scan_usage()
+            total = sum(usage.values())
+            if total <= max_bytes:
+                return []
+
+            def last_access(dataset_id: str) -> float:
+                try:
+                    return (self.store_dir / dataset_id / MANIFEST_FILE).stat().st_mtime
+                except FileNotFoundError:
+                    return 0.0
+
+            evicted = []
+            for dataset_id in sorted(usage, key=last_access):
+                if total <= max_bytes:
+                    break
+                if dataset_id in keep:
+                    continue
+                shutil.rmtree(self.store_dir / dataset_id, ignore_errors=True)
+                total -= usage.pop(dataset_id)
+                evicted.append(dataset_id)
+
+        if evicted:
+            logger.info(f"Evicted {len(evicted)} datasets to stay under {max_bytes} bytes")
+        return evicted
+
+    def _map_column(self, directory: Path, entry: Dict[str, Any], num_rows: int) -> Sequence:
+        prefix = entry["file"]
+        valid = None
+        if entry.get("nullable"):
+            valid = np.memmap(directory / f"{prefix}.valid", dtype=np.uint8, mode="r", shape=(num_rows,)) \
+                if num_rows else np.zeros(0, dtype=np.uint8)
+
+        kind = entry["kind"]
+        if kind in ("int64", "float64"):
+            dtype = np.int64 if kind == "int64" else np.float64
+            values = np.memmap(directory / f"{prefix}.values", dtype=dtype, mode="r", shape=(num_rows,)) \
+                if num_rows else np.zeros(0, dtype=dtype)
+            return MappedNumericColumn(values, valid)
+
+        offsets = np.memmap(directory / f"{prefix}.offsets", dtype=np.int64, mode="r", shape=(num_rows + 1,))
+        return MappedStringColumn(offsets, _map_file(directory / f"{prefix}.data"), valid)
+
+    def list_datasets(self) -> List[Dict[str, Any]]:
+        """保存されたデータセット一覧を取得"""
+        datasets = []
+        for manifest_path in self.store_dir.glob(f"*/{MANIFEST_FILE}"):
+            try:
+                with open(manifest_path, "r", encoding="utf-8") as f:
+                    manifest = json.load(f)
+                datasets.append({
+                    "dataset_id": manifest["dataset_id"],
+                    "num_rows": manifest["num_rows"],
+                    "columns": [entry["name"] for entry in manifest["columns"]],
+                    "source_name": manifest.get("source_name"),
+                    "created_at": manifest.get("created_at", "")
+                })
+            except Exception as e:
+                logger.warning(f"Failed to read dataset manifest {manifest_path}: {e}")
+        datasets.sort(key=lambda x: x.get("created_at", ""), reverse=True)
+        return datasets
+
+    def delete(self, dataset_id: str) -> bool:
+        """データセットを削除"""
+        dataset_dir = self._dataset_dir(dataset_id)
+        if not dataset_dir.exists():
+            return False
+        shutil.rmtree(dataset_dir)
+        with self._lock:
+            if self._usage is not None:
+                self._usage.pop(dataset_id, None)
+        logger.info(f"Dataset deleted: {dataset_id}")
+        return True
+
+
+class UploadCache:
+    """アップロード結果（列名・サンプル行・タグ候補）を内容ハッシュで引くLRUキャッシュ
+
+    メモリ上の結果は max_memory_bytes、ディスク上のデータセットは max_disk_bytes を上限とし、
+    超えた分は最も長く使われていないものから削除する。
+    """
+
+    def __init__(self, store: DatasetStore, max_memory_bytes: int, max_disk_bytes: int):
+        self.store = store
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self._entries: "OrderedDict[str, Tuple[Dict[str, Any], int]]" = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, dataset_id: str) -> Optional[Dict[str, Any]]:
+        """キャッシュ済みのアップロード結果を取得（メモリ→ディスクの順に探す）"""
+        with self._lock:
+            entry = self._entries.get(dataset_id)
+
+        if entry is not None:
+            # ディスク上のデータセットが削除されていればメモリ上の結果も使わない
+            alive = self.store.touch(dataset_id)
+            with self._lock:
+                if alive:
+                    if dataset_id in self._entries:
+                        self._entries.move_to_end(dataset_id)
+                    self.hits += 1
+                    return entry[0]
+                self._forget(dataset_id)
+                self.misses += 1
+            return None
+
+        loaded = self.store.load_artifacts(dataset_id)
+        with self._lock:
+            if loaded is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._remember(dataset_id, *loaded)
+        return loaded[0]
+
+    def put(
+        self, dataset_id: str, table: ColumnarTable, artifacts: Dict[str, Any],
+        source_name: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """テーブルと派生データを保存し、容量上限を超えた分を削除
+
+        キャッシュ命中時と同じ応答になるよう、JSON変換後の派生データを返す。
+        """
+        self.store.save(dataset_id, table, source_name)
+        size = self.store.save_artifacts(dataset_id, artifacts)
+        cached = json.loads(json.dumps(artifacts, ensure_ascii=False, default=_json_default))
+
+        evicted = self.store.evict(self.max_disk_bytes, keep={dataset_id})
+        with self._lock:
+            self._remember(dataset_id, cached, size)
+            for evicted_id in evicted:
+                self._forget(evicted_id)
+        return cached
+
+    def update(self, dataset_id: str, changes: Dict[str, Any]) -> Dict[str, Any]:
+        """保存済みの派生データの一部を書き換え"""
+        loaded = self.store.load_artifacts(dataset_id)
+        if loaded is None:
+            raise DatasetNotFoundError(dataset_id)
+        artifacts = {**loaded[0], **changes}
+        size = self.store.save_artifacts(dataset_id, artifacts)
+        cached = json.loads(json.dumps(artifacts, ensure_ascii=False, default=_json_default))
+        with self._lock:
+            self._remember(dataset_id, cached, size)
+        return cached
+
+    def _remember(self, dataset_id: str, artifacts: Dict[str, Any], size: int) -> None:
+        self._forget(dataset_id)
+        if size > self.max_memory_bytes:
+            return
+        self._entries[dataset_id] = (artifacts, size)
+        self._memory_bytes += size
+        while self._memory_bytes > self.max_memory_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self._memory_bytes -= evicted_size
+
+    def _forget(self, dataset_id: str) -> None:
+        entry = self._entries.pop(dataset_id, None)
+        if entry is not None:
+            self._memory_bytes -= entry[1]
+
+    def stats(self) -> Dict[str, int]:
+        """キャッシュの統計情報"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "memory_bytes": self._memory_bytes,
+                "hits": self.hits,
+                "misses": self.misses
+            }
@@ -0,0 +1,64 @@
+import hashlib
+import logging
+import time
+from typing import Any, List, Optional
+
+from app.utils.dataset_store import DatasetStore, MappedTokenLists
+from app.utils.table_utils import ColumnarTable
+from app.utils.text_utils import tokenize_texts, tokenizer_fingerprint
+
+logger = logging.getLogger(__name__)
+
+
+def token_cache_prefix(text_column: Any, tokenizer_mode: str) -> str:
+    """列とトークナイザーごとのトークン列のファイル名の接頭辞"""
+    column_hash = hashlib.sha1(str(text_column).encode("utf-8")).hexdigest()[:12]
+    return f"tokens-{tokenizer_mode}-{column_hash}-"
+
+
+def token_cache_name(text_column: Any, tokenizer_mode: str) -> str:
+    """トークン列のファイル名（トークン化の設定が変わると別の名前になる）"""
+    return token_cache_prefix(text_column, tokenizer_mode) + tokenizer_fingerprint(tokenizer_mode)
+
+
+def load_dataset_tokens(
+    store: DatasetStore,
+    dataset_id: str,
+    text_column: Any,
+    tokenizer_mode: str,
+    table: Optional[ColumnarTable] = None,
+    workers: Optional[int] = None
+) -> MappedTokenLists:
+    """データセットの本文列のトークン列を取得（保存済みならメモリマップし、なければ作成して保存）
+
+    行はデータセットの行と1対1に対応する（空の本文は空のトークン列）。
+    追記で作られたデータセットは、追記元に同じ設定のトークン列があれば追加行だけをトークン化する。
+    """
+    name = token_cache_name(text_column, tokenizer_mode)
+    cached = store.load_token_lists(dataset_id, name)
+    if cached is not None:
+        return cached
+
+    start = time.perf_counter()
+    if table is None or text_column not in table:
+        table = store.load(dataset_id, [text_column])
+    texts = table.text_values(text_column)
+
+    token_lists: List[List[str]] = []
+    manifest = store.get_manifest(dataset_id)
+    parent_id = manifest.get("parent_id")
+    if parent_id:
+        parent_tokens = store.load_token_lists(parent_id, name)
+        if parent_tokens is not None and len(parent_tokens) == manifest["dirty_from"]:
+            token_lists = list(parent_tokens)
+    reused = len(token_lists)
+    token_lists.extend(tokenize_texts(texts[reused:], tokenizer_mode, workers))
+
+    # 設定が変わる前のトークン列は使われないので削除する
+    store.delete_side_files(dataset_id, token_cache_prefix(text_column, tokenizer_mode), keep=name)
+    store.save_token_lists(dataset_id, name, token_lists)
+    logger.info(
+        f"Tokenized {len(texts) - reused} rows of {dataset_id} ({tokenizer_mode}, "
+        f"{reused} rows reused from the parent) in {time.perf_counter() - start:.2f}s"
+    )
+    return store.load_token_lists(dataset_id, name)
@@ -0,0 +1,317 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from app.utils.text_utils import normalize_text
+
+try:
+    import fcntl
+except ImportError:  # Windows ではプロセス間のロックを行わない
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = "index.sqlite3"
+LOCK_FILE = "cache.lock"
+VECTORS_FILE = "embeddings.bin"
+EMBEDDING_DTYPES = ("float16", "float32")
+# SQLiteの1文に渡すパラメータ数
+LOOKUP_CHUNK_SIZE = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS slots (
+    slot INTEGER PRIMARY KEY,
+    key TEXT UNIQUE,
+    last_used INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS slots_last_used ON slots (last_used);
+"""
+
+
+class EmbeddingCache:
+    """(モデル名, 正規化したテキストのハッシュ) をキーにした埋め込みベクトルのディスクキャッシュ
+
+    モデルごとのディレクトリに以下を保存し、同じディレクトリを複数のプロセス（preforkのワーカー）で共有できる。
+      - embeddings.bin: max_entries 行×次元の行列（メモリマップ、行がキャッシュの枠）
+      - index.sqlite3: 枠ごとのキー（空き枠は NULL）と最終利用時刻（LRU）、次元・型などの設定
+    読み込みは共有ロック、書き込みは排他ロック（fcntl）の中で行い、枠は索引から外してから上書きするので、
+    他のプロセスが書き換えた枠を古いキーで読むことはない。行列を作り直した場合は世代番号で検知して開き直す。
+    上限を超えると最も長く使われていないものから枠を再利用する。
+    埋め込みは正規化したテキストから計算し、キャッシュと同じ型に丸めて返すので、
+    同じテキストはキャッシュの有無によらず同じベクトルになる。
+    """
+
+    def __init__(self, cache_dir: str, model_name: str, max_entries: int = 200000, dtype: str = "float16"):
+        if dtype not in EMBEDDING_DTYPES:
+            logger.error(f"Unsupported embedding cache dtype: {dtype}")
+            raise ValueError(f"埋め込みキャッシュの型は {EMBEDDING_DTYPES} のいずれかを指定してください: {dtype}")
+        if max_entries < 1:
+            logger.error(f"Invalid embedding cache size: {max_entries}")
+            raise ValueError(f"埋め込みキャッシュの上限は1以上を指定してください: {max_entries}")
+
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.dtype = np.dtype(dtype)
+        model_key = hashlib.sha1(model_name.encode("utf-8")).hexdigest()[:16]
+        self.cache_dir = Path(cache_dir) / model_key
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock_file = None
+        self._vectors: Optional[np.memmap] = None
+        self._dim: Optional[int] = None
+        self._generation: Optional[str] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def text_key(normalized_text: str) -> str:
+        """正規化したテキストのキャッシュキー（SHA-1）"""
+        return hashlib.sha1(normalized_text.encode("utf-8")).hexdigest()
+
+    @property
+    def _vectors_path(self) -> Path:
+        return self.cache_dir / VECTORS_FILE
+
+    @contextmanager
+    def _file_lock(self, exclusive: bool) -> Iterator[None]:
+        """プロセス間のロック（読み込みは共有、書き込みは排他）"""
+        if fcntl is None:
+            yield
+            return
+        fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """索引の書き込みトランザクション"""
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            yield self._db
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        self._db.execute("COMMIT")
+
+    def _open(self) -> None:
+        """索引を開く（初回のみ。設定が変わっていれば空にする）"""
+        if self._db is not None:
+            return
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._lock_file = open(self.cache_dir / LOCK_FILE, "a+b")
+        self._db = sqlite3.connect(
+            str(self.cache_dir / INDEX_FILE), timeout=60, isolation_level=None, check_same_thread=False
+        )
+        with self._file_lock(exclusive=True):
+            self._db.executescript(_SCHEMA)
+            meta = self._meta()
+            settings = {"model": self.model_name, "dtype": self.dtype.name, "max_entries": str(self.max_entries)}
+            if any(meta.get(name, value) != value for name, value in settings.items()):
+                logger.info(f"Embedding cache settings changed, starting empty: {self.cache_dir}")
+                self._reset(None)
+            with self._transaction() as db:
+                db.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)", settings.items())
+                db.execute("INSERT OR IGNORE INTO meta VALUES ('generation', '0')")
+                db.execute("INSERT OR IGNORE INTO meta VALUES ('clock', '0')")
+
+    def _meta(self) -> Dict[str, str]:
+        return dict(self._db.execute("SELECT name, value FROM meta"))
+
+    def _sync_vectors(self) -> None:
+        """他のプロセスが行列を作り直していれば開き直す（ロックの中で呼ぶ）"""
+        meta = self._meta()
+        if meta.get("generation") == self._generation:
+            return
+        self._generation = meta.get("generation")
+        self._dim = int(meta["dim"]) if "dim" in meta else None
+        self._vectors = None
+        if self._dim is not None:
+            self._vectors = np.memmap(
+                self._vectors_path, dtype=self.dtype, mode="r+", shape=(self.max_entries, self._dim)
+            )
+
+    def _reset(self, dim: Optional[int]) -> None:
+        """全ての枠を空にし、dim 列の行列を作り直す（排他ロックの中で呼ぶ）"""
+        if dim is not None:
+            # 他のプロセスがメモリマップしている行列を切り詰めないよう、別のファイルを作って置き換える
+            temp_path = self.cache_dir / f".{VECTORS_FILE}.{os.getpid()}.tmp"
+            vectors = np.memmap(temp_path, dtype=self.dtype, mode="w+", shape=(self.max_entries, dim))
+            vectors.flush()
+            del vectors
+            os.replace(temp_path, self._vectors_path)
+        elif self._vectors_path.exists():
+            self._vectors_path.unlink()
+        with self._transaction() as db:
+            db.execute("DELETE FROM slots")
+            if dim is None:
+                db.execute("DELETE FROM meta WHERE name = 'dim'")
+            else:
+                db.execute("INSERT OR REPLACE INTO meta VALUES ('dim', ?)", (str(dim),))
+            db.execute("UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE name = 'generation'")
+
+    def _tick(self, db: sqlite3.Connection) -> int:
+        """LRUの時刻を1つ進めて返す（トランザクションの中で呼ぶ）"""
+        db.execute("UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE name = 'clock'")
+        return int(db.execute("SELECT value FROM meta WHERE name = 'clock'").fetchone()[0])
+
+    def _lookup(self, keys: Iterable[str]) -> Dict[str, int]:
+        """キャッシュ済みのキー→枠番号"""
+        keys = list(keys)
+        found: Dict[str, int] = {}
+        for start in range(0, len(keys), LOOKUP_CHUNK_SIZE):
+            chunk = keys[start:start + LOOKUP_CHUNK_SIZE]
+            placeholders = ",".join("?" * len(chunk))
+            found.update(self._db.execute(f"SELECT key, slot FROM slots WHERE key IN ({placeholders})", chunk))
+        return found
+
+    def _allocate_slots(self, n_slots: int) -> List[int]:
+        """新しいキーのための枠を確保し、索引から外した状態でコミットする（排他ロックの中で呼ぶ）
+
+        空き枠、未使用の枠、最も長く使われていない枠の順に使う。
+        """
+        with self._transaction() as db:
+            slots = [row[0] for row in db.execute(
+                "SELECT slot FROM slots WHERE key IS NULL ORDER BY slot LIMIT ?", (n_slots,)
+            )]
+            n_allocated = db.execute("SELECT COUNT(*) FROM slots").fetchone()[0]
+            new_slots = list(range(n_allocated, min(self.max_entries, n_allocated + n_slots - len(slots))))
+            db.executemany("INSERT INTO slots (slot) VALUES (?)", [(slot,) for slot in new_slots])
+            slots.extend(new_slots)
+            if len(slots) < n_slots:
+                evicted = [row[0] for row in db.execute(
+                    "SELECT slot FROM slots WHERE key IS NOT NULL ORDER BY last_used, slot LIMIT ?",
+                    (n_slots - len(slots),)
+                )]
+                db.executemany("UPDATE slots SET key = NULL WHERE slot = ?", [(slot,) for slot in evicted])
+                self.evictions += len(evicted)
+                slots.extend(evicted)
+        return slots
+
+    def _encode(self, encode: Callable[[List[str]], Any], texts: Dict[str, str]) -> Dict[str, np.ndarray]:
+        """キー→テキストの埋め込みを計算し、キャッシュと同じ型に丸める（2回目以降にキャッシュから返す値と揃える）"""
+        vectors = np.asarray(encode(list(texts.values())), dtype=np.float32)
+        return dict(zip(texts, vectors.astype(self.dtype).astype(np.float32)))
+
+    def get_or_compute(self, texts: Sequence[str], encode: Callable[[List[str]], Any]) -> np.ndarray:
+        """テキストの埋め込み（float32, テキスト数×次元）を返す
+
+        キャッシュにないテキストだけ（重複を除き、正規化したテキストで）encode を呼ぶ。
+        """
+        normalized_texts = [normalize_text(text) for text in texts]
+        keys = [self.text_key(text) for text in normalized_texts]
+        with self._lock:
+            self._open()
+            cached: Dict[str, np.ndarray] = {}
+            with self._file_lock(exclusive=False):
+                self._sync_vectors()
+                found = self._lookup(set(keys)) if self._vectors is not None else {}
+                if found:
+                    found_keys = list(found)
+                    rows = np.asarray(self._vectors[[found[key] for key in found_keys]], dtype=np.float32)
+                    cached = dict(zip(found_keys, rows))
+                    with self._transaction() as db:
+                        now = self._tick(db)
+                        slots = list(found.values())
+                        for start in range(0, len(slots), LOOKUP_CHUNK_SIZE):
+                            chunk = slots[start:start + LOOKUP_CHUNK_SIZE]
+                            placeholders = ",".join("?" * len(chunk))
+                            db.execute(f"UPDATE slots SET last_used = ? WHERE slot IN ({placeholders})", [now] + chunk)
+
+            missing: Dict[str, str] = {}
+            for key, text in zip(keys, normalized_texts):
+                if key not in cached and key not in missing:
+                    missing[key] = text
+            n_hits = sum(1 for key in keys if key in cached)
+            self.hits += n_hits
+            self.misses += len(keys) - n_hits
+
+            computed: Dict[str, np.ndarray] = {}
+            if missing:
+                computed = self._encode(encode, missing)
+                dim = len(next(iter(computed.values())))
+                if cached and dim != self._dim:
+                    # 同じモデル名で次元が変わった: ヒットした分も計算し直す（行列は保存時に作り直す）
+                    logger.warning(f"Embedding dimension changed ({self._dim} -> {dim}), rebuilding cache")
+                    computed.update(self._encode(encode, {
+                        key: text for key, text in zip(keys, normalized_texts) if key in cached
+                    }))
+                    cached = {}
+                self._store(computed, dim)
+
+            # キーごとのベクトルを1つの行列にまとめ、テキストの順に並べる
+            vectors = {**cached, **computed}
+            if not vectors:
+                return np.zeros((len(keys), 0), dtype=np.float32)
+            positions = {key: i for i, key in enumerate(vectors)}
+            return np.stack(list(vectors.values()))[[positions[key] for key in keys]]
+
+    def _store(self, computed: Dict[str, np.ndarray], dim: int) -> None:
+        """計算した埋め込みを枠に書き込み、索引を更新"""
+        with self._file_lock(exclusive=True):
+            self._sync_vectors()
+            if self._dim != dim:
+                self._reset(dim)
+                self._sync_vectors()
+
+            # 待っている間に他のプロセスが保存したキーは書き込まない。上限を超える分は後ろの max_entries 件だけ
+            present = self._lookup(computed)
+            items = [(key, vector) for key, vector in computed.items() if key not in present][-self.max_entries:]
+            if not items:
+                return
+            # 追い出した枠は索引から外してから上書きする（途中で落ちても古いキーで引かれない）
+            slots = self._allocate_slots(len(items))
+            self._vectors[slots] = np.stack([vector for _, vector in items])
+            self._vectors.flush()
+            with self._transaction() as db:
+                now = self._tick(db)
+                db.executemany("UPDATE slots SET key = ?, last_used = ? WHERE slot = ?",
+                               [(key, now, slot) for (key, _), slot in zip(items, slots)])
+
+    def clear(self) -> None:
+        """キャッシュの内容と統計を削除"""
+        with self._lock:
+            self._open()
+            with self._file_lock(exclusive=True):
+                self._reset(None)
+                self._sync_vectors()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def close(self) -> None:
+        """索引とロックファイルを閉じる"""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._lock_file.close()
+            self._db = None
+            self._lock_file = None
+            self._vectors = None
+            self._generation = None
+
+    def stats(self) -> Dict[str, Any]:
+        """キャッシュの統計"""
+        with self._lock:
+            entries = 0
+            if self._db is not None:
+                entries = self._db.execute("SELECT COUNT(*) FROM slots WHERE key IS NOT NULL").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "entries": entries,
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
@@ -1,119 +1,358 @@
-import os
-from typing import List, Dict, Any, Optional
-from pathlib import Path
-import logging
-
-logger = logging.getLogger(__name__)
-
-
-def read_excel_file(file_path: str):
-    """Excelファイルを読み込む（openpyxlのみ使用）"""
-    try:
-        from openpyxl import load_workbook
-        
-        # openpyxlでExcelファイルを読み込み
-        workbook = load_workbook(file_path, read_only=True)
-        worksheet = workbook.active
-        
-        # データを読み込み
-        data = []
-        headers = []
-        
-        # ヘッダー行を取得
-        for cell in worksheet[1]:
-            headers.append(cell.value if cell.value else f"Column_{len(headers)+1}")
-        
-        # データ行を取得
-        for row in worksheet.iter_rows(min_row=2, values_only=True):
-            if any(cell is not None for cell in row):  # 空行をスキップ
-                row_data = {}
-                for i, value in enumerate(row):
-                    if i < len(headers):
-                        row_data[headers[i]] = value
-                data.append(row_data)
-        
-        workbook.close()
-        
-        logger.info(f"Excel file loaded successfully: {len(data)} rows, {len(headers)} columns")
-        
-        # pandas DataFrame風のオブジェクトを作成
-        class SimpleDataFrame:
-            def __init__(self, data, columns):
-                self.data = data
-                self.columns = columns
-                self._len = len(data)
-            
-            def __len__(self):
-                return self._len
-            
-            def head(self, n=5):
-                return SimpleDataFrame(self.data[:n], self.columns)
-            
-            def to_dict(self, orient='records'):
-                if orient == 'records':
-                    return self.data
-                return {col: [row.get(col) for row in self.data] for col in self.columns}
-        
-        return SimpleDataFrame(data, headers)
-        
-    except Exception as e:
-        logger.error(f"Failed to read Excel file: {e}")
-        raise ValueError(f"Excelファイルの読み込みに失敗しました: {e}")
-
-
-def validate_excel_columns(df, required_columns: List[str]) -> bool:
-    """Excelファイルの列を検証"""
-    missing_columns = [col for col in required_columns if col not in df.columns]
-    if missing_columns:
-        raise ValueError(f"必要な列が見つかりません: {missing_columns}")
-    return True
-
-
-def get_sample_data(df, n_rows: int = 5) -> List[Dict[str, Any]]:
-    """サンプルデータを取得"""
-    sample_df = df.head(n_rows)
-    return sample_df.to_dict('records')
-
-
-def save_results(data: Dict[str, Any], file_path: str) -> None:
-    """結果をJSONファイルに保存"""
-    os.makedirs(os.path.dirname(file_path), exist_ok=True)
-    import json
-    with open(file_path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2, default=str)
-
-
-def load_results(file_path: str) -> Dict[str, Any]:
-    """結果をJSONファイルから読み込み"""
-    import json
-    with open(file_path, 'r', encoding='utf-8') as f:
-        return json.load(f)
-
-
-def get_file_extension(file_path: str) -> str:
-    """ファイル拡張子を取得"""
-    return Path(file_path).suffix.lower()
-
-
-def is_valid_excel_file(file_path: str) -> bool:
-    """有効なExcelファイルかチェック"""
-    valid_extensions = ['.xlsx', '.xls']
-    return get_file_extension(file_path) in valid_extensions
-
-
-def create_temp_file(content: bytes, suffix: str = '.xlsx') -> str:
-    """一時ファイルを作成"""
-    import tempfile
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
-    temp_file.write(content)
-    temp_file.close()
-    return temp_file.name
-
-
-def cleanup_temp_file(file_path: str) -> None:
-    """一時ファイルを削除"""
-    try:
-        if os.path.exists(file_path):
-            os.unlink(file_path)
-    except Exception as e:
-        logger.warning(f"Failed to cleanup temp file {file_path}: {e}")
+import io
+import os
+from typing import List, Dict, Any, Optional, Tuple, Union, BinaryIO
+from pathlib import Path
+import logging
+
+from app.utils.table_utils import ColumnarTable
+
+logger = logging.getLogger(__name__)
+
+
+class FileTooLargeError(ValueError):
+    """ファイルサイズが上限を超えた場合の例外"""
+
+
+class RowLimitExceededError(ValueError):
+    """データ行数が上限を超えた場合の例外"""
+
+
+EXCEL_EXTENSIONS = ['.xlsx', '.xls']
+DELIMITED_EXTENSIONS = {'.csv': ',', '.tsv': '\t'}
+PARQUET_EXTENSIONS = ['.parquet']
+# Excel以外（日本語版Excelで書き出したCSVなど）はこの順で文字コードを試す
+CSV_ENCODINGS = ['utf-8-sig', 'cp932']
+
+# 読み込み関数はパス・bytes・バイナリのファイルオブジェクトのいずれも受け付ける
+DataSource = Union[str, os.PathLike, bytes, bytearray, memoryview, BinaryIO]
+
+
+def _prepare_source(source: DataSource):
+    """bytesはコピーせずにファイルオブジェクトとして包み、ファイルオブジェクトは先頭に戻す"""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(source)
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    return source
+
+
+def _is_path(source: DataSource) -> bool:
+    return isinstance(source, (str, os.PathLike))
+
+
+def _build_headers(values: List[Any]) -> List[Any]:
+    """ヘッダー行の値から列名を作成（空のセルは Column_N とする）"""
+    headers = []
+    for value in values:
+        headers.append(value if value else f"Column_{len(headers)+1}")
+    return headers
+
+
+def _row_budget_after_dimension(sheet_max_row: Optional[int], max_rows: Optional[int]) -> Optional[int]:
+    """シートの dimension（宣言された最終行）が上限以内なら行ごとの判定を省く（None を返す）
+
+    dimension には書式だけが設定された空行も含まれ、データ行数の上限値にすぎないので、
+    超えている場合は却下せず、値のある行を数えながら判定する（max_rows をそのまま返す）。
+    """
+    # 1行目はヘッダー
+    if max_rows is not None and sheet_max_row is not None and sheet_max_row - 1 <= max_rows:
+        return None
+    return max_rows
+
+
+def _read_excel_openpyxl(source: DataSource, max_rows: Optional[int] = None) -> ColumnarTable:
+    """openpyxl（read_onlyモード）でExcelファイルを読み込む"""
+    from openpyxl import load_workbook
+    
+    # openpyxlでExcelファイルを読み込み
+    workbook = load_workbook(source, read_only=True)
+    try:
+        worksheet = workbook.active
+        row_budget = _row_budget_after_dimension(worksheet.max_row, max_rows)
+        
+        # ヘッダー行を取得
+        headers = _build_headers([cell.value for cell in worksheet[1]])
+        
+        # データ行を列ごとのリストに格納（行ごとの辞書は作らない）
+        n_columns = len(headers)
+        columns = [[] for _ in range(n_columns)]
+        n_rows = 0
+        for row in worksheet.iter_rows(min_row=2, values_only=True):
+            if any(cell is not None for cell in row):  # 空行をスキップ
+                n_rows += 1
+                # 上限を超えた時点で読み込みを打ち切る
+                _check_row_limit(n_rows, row_budget)
+                row_len = len(row)
+                for i in range(n_columns):
+                    columns[i].append(row[i] if i < row_len else None)
+    finally:
+        workbook.close()
+    
+    return ColumnarTable.from_columns(headers, columns)
+
+
+def _read_excel_native(source: DataSource, max_rows: Optional[int] = None) -> ColumnarTable:
+    """ネイティブxlsxリーダーでExcelファイルを読み込む"""
+    from app.utils.xlsx_reader import XlsxSheetReader
+    
+    with XlsxSheetReader(source) as reader:
+        row_budget = _row_budget_after_dimension(reader.max_row, max_rows)
+        headers = _build_headers(reader.read_headers())
+        n_columns = len(headers)
+        columns = [[] for _ in range(n_columns)]
+        n_rows = 0
+        # 空行は None が返るので値を変換せずに読み飛ばせる
+        for _, values in reader.iter_rows(min_row=2, columns=range(1, n_columns + 1)):
+            if values is not None:
+                n_rows += 1
+                _check_row_limit(n_rows, row_budget)
+                for i in range(n_columns):
+                    columns[i].append(values[i])
+    
+    return ColumnarTable.from_columns(headers, columns)
+
+
+def read_excel_file(source: DataSource, engine: str = "openpyxl", max_rows: Optional[int] = None) -> ColumnarTable:
+    """Excelファイルを読み込む
+
+    source にはパスのほか、bytes やシーク可能なバイナリのファイルオブジェクトも渡せる。
+    engine="native" の場合は zip と XML を直接ストリーミングで読む。
+    ネイティブリーダーが扱えない機能を含むファイルは openpyxl で読み直す。
+    max_rows を指定すると、値のある行数が上限を超えた時点で RowLimitExceededError を送出する
+    （シートの dimension が上限以内なら行ごとの判定を省く）。
+    """
+    try:
+        source = _prepare_source(source)
+        if engine == "native":
+            from app.utils.xlsx_reader import UnsupportedXlsxFeature
+            try:
+                table = _read_excel_native(source, max_rows)
+            except UnsupportedXlsxFeature as e:
+                logger.warning(f"Native xlsx reader fell back to openpyxl: {e}")
+                table = _read_excel_openpyxl(source, max_rows)
+        elif engine == "openpyxl":
+            table = _read_excel_openpyxl(source, max_rows)
+        else:
+            raise ValueError(f"サポートされていない読み込みエンジンです: {engine}")
+        
+        logger.info(f"Excel file loaded successfully: {len(table)} rows, {len(table.columns)} columns")
+        return table
+        
+    except RowLimitExceededError:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to read Excel file: {e}")
+        raise ValueError(f"Excelファイルの読み込みに失敗しました: {e}")
+
+
+def _check_row_limit(n_rows: int, max_rows: Optional[int]) -> None:
+    """行数が上限を超えていれば例外を送出"""
+    if max_rows is not None and n_rows > max_rows:
+        raise RowLimitExceededError(f"データ行数が上限（{max_rows}行）を超えています")
+
+
+def _read_delimited_stream(text_stream, delimiter: str, max_rows: Optional[int]) -> ColumnarTable:
+    """CSV/TSVを1行ずつ読み、列ごとのリストに格納"""
+    import csv
+    reader = csv.reader(text_stream, delimiter=delimiter)
+    header_values = next(reader, [])
+    headers = _build_headers(header_values)
+    n_columns = len(headers)
+    columns = [[] for _ in range(n_columns)]
+    n_rows = 0
+    for row in reader:
+        if not any(row):  # 空行をスキップ
+            continue
+        n_rows += 1
+        # 上限を超えた時点で読み込みを打ち切る
+        _check_row_limit(n_rows, max_rows)
+        row_len = len(row)
+        for i in range(n_columns):
+            # Excelの空セルと同様に空文字はNoneとして扱う
+            columns[i].append((row[i] or None) if i < row_len else None)
+    return ColumnarTable.from_columns(headers, columns)
+
+
+def read_csv_file(
+    source: DataSource,
+    delimiter: str = ',',
+    max_rows: Optional[int] = None,
+    encoding: Optional[str] = None
+) -> ColumnarTable:
+    """CSV/TSVファイルをストリーミングで読み込む
+
+    encoding を省略した場合は UTF-8（BOM付き可）、cp932 の順に試す。
+    """
+    encodings = [encoding] if encoding else CSV_ENCODINGS
+    last_error = None
+    for candidate in encodings:
+        try:
+            if _is_path(source):
+                with open(source, 'r', encoding=candidate, newline='') as f:
+                    table = _read_delimited_stream(f, delimiter, max_rows)
+            else:
+                buffer = _prepare_source(source)
+                text_stream = io.TextIOWrapper(buffer, encoding=candidate, newline='')
+                try:
+                    table = _read_delimited_stream(text_stream, delimiter, max_rows)
+                finally:
+                    # 渡されたファイルオブジェクトは閉じない
+                    text_stream.detach()
+            logger.info(f"CSV file loaded successfully ({candidate}): {len(table)} rows, {len(table.columns)} columns")
+            return table
+        except UnicodeDecodeError as e:
+            last_error = e
+            continue
+    raise ValueError(f"CSVファイルの文字コードを判別できませんでした: {last_error}")
+
+
+def read_parquet_file(source: DataSource, max_rows: Optional[int] = None) -> ColumnarTable:
+    """Parquetファイルをレコードバッチ単位で読み込む（pyarrowが必要）"""
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("Parquetファイルの読み込みには pyarrow が必要です")
+    
+    parquet_file = pq.ParquetFile(_prepare_source(source))
+    # メタデータの行数で上限を判定し、データを読む前に打ち切る
+    _check_row_limit(parquet_file.metadata.num_rows, max_rows)
+    
+    headers = _build_headers(parquet_file.schema_arrow.names)
+    columns = [[] for _ in headers]
+    for batch in parquet_file.iter_batches():
+        for i, column in enumerate(batch.columns):
+            columns[i].extend(column.to_pylist())
+    
+    table = ColumnarTable.from_columns(headers, columns)
+    logger.info(f"Parquet file loaded successfully: {len(table)} rows, {len(headers)} columns")
+    return table
+
+
+def read_data_file(
+    source: DataSource,
+    max_rows: Optional[int] = None,
+    engine: str = "openpyxl",
+    file_name: Optional[str] = None
+) -> ColumnarTable:
+    """拡張子に応じてExcel / CSV / TSV / Parquetを読み込む
+
+    file_name を指定した場合は source ではなくその拡張子で形式を判定する
+    （bytes やファイルオブジェクトを渡す場合は必須）。
+    行数が max_rows を超える場合は RowLimitExceededError を送出する。
+    """
+    if file_name is None and not _is_path(source):
+        raise ValueError("ファイルオブジェクトを読み込む場合はファイル名を指定してください")
+    extension = get_file_extension(file_name or source)
+    if extension in DELIMITED_EXTENSIONS:
+        return read_csv_file(source, DELIMITED_EXTENSIONS[extension], max_rows)
+    if extension in PARQUET_EXTENSIONS:
+        return read_parquet_file(source, max_rows)
+    if extension in EXCEL_EXTENSIONS:
+        return read_excel_file(source, engine, max_rows)
+    raise ValueError(f"サポートされていないファイル形式です: {extension}")
+
+
+def validate_excel_columns(df, required_columns: List[str]) -> bool:
+    """Excelファイルの列を検証"""
+    missing_columns = [col for col in required_columns if col not in df.columns]
+    if missing_columns:
+        raise ValueError(f"必要な列が見つかりません: {missing_columns}")
+    return True
+
+
+def get_sample_data(df, n_rows: int = 5) -> List[Dict[str, Any]]:
+    """サンプルデータを取得"""
+    sample_df = df.head(n_rows)
+    return sample_df.to_dict('records')
+
+
+def save_results(data: Dict[str, Any], file_path: str) -> None:
+    """結果をJSONファイルに保存"""
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    import json
+    with open(file_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2, default=str)
+
+
+def load_results(file_path: str) -> Dict[str, Any]:
+    """結果をJSONファイルから読み込み"""
+    import json
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def get_file_extension(file_path: str) -> str:
+    """ファイル拡張子を取得"""
+    return Path(file_path).suffix.lower()
+
+
+def get_data_format(file_path: str) -> str:
+    """拡張子から読み込み形式（excel / csv / tsv / parquet）を判定"""
+    extension = get_file_extension(file_path)
+    if extension in EXCEL_EXTENSIONS:
+        return "excel"
+    if extension in DELIMITED_EXTENSIONS or extension in PARQUET_EXTENSIONS:
+        return extension[1:]
+    raise ValueError(f"サポートされていないファイル形式です: {extension}")
+
+
+def is_valid_excel_file(file_path: str) -> bool:
+    """有効なExcelファイルかチェック"""
+    return get_file_extension(file_path) in EXCEL_EXTENSIONS
+
+
+def is_supported_data_file(file_path: str) -> bool:
+    """アップロード可能な形式（Excel / CSV / TSV / Parquet）かチェック"""
+    extension = get_file_extension(file_path)
+    return (
+        extension in EXCEL_EXTENSIONS
+        or extension in DELIMITED_EXTENSIONS
+        or extension in PARQUET_EXTENSIONS
+    )
+
+
+def create_temp_file(content: bytes, suffix: str = '.xlsx') -> str:
+    """一時ファイルを作成"""
+    import tempfile
+    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
+    temp_file.write(content)
+    temp_file.close()
+    return temp_file.name
+
+
+async def digest_upload(
+    upload_file,
+    max_size: int,
+    chunk_size: int = 1024 * 1024
+) -> Tuple[int, str]:
+    """アップロードをコピーせずにチャンク単位で読み、（バイト数, SHA-256ハッシュ）を返す
+
+    メモリ使用量はチャンクサイズに比例し、上限を超えた時点で中断する。
+    読み終えたら先頭に戻すので、そのまま upload_file.file を読み込み関数に渡せる。
+    """
+    import hashlib
+    declared_size = getattr(upload_file, 'size', None)
+    if declared_size is not None and declared_size > max_size:
+        raise FileTooLargeError(f"ファイルサイズが上限（{max_size}バイト）を超えています")
+    
+    hasher = hashlib.sha256()
+    total_size = 0
+    while True:
+        chunk = await upload_file.read(chunk_size)
+        if not chunk:
+            break
+        total_size += len(chunk)
+        if total_size > max_size:
+            raise FileTooLargeError(f"ファイルサイズが上限（{max_size}バイト）を超えています")
+        hasher.update(chunk)
+    await upload_file.seek(0)
+    return total_size, hasher.hexdigest()
+
+
+def cleanup_temp_file(file_path: str) -> None:
+    """一時ファイルを削除"""
+    try:
+        if os.path.exists(file_path):
+            os.unlink(file_path)
+    except Exception as e:
+        logger.warning(f"Failed to cleanup temp file {file_path}: {e}")
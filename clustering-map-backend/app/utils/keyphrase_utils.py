@@ -0,0 +1,99 @@
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# テキストのリストを受け取り、行ごとの埋め込み（numpy.ndarray）を返す関数
+EmbedFunction = Callable[[List[str]], Any]
+
+
+def embed_in_batches(embed: EmbedFunction, texts: Sequence[str], batch_size: int = 256) -> Any:
+    """batch_size 件ずつ埋め込みを計算し、L2正規化した行列（float32）を返す"""
+    import numpy as np
+
+    if batch_size < 1:
+        logger.error(f"Invalid embedding batch size: {batch_size}")
+        raise ValueError(f"バッチサイズは1以上を指定してください: {batch_size}")
+
+    batches = [
+        np.asarray(embed(list(texts[start:start + batch_size])), dtype=np.float32)
+        for start in range(0, len(texts), batch_size)
+    ]
+    if not batches:
+        return np.zeros((0, 0), dtype=np.float32)
+    embeddings = np.vstack(batches)
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings / np.maximum(norms, 1e-12)
+
+
+def mmr_select(doc_embedding: Any, candidate_embeddings: Any, top_k: int = 5, diversity: float = 0.5) -> List[int]:
+    """MMR（Maximal Marginal Relevance）で候補語を選び、選んだ順に候補のインデックスを返す
+
+    埋め込みはL2正規化済みとする（内積がコサイン類似度になる）。選び方はKeyBERTの use_mmr=True と同じ。
+    """
+    import numpy as np
+
+    n_candidates = len(candidate_embeddings)
+    if n_candidates == 0 or top_k < 1:
+        return []
+
+    doc_similarities = candidate_embeddings @ doc_embedding
+    word_similarities = candidate_embeddings @ candidate_embeddings.T
+
+    selected = [int(np.argmax(doc_similarities))]
+    remaining = [i for i in range(n_candidates) if i != selected[0]]
+    for _ in range(min(top_k - 1, n_candidates - 1)):
+        target_similarities = np.max(word_similarities[remaining][:, selected], axis=1)
+        mmr = (1 - diversity) * doc_similarities[remaining] - diversity * target_similarities
+        best = remaining[int(np.argmax(mmr))]
+        selected.append(best)
+        remaining.remove(best)
+    return selected
+
+
+def extract_keywords_batched(
+    texts: Sequence[str],
+    embed: EmbedFunction,
+    keyphrase_ngram_range: Tuple[int, int] = (1, 3),
+    stop_words: Optional[Any] = None,
+    top_k: int = 5,
+    diversity: float = 0.5,
+    batch_size: int = 256
+) -> List[List[Tuple[str, float]]]:
+    """全テキストのキーワードをまとめて抽出（テキストごとの (キーワード, 類似度) のリストを返す）
+
+    KeyBERT の extract_keywords(text, use_mmr=True) をテキストごとに呼ぶのと同じ候補・選び方だが、
+    文書の埋め込みと、全テキストの候補n-gramの和集合（重複なし）の埋め込みをそれぞれ一括で計算し、
+    各テキストのMMRはその行列から行うので、埋め込みモデルの呼び出しはバッチ数だけで済む。
+    """
+    import numpy as np
+    from sklearn.feature_extraction.text import CountVectorizer
+
+    if not texts:
+        return []
+
+    vectorizer = CountVectorizer(ngram_range=keyphrase_ngram_range, stop_words=stop_words)
+    try:
+        doc_terms = vectorizer.fit_transform(texts).tocsr()
+    except ValueError:
+        # 候補になる語が1つもない
+        return [[] for _ in texts]
+    vocabulary = vectorizer.get_feature_names_out().tolist()
+
+    doc_embeddings = embed_in_batches(embed, texts, batch_size)
+    word_embeddings = embed_in_batches(embed, vocabulary, batch_size)
+    logger.info(
+        f"Embedded {len(texts)} texts and {len(vocabulary)} candidate phrases in "
+        f"{-(-len(texts) // batch_size) + -(-len(vocabulary) // batch_size)} batches"
+    )
+
+    keywords = []
+    for i in range(len(texts)):
+        candidates = np.sort(doc_terms.indices[doc_terms.indptr[i]:doc_terms.indptr[i + 1]])
+        candidate_embeddings = word_embeddings[candidates]
+        selected = mmr_select(doc_embeddings[i], candidate_embeddings, top_k, diversity)
+        similarities = candidate_embeddings @ doc_embeddings[i]
+        keywords.append([
+            (vocabulary[candidates[j]], round(float(similarities[j]), 4)) for j in selected
+        ])
+    return keywords
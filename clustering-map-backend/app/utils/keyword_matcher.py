@@ -0,0 +1,129 @@
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class KeywordMatcher:
+    """複数カテゴリのキーワードを1回の走査で数えるAho-Corasickオートマトン
+
+    カテゴリごとの出現回数は、キーワードを辞書の順に並べた正規表現
+    （例: ``re.findall('残業|22時|夜', text)``）の件数と一致する。
+    つまり同じ位置では先に書かれたキーワードを採用し、採用したキーワードとは重ならない次の位置から数える。
+    同じキーワードが複数のカテゴリに属していてもよい。
+    """
+
+    def __init__(self, categories: Dict[str, Sequence[str]]):
+        self.categories: List[str] = list(categories)
+        keyword_ids: Dict[str, int] = {}
+        # キーワードごとの長さと、属するカテゴリ（カテゴリ番号, カテゴリ内の順番）
+        self._lengths: List[int] = []
+        self._memberships: List[List[Tuple[int, int]]] = []
+
+        for category_index, keywords in enumerate(categories.values()):
+            for order, keyword in enumerate(keywords):
+                if not keyword:
+                    logger.error(f"Empty keyword in category: {self.categories[category_index]}")
+                    raise ValueError(f"空のキーワードは登録できません: {self.categories[category_index]}")
+                if keyword not in keyword_ids:
+                    keyword_ids[keyword] = len(self._lengths)
+                    self._lengths.append(len(keyword))
+                    self._memberships.append([])
+                self._memberships[keyword_ids[keyword]].append((category_index, order))
+
+        self._transitions, self._outputs = self._build(keyword_ids)
+
+    @staticmethod
+    def _build(keyword_ids: Dict[str, int]) -> Tuple[List[Dict[str, int]], List[Tuple[int, ...]]]:
+        """トライを作り、失敗遷移を解決した遷移表（状態→文字→状態）と状態ごとの出力を作成"""
+        transitions: List[Dict[str, int]] = [{}]
+        outputs: List[List[int]] = [[]]
+        for keyword, keyword_id in keyword_ids.items():
+            state = 0
+            for char in keyword:
+                next_state = transitions[state].get(char)
+                if next_state is None:
+                    next_state = len(transitions)
+                    transitions[state][char] = next_state
+                    transitions.append({})
+                    outputs.append([])
+                state = next_state
+            outputs[state].append(keyword_id)
+
+        # 幅優先で失敗遷移を求め、遷移表に畳み込む（走査時に失敗遷移をたどらなくて済む）
+        failures = [0] * len(transitions)
+        queue = deque(transitions[0].values())
+        while queue:
+            state = queue.popleft()
+            goto = dict(transitions[state])
+            failure_transitions = transitions[failures[state]]
+            for char, next_state in goto.items():
+                failures[next_state] = failure_transitions.get(char, 0)
+                outputs[next_state].extend(outputs[failures[next_state]])
+                queue.append(next_state)
+            for char, next_state in failure_transitions.items():
+                transitions[state].setdefault(char, next_state)
+
+        return transitions, [tuple(output) for output in outputs]
+
+    def _find(self, text: str) -> List[Tuple[int, int]]:
+        """テキスト中のすべてのキーワードの出現位置（開始位置, キーワード番号）を返す"""
+        transitions = self._transitions
+        outputs = self._outputs
+        lengths = self._lengths
+        matches = []
+        state = 0
+        for position, char in enumerate(text, 1):
+            state = transitions[state].get(char, 0)
+            if outputs[state]:
+                for keyword_id in outputs[state]:
+                    matches.append((position - lengths[keyword_id], keyword_id))
+        return matches
+
+    def count(self, text: str, counts: Optional[List[int]] = None) -> List[int]:
+        """テキストのカテゴリ別の出現回数（categories の順）を返す
+
+        counts を渡すとその配列に加算して返す（テキストごとに配列を作らずに合計できる）。
+        """
+        if counts is None:
+            counts = [0] * len(self.categories)
+        if not text:
+            return counts
+
+        matches = self._find(text)
+        if not matches:
+            return counts
+
+        # 開始位置順に並べ、同じ位置ではカテゴリ内で先に書かれたキーワードを優先する
+        candidates = []
+        for start, keyword_id in matches:
+            for category_index, order in self._memberships[keyword_id]:
+                candidates.append((start, order, category_index, self._lengths[keyword_id]))
+        candidates.sort()
+
+        # カテゴリごとに、直前に数えたキーワードと重ならない出現だけを数える
+        next_start = [0] * len(self.categories)
+        for start, _, category_index, length in candidates:
+            if start >= next_start[category_index]:
+                counts[category_index] += 1
+                next_start[category_index] = start + length
+        return counts
+
+    def count_matrix(self, texts: Iterable[str]) -> Any:
+        """文書×カテゴリの出現回数の行列（numpy.ndarray, int64）を返す"""
+        import numpy as np
+
+        rows = [self.count(text) for text in texts]
+        return np.array(rows, dtype=np.int64).reshape(len(rows), len(self.categories))
+
+    def contains_any(self, text: str) -> bool:
+        """いずれかのキーワードを含むかを判定"""
+        transitions = self._transitions
+        outputs = self._outputs
+        state = 0
+        for char in text:
+            state = transitions[state].get(char, 0)
+            if outputs[state]:
+                return True
+        return False
@@ -0,0 +1,124 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SENTENCE_MODEL = "sentence"
+KEYBERT_MODEL = "keybert"
+
+
+def estimate_model_bytes(model: Any) -> int:
+    """モデルの重み（パラメータとバッファ）のメモリ使用量（バイト）
+
+    torch のモジュールのように parameters() / buffers() を持つモデルだけを数え、それ以外は0を返す。
+    """
+    total = 0
+    for attribute in ("parameters", "buffers"):
+        tensors = getattr(model, attribute, None)
+        if not callable(tensors):
+            continue
+        for tensor in tensors():
+            total += tensor.numel() * tensor.element_size()
+    return total
+
+
+class ModelRegistry:
+    """プロセス内で共有するモデルの登録簿
+
+    (種類, モデル名) ごとに1回だけ読み込み、全サービスで同じインスタンスを使う。
+    KeyBERT は共有の SentenceTransformer の上に作るので、重みは1つだけ読み込まれる。
+    """
+
+    def __init__(self):
+        self._models: Dict[Tuple[str, str], Any] = {}
+        self._info: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        # 読み込みはモデルごとのロックで行う（別のモデルの取得を待たせない）
+        self._load_locks: Dict[Tuple[str, str], threading.Lock] = {}
+
+    def get(self, kind: str, name: str, loader: Callable[[], Any], shares: Optional[Tuple[str, str]] = None) -> Any:
+        """モデルを取得（初回だけ loader で読み込む）
+
+        shares には重みを共有している別のモデルの (種類, モデル名) を指定する（メモリ使用量を二重に数えない）。
+        """
+        key = (kind, name)
+        model = self._models.get(key)
+        if model is not None:
+            return model
+
+        with self._lock:
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+        with load_lock:
+            model = self._models.get(key)
+            if model is not None:
+                return model
+
+            start = time.perf_counter()
+            try:
+                model = loader()
+            except Exception as e:
+                logger.error(f"Failed to load {kind} model {name}: {e}")
+                raise
+            load_seconds = time.perf_counter() - start
+
+            info = {
+                "kind": kind,
+                "name": name,
+                "load_seconds": round(load_seconds, 3),
+                "bytes": 0 if shares else estimate_model_bytes(model),
+                "shares": f"{shares[0]}:{shares[1]}" if shares else None
+            }
+            with self._lock:
+                self._models[key] = model
+                self._info[key] = info
+            logger.info(f"Loaded {kind} model {name} in {load_seconds:.2f}s ({info['bytes']} bytes)")
+            return model
+
+    def get_sentence_model(self, name: str) -> Any:
+        """SentenceTransformerモデルを取得"""
+        def load():
+            from sentence_transformers import SentenceTransformer
+            return SentenceTransformer(name)
+
+        return self.get(SENTENCE_MODEL, name, load)
+
+    def get_keybert_model(self, name: str) -> Any:
+        """共有の SentenceTransformer を使う KeyBERT モデルを取得"""
+        def load():
+            from keybert import KeyBERT
+            return KeyBERT(model=self.get_sentence_model(name))
+
+        return self.get(KEYBERT_MODEL, name, load, shares=(SENTENCE_MODEL, name))
+
+    def warmup(self, names: Iterable[str], keybert: bool = True) -> None:
+        """起動時にモデルを読み込んでおく（初回のリクエストで読み込みを待たせない）"""
+        for name in names:
+            self.get_sentence_model(name)
+            if keybert:
+                self.get_keybert_model(name)
+
+    def is_loaded(self, kind: str, name: str) -> bool:
+        """モデルが読み込み済みかどうか"""
+        return (kind, name) in self._models
+
+    def footprint(self) -> Dict[str, Any]:
+        """読み込み済みのモデルごとのメモリ使用量と読み込み時間"""
+        with self._lock:
+            models = [dict(info) for info in self._info.values()]
+        return {
+            "models": models,
+            "total_bytes": sum(info["bytes"] for info in models)
+        }
+
+    def clear(self) -> None:
+        """読み込み済みのモデルを破棄"""
+        with self._lock:
+            self._models.clear()
+            self._info.clear()
+            self._load_locks.clear()
+
+
+# プロセス全体で共有する登録簿
+model_registry = ModelRegistry()
@@ -0,0 +1,147 @@
+from array import array
+from typing import List, Dict, Any, Optional, Sequence, Iterable, Iterator, Union
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _compact_column(values: List[Any]) -> Sequence:
+    """値の型が揃っている列を型付き配列に変換"""
+    if not values:
+        return values
+
+    value_types = {type(value) for value in values}
+    try:
+        if value_types == {int}:
+            return array('q', values)
+        if value_types == {float}:
+            return array('d', values)
+    except OverflowError:
+        # 64bitに収まらない整数はリストのまま保持
+        pass
+    return values
+
+
+class _RowIndexer:
+    """iloc風の行アクセサ"""
+
+    def __init__(self, table: "ColumnarTable"):
+        self._table = table
+
+    def __getitem__(self, index: int) -> Dict[str, Any]:
+        return self._table.row(index)
+
+
+class ColumnarTable:
+    """列ごとに値を保持するテーブル（DataFrame互換の最小API）
+
+    各列は型付き配列（int64/float64）またはリストとして保持し、
+    行ごとの辞書は to_dict('records') などで必要になった時だけ生成する。
+    """
+
+    def __init__(self, columns: List[Any], data: List[Sequence]):
+        if len(columns) != len(data):
+            raise ValueError("列名と列データの数が一致しません")
+        lengths = {len(values) for values in data}
+        if len(lengths) > 1:
+            raise ValueError("列ごとの行数が一致しません")
+
+        self.columns = list(columns)
+        self._data = list(data)
+        self._len = lengths.pop() if lengths else 0
+        # 同名の列は後勝ち（辞書ベースの旧実装と同じ挙動）
+        self._index = {name: i for i, name in enumerate(self.columns)}
+
+    @classmethod
+    def from_columns(cls, columns: List[Any], data: List[List[Any]]) -> "ColumnarTable":
+        """列ごとのリストからテーブルを作成（型が揃う列は配列化）"""
+        return cls(columns, [_compact_column(values) for values in data])
+
+    @classmethod
+    def from_rows(cls, columns: List[Any], rows: Iterable[Sequence[Any]]) -> "ColumnarTable":
+        """行のイテラブルからテーブルを作成（不足セルはNoneで補完）"""
+        n_columns = len(columns)
+        data = [[] for _ in range(n_columns)]
+        for row in rows:
+            row_len = len(row)
+            for i in range(n_columns):
+                data[i].append(row[i] if i < row_len else None)
+        return cls.from_columns(columns, data)
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __contains__(self, column: Any) -> bool:
+        return column in self._index
+
+    def __getitem__(self, key: Union[Any, List[Any]]) -> Union[Sequence, "ColumnarTable"]:
+        if isinstance(key, list):
+            return self.select(key)
+        return self.column(key)
+
+    @property
+    def iloc(self) -> _RowIndexer:
+        return _RowIndexer(self)
+
+    def column(self, name: Any) -> Sequence:
+        """列の値を取得（コピーせずに内部の配列を返す）"""
+        if name not in self._index:
+            raise KeyError(name)
+        return self._data[self._index[name]]
+
+    def text_values(self, name: Any, fill: str = '') -> List[str]:
+        """列を文字列のリストとして取得（Noneはfillで置換）"""
+        return list(self.iter_text_values(name, fill))
+
+    def iter_text_values(self, name: Any, fill: str = '') -> Iterator[str]:
+        """列の値を文字列として1つずつ返す（Noneはfillで置換、リストを作らない）"""
+        for value in self.column(name):
+            yield fill if value is None else str(value)
+
+    def row(self, index: int) -> Dict[str, Any]:
+        """1行を辞書として取得"""
+        if index < 0:
+            index += self._len
+        if not 0 <= index < self._len:
+            raise IndexError(f"行インデックスが範囲外です: {index}")
+        return {name: self._data[i][index] for name, i in self._index.items()}
+
+    def select(self, columns: List[Any]) -> "ColumnarTable":
+        """指定した列だけを持つテーブルを返す（列データは共有）"""
+        missing = [name for name in columns if name not in self._index]
+        if missing:
+            raise KeyError(f"列が見つかりません: {missing}")
+        return ColumnarTable(columns, [self._data[self._index[name]] for name in columns])
+
+    def head(self, n: int = 5) -> "ColumnarTable":
+        return ColumnarTable(self.columns, [values[:n] for values in self._data])
+
+    def take(self, indices: Sequence[int]) -> "ColumnarTable":
+        """指定した行だけを持つテーブルを返す"""
+        data = []
+        for values in self._data:
+            taken = [values[i] for i in indices]
+            data.append(array(values.typecode, taken) if isinstance(values, array) else taken)
+        return ColumnarTable(self.columns, data)
+
+    def dropna(self, subset: Optional[List[Any]] = None) -> "ColumnarTable":
+        """指定した列（省略時は全列）にNoneを含む行を除外"""
+        names = subset if subset is not None else self.columns
+        # 型付き配列にはNoneが入らないので、リストの列だけを検査する
+        nullable = [values for values in map(self.column, names) if not isinstance(values, array)]
+        if not nullable:
+            return self
+        keep = [i for i in range(self._len) if all(values[i] is not None for values in nullable)]
+        if len(keep) == self._len:
+            return self
+        return self.take(keep)
+
+    def to_dict(self, orient: str = 'records') -> Union[List[Dict[str, Any]], Dict[str, Any]]:
+        if orient == 'records':
+            items = list(self._index.items())
+            return [{name: self._data[i][row] for name, i in items} for row in range(self._len)]
+        if orient == 'list':
+            return {name: list(self._data[i]) for name, i in self._index.items()}
+        if orient == 'dict':
+            return {name: dict(enumerate(self._data[i])) for name, i in self._index.items()}
+        raise ValueError(f"サポートされていないorientです: {orient}")
@@ -0,0 +1,120 @@
+from array import array
+from typing import Any, Dict, Iterable, List, Sequence
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class TagMatrix:
+    """コーパスのタグ付けを表す文書×タグの疎行列（CSR）とインターンしたタグの語彙
+
+    列はタグが最初に現れた順。各行のタグの元の順序は行列とは別の配列（タグIDの平坦な配列＋行の開始位置）に
+    保持するので、行列が正規化（列番号の並べ替えなど）されても row_tags / tag_lists で元のタグのリストに戻せる
+    （APIの応答を作る時だけリストにする）。
+    """
+
+    def __init__(self, matrix: Any, vocabulary: List[str], row_tag_ids: np.ndarray, row_starts: np.ndarray):
+        self.matrix = matrix
+        self.vocabulary = vocabulary
+        self.row_tag_ids = row_tag_ids
+        self.row_starts = row_starts
+
+    @classmethod
+    def from_tag_lists(cls, tag_lists: Iterable[Iterable[str]]) -> "TagMatrix":
+        """行ごとのタグ（ジェネレーターでもよい）から作成"""
+        from scipy.sparse import csr_matrix
+
+        tag_ids: Dict[str, int] = {}
+        vocabulary: List[str] = []
+        indices = array('i')
+        indptr = array('q', [0])
+        for tags in tag_lists:
+            for tag in tags:
+                tag_id = tag_ids.get(tag)
+                if tag_id is None:
+                    tag_id = tag_ids[tag] = len(vocabulary)
+                    vocabulary.append(tag)
+                indices.append(tag_id)
+            indptr.append(len(indices))
+
+        row_tag_ids = np.frombuffer(indices, dtype=np.int32) if indices else np.zeros(0, dtype=np.int32)
+        row_starts = np.frombuffer(indptr, dtype=np.int64)
+        # 行列には順序の配列のコピーを渡す（行列側の並べ替えが元の順序に影響しないように）
+        matrix = csr_matrix(
+            (np.ones(len(row_tag_ids), dtype=np.int32), row_tag_ids.copy(), row_starts.copy()),
+            shape=(len(indptr) - 1, len(vocabulary))
+        )
+        return cls(matrix, vocabulary, row_tag_ids, row_starts)
+
+    def __len__(self) -> int:
+        return self.matrix.shape[0]
+
+    def row_tags(self, index: int) -> List[str]:
+        """1行分のタグのリスト"""
+        start, stop = self.row_starts[index], self.row_starts[index + 1]
+        vocabulary = self.vocabulary
+        return [vocabulary[tag_id] for tag_id in self.row_tag_ids[start:stop].tolist()]
+
+    def tag_lists(self) -> List[List[str]]:
+        """全行のタグのリスト"""
+        return [self.row_tags(i) for i in range(len(self))]
+
+    def tag_counts(self) -> np.ndarray:
+        """タグごとの出現回数（語彙の順）"""
+        return np.asarray(self.matrix.sum(axis=0)).ravel()
+
+    def tags_in_use(self) -> List[str]:
+        """1回以上使われているタグの一覧（最初に現れた順）"""
+        return [self.vocabulary[tag_id] for tag_id in np.flatnonzero(self.tag_counts()).tolist()]
+
+    def group_tag_counts(self, labels: Sequence[int]) -> Any:
+        """グループ×タグの出現回数（グループのラベルの昇順の行, CSR）を返す（グループ指示行列との積）"""
+        from scipy.sparse import csr_matrix
+
+        _, group_index = np.unique(np.asarray(labels), return_inverse=True)
+        n_groups = int(group_index.max()) + 1 if len(group_index) else 0
+        indicator = csr_matrix(
+            (np.ones(len(self), dtype=np.int32), (group_index, np.arange(len(self)))),
+            shape=(n_groups, len(self))
+        )
+        return (indicator @ self.matrix).tocsr()
+
+    def top_tags_by_group(self, labels: Sequence[int], top_k: int = 5) -> Dict[int, List[str]]:
+        """グループ（クラスタ）ごとの出現回数の多いタグ上位 top_k 個
+
+        出現回数が同じタグはグループ内で先に現れたものを優先する（Counter.most_common と同じ順）。
+        """
+        labels = np.asarray(labels)
+        group_ids, group_index = np.unique(labels, return_inverse=True)
+        counts = self.group_tag_counts(labels).tocoo()
+        if counts.nnz == 0:
+            return {int(group_id): [] for group_id in group_ids}
+
+        # (グループ, タグ) ごとの最初の出現位置（順序の配列は行順・行内の元の順に並んでいる）
+        n_tags = len(self.vocabulary)
+        entry_rows = np.repeat(np.arange(len(self)), np.diff(self.row_starts))
+        entry_keys = group_index[entry_rows].astype(np.int64) * n_tags + self.row_tag_ids
+        unique_keys, first_positions = np.unique(entry_keys, return_index=True)
+        count_keys = counts.row.astype(np.int64) * n_tags + counts.col
+        positions = first_positions[np.searchsorted(unique_keys, count_keys)]
+
+        order = np.lexsort((positions, -counts.data, counts.row))
+        sorted_groups = counts.row[order]
+        sorted_tags = counts.col[order]
+        starts = np.searchsorted(sorted_groups, np.arange(len(group_ids)), side='left')
+        stops = np.searchsorted(sorted_groups, np.arange(len(group_ids)), side='right')
+
+        vocabulary = self.vocabulary
+        return {
+            int(group_id): [vocabulary[tag_id] for tag_id in sorted_tags[start:min(stop, start + top_k)].tolist()]
+            for group_id, start, stop in zip(group_ids.tolist(), starts.tolist(), stops.tolist())
+        }
+
+    def cooccurrence(self) -> Any:
+        """タグ×タグの共起回数（同じ行に両方のタグがある行数, CSR）。対角成分は各タグが付いた行数"""
+        binary = self.matrix.copy()
+        binary.sum_duplicates()
+        binary.data[:] = 1
+        return (binary.T @ binary).tocsr()
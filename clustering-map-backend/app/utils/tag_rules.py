@@ -0,0 +1,102 @@
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+
+class TagRuleStore:
+    """タグルール（tag_rules.json）のストア
+
+    読み込んだルールはメモリに保持し、ファイルが置き換わった時（inode・更新時刻・サイズの変化）だけ読み直す。
+    書き込みは一時ファイルからの置き換えで行うので、読み込み側が書きかけのファイルを読むことはない。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._rules: List[Dict[str, Any]] = []
+        self._version: Optional[Tuple[int, int, int]] = None
+        self._loaded = False
+
+    def _file_version(self) -> Optional[Tuple[int, int, int]]:
+        """ファイルの版（存在しなければ None）"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def load(self) -> Tuple[List[Dict[str, Any]], Optional[Tuple[int, int, int]]]:
+        """ルールの一覧とファイルの版を返す（ファイルが変わっていなければメモリから返す）"""
+        version = self._file_version()
+        if self._loaded and version == self._version:
+            return self._rules, self._version
+
+        with self._lock:
+            version = self._file_version()
+            if not self._loaded or version != self._version:
+                rules: List[Dict[str, Any]] = []
+                if version is not None:
+                    with open(self.path, 'r', encoding='utf-8') as f:
+                        rules = json.load(f)
+                self._rules, self._version, self._loaded = rules, version, True
+                logger.info(f"Loaded {len(rules)} tag rules from {self.path}")
+            return self._rules, self._version
+
+    def get_rules(self) -> List[Dict[str, Any]]:
+        """ルールの一覧を返す"""
+        return self.load()[0]
+
+    def save(self, rules: List[Dict[str, Any]]) -> None:
+        """ルールを書き込み、メモリ上のルールも置き換える"""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self._lock:
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(rules, f, ensure_ascii=False, indent=2)
+            os.replace(temp_path, self.path)
+            self._rules, self._version, self._loaded = rules, self._file_version(), True
+
+
+class SynonymIndex:
+    """タグルールの同義語（大文字小文字を区別しない）から正規化後のタグを引く索引
+
+    同じ同義語が複数のルールにある場合は後のルールが優先される。ルールが変わったら作り直す。
+    """
+
+    def __init__(self, rules: Iterable[Union[Dict[str, Any], Any]] = ()):
+        self._index: Dict[str, str] = {}
+        for rule in rules:
+            key = rule["key"] if isinstance(rule, dict) else rule.key
+            synonyms = rule.get("synonyms", []) if isinstance(rule, dict) else rule.synonyms
+            for synonym in synonyms:
+                self._index[synonym.lower()] = key
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def normalize(self, tag: str) -> str:
+        """タグを正規化（同義語でなければそのまま）"""
+        return self._index.get(tag.lower(), tag)
+
+    def normalize_corpus(self, tag_lists: Iterable[List[str]]) -> List[List[str]]:
+        """全データポイントのタグを1回の走査で正規化（正規化で重なったタグは最初の1つだけ残す）"""
+        if not self._index:
+            return [list(tags) for tags in tag_lists]
+
+        # 同じタグは何度も出現するので、正規化の結果を覚えておく
+        normalized_tags: Dict[str, str] = {}
+        normalized_lists = []
+        for tags in tag_lists:
+            normalized = []
+            for tag in tags:
+                key = normalized_tags.get(tag)
+                if key is None:
+                    key = normalized_tags[tag] = self.normalize(tag)
+                if key not in normalized:
+                    normalized.append(key)
+            normalized_lists.append(normalized)
+        return normalized_lists
@@ -1,155 +1,635 @@
-import re
-import unicodedata
-from typing import List, Set, Dict, Any
-import logging
-from sudachipy import tokenizer
-from sudachipy import dictionary
-
-logger = logging.getLogger(__name__)
-
-# SudachiPyの設定
-tokenizer_obj = dictionary.Dictionary().create()
-mode = tokenizer.Tokenizer.SplitMode.C
-
-# ストップワード（基本的なもの）
-STOP_WORDS = {
-    'の', 'に', 'は', 'を', 'が', 'で', 'と', 'も', 'から', 'まで', 'より', 'へ', 'や', 'か', 'など',
-    'こと', 'もの', 'ため', 'とき', 'ところ', 'よう', 'そう', 'これ', 'それ', 'あれ', 'どれ',
-    'この', 'その', 'あの', 'どの', 'ここ', 'そこ', 'あそこ', 'どこ', 'だ', 'である', 'です',
-    'ます', 'でした', 'でした', 'です', 'だ', 'である', 'です', 'ます', 'です', 'ます',
-    'です', 'ます', 'です', 'ます', 'です', 'ます', 'です', 'ます', 'です', 'ます'
-}
-
-
-def normalize_text(text: str) -> str:
-    """テキストを正規化"""
-    if not isinstance(text, str):
-        return ""
-    
-    # Unicode正規化（NFKC）
-    text = unicodedata.normalize('NFKC', text)
-    
-    # 全角半角統一
-    text = text.replace('　', ' ')  # 全角スペースを半角に
-    
-    # 連続する空白を単一の空白に
-    text = re.sub(r'\s+', ' ', text)
-    
-    # 前後の空白を削除
-    text = text.strip()
-    
-    return text
-
-
-def remove_special_characters(text: str) -> str:
-    """特殊文字を除去"""
-    # 英数字、ひらがな、カタカナ、漢字、基本的な記号のみ残す
-    text = re.sub(r'[^\w\s\u3040-\u309F\u30A0-\u30FF\u4E00-\u9FAF]', ' ', text)
-    
-    # 連続する空白を単一の空白に
-    text = re.sub(r'\s+', ' ', text)
-    
-    return text.strip()
-
-
-def tokenize_japanese(text: str) -> List[str]:
-    """日本語テキストをトークン化"""
-    try:
-        tokens = []
-        for token in tokenizer_obj.tokenize(text, mode):
-            # 品詞情報を取得
-            pos = token.part_of_speech()
-            
-            # 名詞、動詞、形容詞のみを抽出
-            if pos[0] in ['名詞', '動詞', '形容詞']:
-                # 活用形を基本形に変換
-                surface = token.surface()
-                if surface and len(surface) > 1:  # 1文字のトークンは除外
-                    tokens.append(surface)
-        
-        return tokens
-    except Exception as e:
-        logger.warning(f"Tokenization failed: {e}")
-        # フォールバック: 単純な分割
-        return text.split()
-
-
-def remove_stop_words(tokens: List[str]) -> List[str]:
-    """ストップワードを除去"""
-    return [token for token in tokens if token not in STOP_WORDS]
-
-
-def preprocess_text(text: str) -> List[str]:
-    """テキストの前処理を実行"""
-    # 正規化
-    text = normalize_text(text)
-    
-    # 特殊文字除去
-    text = remove_special_characters(text)
-    
-    # トークン化
-    tokens = tokenize_japanese(text)
-    
-    # ストップワード除去
-    tokens = remove_stop_words(tokens)
-    
-    return tokens
-
-
-def extract_keywords_from_text(text: str, max_keywords: int = 10) -> List[str]:
-    """テキストからキーワードを抽出"""
-    tokens = preprocess_text(text)
-    
-    # 頻度をカウント
-    from collections import Counter
-    token_counts = Counter(tokens)
-    
-    # 頻度順にソートして上位を返す
-    return [token for token, count in token_counts.most_common(max_keywords)]
-
-
-def calculate_text_similarity(text1: str, text2: str) -> float:
-    """2つのテキストの類似度を計算（Jaccard係数）"""
-    tokens1 = set(preprocess_text(text1))
-    tokens2 = set(preprocess_text(text2))
-    
-    if not tokens1 and not tokens2:
-        return 1.0
-    if not tokens1 or not tokens2:
-        return 0.0
-    
-    intersection = len(tokens1.intersection(tokens2))
-    union = len(tokens1.union(tokens2))
-    
-    return intersection / union if union > 0 else 0.0
-
-
-def merge_similar_tags(tags: List[str], threshold: float = 0.8) -> List[str]:
-    """類似したタグをマージ"""
-    if not tags:
-        return []
-    
-    merged_tags = []
-    used_indices = set()
-    
-    for i, tag1 in enumerate(tags):
-        if i in used_indices:
-            continue
-            
-        similar_tags = [tag1]
-        used_indices.add(i)
-        
-        for j, tag2 in enumerate(tags[i+1:], i+1):
-            if j in used_indices:
-                continue
-                
-            similarity = calculate_text_similarity(tag1, tag2)
-            if similarity >= threshold:
-                similar_tags.append(tag2)
-                used_indices.add(j)
-        
-        # 最も長いタグを代表とする
-        representative = max(similar_tags, key=len)
-        merged_tags.append(representative)
-    
-    return merged_tags
+import atexit
+import bisect
+import hashlib
+import math
+import multiprocessing
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Set, Dict, Any, Callable, Iterable, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# SudachiPyの設定（分割単位）
+SPLIT_MODE = "C"
+
+# 辞書はプロセス内で共有し、最初にトークン化するときに読み込む
+_dictionary = None
+_dictionary_lock = threading.Lock()
+# トークナイザーはスレッドごとに作成（同じトークナイザーを同時に使わないため）
+_thread_local = threading.local()
+
+# ストップワード（基本的なもの）
+STOP_WORDS = {
+    'の', 'に', 'は', 'を', 'が', 'で', 'と', 'も', 'から', 'まで', 'より', 'へ', 'や', 'か', 'など',
+    'こと', 'もの', 'ため', 'とき', 'ところ', 'よう', 'そう', 'これ', 'それ', 'あれ', 'どれ',
+    'この', 'その', 'あの', 'どの', 'ここ', 'そこ', 'あそこ', 'どこ', 'だ', 'である', 'です',
+    'ます', 'でした', 'でした', 'です', 'だ', 'である', 'です', 'ます', 'です', 'ます',
+    'です', 'ます', 'です', 'ます', 'です', 'ます', 'です', 'ます', 'です', 'ます'
+}
+
+# 文字種ごとの連続区間（漢字・ひらがな・カタカナ・英字・数字）
+SCRIPT_RUN_PATTERN = re.compile(
+    r'(?P<kanji>[\u4E00-\u9FFF\u3400-\u4DBF々〆ヵヶ]+)'
+    r'|(?P<hiragana>[\u3041-\u309F]+)'
+    r'|(?P<katakana>[\u30A1-\u30FF]+)'
+    r'|(?P<latin>[a-z]+)'
+    r'|(?P<digit>[0-9]+)'
+)
+# 高速トークナイザーで漢字の区間から作る文字n-gramの長さ
+FAST_NGRAM_SIZE = 2
+
+# タグ抽出のトークナイザー
+TOKENIZER_MODES = ("regex", "fast", "sudachi")
+
+# 正規化・トークン化の処理のバージョン（出力が変わる変更をしたら上げる。保存したトークン列が作り直される）
+TOKENIZER_VERSION = 1
+# tokenizer_fingerprint で調べたパッケージのバージョン
+_package_versions: Dict[str, str] = {}
+
+# 前処理結果のキャッシュ件数の上限
+TOKEN_CACHE_SIZE = 10000
+
+# 並列トークン化の設定（これより少ない件数はプロセス間通信の方が高くつくので直列で処理）
+PARALLEL_MIN_TEXTS = 2000
+PARALLEL_CHUNK_SIZE = 500
+
+_process_pool = None
+_process_pool_workers = 0
+_process_pool_lock = threading.Lock()
+
+
+class TokenCache:
+    """正規化済みテキストをキーにしたトークン列のLRUキャッシュ"""
+    
+    def __init__(self, max_entries: int = TOKEN_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[str, ...]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, key: str) -> Optional[Tuple[str, ...]]:
+        """キャッシュ済みのトークン列を取得"""
+        with self._lock:
+            tokens = self._entries.get(key)
+            if tokens is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return tokens
+    
+    def put(self, key: str, tokens: Iterable[str]) -> None:
+        """トークン列を保存（上限を超えたら最も古いものから外す）"""
+        with self._lock:
+            self._entries[key] = tuple(tokens)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def clear(self) -> None:
+        """キャッシュと統計を初期化"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+    
+    def stats(self) -> Dict[str, Any]:
+        """キャッシュの統計"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+
+token_cache = TokenCache()
+
+
+def get_dictionary():
+    """共有のSudachi辞書を取得（初回のみ読み込む）"""
+    global _dictionary
+    if _dictionary is None:
+        with _dictionary_lock:
+            if _dictionary is None:
+                from sudachipy import dictionary
+                
+                start = time.perf_counter()
+                _dictionary = dictionary.Dictionary()
+                logger.info(f"Sudachi dictionary loaded in {time.perf_counter() - start:.3f}s")
+    return _dictionary
+
+
+def get_tokenizer():
+    """現在のスレッド用のSudachiトークナイザーを取得"""
+    tokenizer_obj = getattr(_thread_local, "tokenizer", None)
+    if tokenizer_obj is None:
+        sudachi_dictionary = get_dictionary()
+        # 新しい sudachipy では create() が非推奨（tokenizer() がない古い版だけ create() を使う）
+        create = getattr(sudachi_dictionary, "tokenizer", None) or sudachi_dictionary.create
+        tokenizer_obj = create(mode=SPLIT_MODE)
+        _thread_local.tokenizer = tokenizer_obj
+    return tokenizer_obj
+
+
+def preload_tokenizer() -> None:
+    """辞書を先に読み込む（preforkサーバーの親プロセスで呼ぶとワーカー間で共有される）"""
+    get_tokenizer()
+
+
+def normalize_text(text: str) -> str:
+    """テキストを正規化"""
+    if not isinstance(text, str):
+        return ""
+    
+    # Unicode正規化（NFKC）
+    text = unicodedata.normalize('NFKC', text)
+    
+    # 全角半角統一
+    text = text.replace('　', ' ')  # 全角スペースを半角に
+    
+    # 連続する空白を単一の空白に
+    text = re.sub(r'\s+', ' ', text)
+    
+    # 前後の空白を削除
+    text = text.strip()
+    
+    return text
+
+
+def remove_special_characters(text: str) -> str:
+    """特殊文字を除去"""
+    # 英数字、ひらがな、カタカナ、漢字、基本的な記号のみ残す
+    text = re.sub(r'[^\w\s\u3040-\u309F\u30A0-\u30FF\u4E00-\u9FAF]', ' ', text)
+    
+    # 連続する空白を単一の空白に
+    text = re.sub(r'\s+', ' ', text)
+    
+    return text.strip()
+
+
+def tokenize_japanese(text: str) -> List[str]:
+    """日本語テキストをトークン化"""
+    try:
+        tokens = []
+        for token in get_tokenizer().tokenize(text):
+            # 品詞情報を取得
+            pos = token.part_of_speech()
+            
+            # 名詞、動詞、形容詞のみを抽出
+            if pos[0] in ['名詞', '動詞', '形容詞']:
+                # 活用形を基本形に変換
+                surface = token.surface()
+                if surface and len(surface) > 1:  # 1文字のトークンは除外
+                    tokens.append(surface)
+        
+        return tokens
+    except Exception as e:
+        logger.warning(f"Tokenization failed: {e}")
+        # フォールバック: 単純な分割
+        return text.split()
+
+
+def tokenize_regex(text: str) -> List[str]:
+    """英数字の単語単位でトークン化（空白のない日本語は文全体が1語になる）"""
+    return re.findall(r'\b\w+\b', text.lower())
+
+
+def tokenize_fast(text: str, ngram_size: int = FAST_NGRAM_SIZE) -> List[str]:
+    """辞書を使わずに文字種の切れ目でトークン化
+    
+    漢字の区間はそのままの語に加えて文字n-gramも出力し、ひらがなの区間（助詞や活用語尾）は捨てる。
+    カタカナ・英字は2文字以上の区間、数字はそのまま出力する。
+    """
+    tokens = []
+    for match in SCRIPT_RUN_PATTERN.finditer(normalize_text(text).lower()):
+        script = match.lastgroup
+        run = match.group()
+        if script == "kanji":
+            tokens.append(run)
+            if len(run) > ngram_size:
+                tokens.extend(run[i:i + ngram_size] for i in range(len(run) - ngram_size + 1))
+        elif script == "digit" or (script != "hiragana" and len(run) > 1):
+            tokens.append(run)
+    return tokens
+
+
+def get_text_tokenizer(mode: str) -> Callable[[str], List[str]]:
+    """トークナイザーの種類（regex / fast / sudachi）から関数を取得"""
+    if mode == "regex":
+        return tokenize_regex
+    if mode == "fast":
+        return tokenize_fast
+    if mode == "sudachi":
+        return preprocess_text
+    logger.error(f"Unknown tokenizer mode: {mode}")
+    raise ValueError(f"未対応のトークナイザーです: {mode}（{' / '.join(TOKENIZER_MODES)}）")
+
+
+def tokenize_texts(texts: List[str], mode: str, workers: Optional[int] = None) -> List[List[str]]:
+    """複数テキストを指定したトークナイザーでトークン化"""
+    if mode == "sudachi":
+        # 重複の除去とキャッシュ・並列化はバッチ前処理に任せる
+        return preprocess_texts(texts, workers=workers)
+    tokenize = get_text_tokenizer(mode)
+    return [tokenize(text) for text in texts]
+
+
+def _package_version(package: str) -> str:
+    """インストール済みパッケージのバージョン（未インストールは空文字、プロセス内で一度だけ調べる）"""
+    version = _package_versions.get(package)
+    if version is None:
+        import importlib.metadata
+        try:
+            version = importlib.metadata.version(package)
+        except importlib.metadata.PackageNotFoundError:
+            version = ""
+        _package_versions[package] = version
+    return version
+
+
+def tokenizer_fingerprint(mode: str) -> str:
+    """トークン化の結果を左右する設定のハッシュ（保存したトークン列の無効化に使う）
+    
+    トークナイザーの種類、処理のバージョン（TOKENIZER_VERSION）、分割単位、n-gramの長さ、
+    ストップワードと、sudachi の場合は辞書のバージョンを含める。
+    """
+    get_text_tokenizer(mode)
+    parts = [
+        mode, str(TOKENIZER_VERSION), SPLIT_MODE, str(FAST_NGRAM_SIZE),
+        "\n".join(sorted(STOP_WORDS)), SCRIPT_RUN_PATTERN.pattern
+    ]
+    if mode == "sudachi":
+        for package in ("sudachipy", "sudachidict_core"):
+            parts.append(f"{package}=={_package_version(package)}")
+    return hashlib.sha1("\n".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+def remove_stop_words(tokens: List[str]) -> List[str]:
+    """ストップワードを除去"""
+    return [token for token in tokens if token not in STOP_WORDS]
+
+
+def _clean_text(text: str) -> str:
+    """トークン化の前の正規化と特殊文字除去"""
+    return remove_special_characters(normalize_text(text))
+
+
+def _tokenize_clean_text(text: str) -> List[str]:
+    """正規化済みテキストのトークン化とストップワード除去"""
+    return remove_stop_words(tokenize_japanese(text))
+
+
+def preprocess_text(text: str) -> List[str]:
+    """テキストの前処理を実行"""
+    # 正規化と特殊文字除去
+    text = _clean_text(text)
+    
+    # 同じテキストの形態素解析は一度だけ行う
+    tokens = token_cache.get(text)
+    if tokens is None:
+        # トークン化とストップワード除去
+        tokens = _tokenize_clean_text(text)
+        token_cache.put(text, tokens)
+    
+    return list(tokens)
+
+
+def preprocess_texts(texts: List[str], workers: Optional[int] = None) -> List[List[str]]:
+    """複数テキストの前処理を実行（重複とキャッシュ済みのテキストは形態素解析しない）
+    
+    workers が2以上で未解析のテキストが多い場合は、プロセスプールで並列にトークン化する。
+    """
+    cleaned = [_clean_text(text) for text in texts]
+    
+    resolved: Dict[str, Tuple[str, ...]] = {}
+    missing: List[str] = []
+    for text in cleaned:
+        if text in resolved:
+            continue
+        tokens = token_cache.get(text)
+        resolved[text] = tokens
+        if tokens is None:
+            missing.append(text)
+    
+    for text, tokens in zip(missing, _tokenize_many(missing, workers)):
+        token_cache.put(text, tokens)
+        resolved[text] = tokens
+    
+    stats = token_cache.stats()
+    logger.debug(
+        f"Preprocessed {len(texts)} texts ({len(resolved)} unique), "
+        f"token cache hit rate: {stats['hit_rate']:.1%}"
+    )
+    return [list(resolved[text]) for text in cleaned]
+
+
+def _tokenize_many(texts: List[str], workers: Optional[int] = None) -> List[Tuple[str, ...]]:
+    """正規化済みテキストを入力順にトークン化"""
+    if not workers or workers < 2 or len(texts) < PARALLEL_MIN_TEXTS:
+        return [tuple(_tokenize_clean_text(text)) for text in texts]
+    
+    chunks = [texts[i:i + PARALLEL_CHUNK_SIZE] for i in range(0, len(texts), PARALLEL_CHUNK_SIZE)]
+    start = time.perf_counter()
+    results = []
+    # map はチャンクの投入順に結果を返す
+    for chunk_tokens in _get_process_pool(workers).map(_tokenize_chunk, chunks):
+        results.extend(chunk_tokens)
+    logger.info(
+        f"Tokenized {len(texts)} texts with {workers} processes in {time.perf_counter() - start:.2f}s"
+    )
+    return results
+
+
+def _tokenize_chunk(texts: List[str]) -> List[Tuple[str, ...]]:
+    """ワーカープロセスでのチャンク単位のトークン化"""
+    return [tuple(_tokenize_clean_text(text)) for text in texts]
+
+
+def _get_process_pool(workers: int):
+    """トークン化用のプロセスプールを取得（ワーカー数が変わったら作り直す）"""
+    global _process_pool, _process_pool_workers
+    with _process_pool_lock:
+        if _process_pool is None or _process_pool_workers != workers:
+            if _process_pool is not None:
+                _process_pool.shutdown(wait=False)
+            # スレッドから呼ばれても安全なように spawn で起動し、各ワーカーで辞書を一度だけ読み込む
+            _process_pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=preload_tokenizer
+            )
+            _process_pool_workers = workers
+        return _process_pool
+
+
+def shutdown_process_pool() -> None:
+    """トークン化用のプロセスプールを終了"""
+    global _process_pool, _process_pool_workers
+    with _process_pool_lock:
+        if _process_pool is not None:
+            _process_pool.shutdown()
+        _process_pool = None
+        _process_pool_workers = 0
+
+
+atexit.register(shutdown_process_pool)
+
+
+def get_token_cache_stats() -> Dict[str, Any]:
+    """トークンキャッシュの統計（件数、ヒット数、ミス数、ヒット率）を取得"""
+    return token_cache.stats()
+
+
+def extract_keywords_from_text(text: str, max_keywords: int = 10) -> List[str]:
+    """テキストからキーワードを抽出"""
+    tokens = preprocess_text(text)
+    
+    # 頻度をカウント
+    from collections import Counter
+    token_counts = Counter(tokens)
+    
+    # 頻度順にソートして上位を返す
+    return [token for token, count in token_counts.most_common(max_keywords)]
+
+
+def calculate_text_similarity(text1: str, text2: str) -> float:
+    """2つのテキストの類似度を計算（Jaccard係数）"""
+    tokens1 = set(preprocess_text(text1))
+    tokens2 = set(preprocess_text(text2))
+    return _jaccard_similarity(tokens1, tokens2)
+
+
+def _jaccard_similarity(tokens1: Set[str], tokens2: Set[str]) -> float:
+    """トークン集合のJaccard係数"""
+    if not tokens1 and not tokens2:
+        return 1.0
+    if not tokens1 or not tokens2:
+        return 0.0
+    
+    intersection = len(tokens1.intersection(tokens2))
+    union = len(tokens1.union(tokens2))
+    
+    return intersection / union if union > 0 else 0.0
+
+
+def merge_similar_tags(tags: List[str], threshold: float = 0.8) -> List[str]:
+    """類似したタグをマージ"""
+    if not tags:
+        return []
+    
+    merged_tags = []
+    used_indices = set()
+    # 各タグのトークン化は一度だけ行い、類似度が閾値以上のペアだけを候補として列挙する
+    token_sets = [set(tokens) for tokens in preprocess_texts(tags)]
+    similar_indices = find_similar_pairs(token_sets, threshold)
+    
+    for i, tag1 in enumerate(tags):
+        if i in used_indices:
+            continue
+            
+        similar_tags = [tag1]
+        used_indices.add(i)
+        
+        # 全ペアを比較した場合と同じく、後ろのタグを番号順に取り込む
+        for j in similar_indices[i]:
+            if j in used_indices:
+                continue
+            similar_tags.append(tags[j])
+            used_indices.add(j)
+        
+        # 最も長いタグを代表とする
+        representative = max(similar_tags, key=len)
+        merged_tags.append(representative)
+    
+    return merged_tags
+
+
+def find_similar_pairs(token_sets: List[Set[str]], threshold: float) -> List[List[int]]:
+    """Jaccard係数が閾値以上になる後ろの集合の番号を、集合ごとに昇順で返す
+    
+    プレフィックスフィルタ（全体での出現頻度が低い順に並べたトークンの先頭
+    |x| - ceil(threshold * |x|) + 1 個を共有しないペアは閾値に届かない）と要素数の比で候補を絞り、
+    候補だけを正確に比較するので、全ペアを比較した場合と同じ結果になる。
+    """
+    n = len(token_sets)
+    if threshold <= 0:
+        # 閾値が0以下なら全ペアが該当する
+        return [list(range(i + 1, n)) for i in range(n)]
+    
+    # 出現頻度の低いトークンを先頭にする（候補が少なくなる）
+    document_frequency: Dict[str, int] = {}
+    for tokens in token_sets:
+        for token in tokens:
+            document_frequency[token] = document_frequency.get(token, 0) + 1
+    
+    prefixes = []
+    index: Dict[str, List[int]] = {}
+    empty_indices = []
+    for i, tokens in enumerate(token_sets):
+        if not tokens:
+            empty_indices.append(i)
+            prefixes.append([])
+            continue
+        ordered = sorted(tokens, key=lambda token: (document_frequency[token], token))
+        # 浮動小数点の誤差で接頭辞が短くならないように、切り上げる前にわずかに減らす
+        prefix_length = len(ordered) - math.ceil(threshold * len(ordered) - 1e-9) + 1
+        prefix = ordered[:prefix_length]
+        prefixes.append(prefix)
+        for token in prefix:
+            index.setdefault(token, []).append(i)
+    
+    similar = [[] for _ in range(n)]
+    for i, prefix in enumerate(prefixes):
+        candidates = set()
+        for token in prefix:
+            # 索引は番号の昇順なので、後ろの集合だけを二分探索で取り出す
+            postings = index[token]
+            candidates.update(postings[bisect.bisect_right(postings, i):])
+        size = len(token_sets[i])
+        for j in sorted(candidates):
+            # 要素数の比が閾値を下回るペアは比較しない
+            other_size = len(token_sets[j])
+            if min(size, other_size) < threshold * max(size, other_size) - 1e-9:
+                continue
+            if _jaccard_similarity(token_sets[i], token_sets[j]) >= threshold:
+                similar[i].append(j)
+    
+    # 空の集合同士は類似度1.0
+    for position, i in enumerate(empty_indices if threshold <= 1 else []):
+        similar[i] = empty_indices[position + 1:]
+    
+    return similar
+
+
+def build_token_matrix(
+    token_sets: List[Iterable[str]], vocabulary: Optional[Dict[str, int]] = None
+) -> Tuple[Any, Dict[str, int]]:
+    """トークン集合を文書×語の疎な0/1行列（CSR）に変換
+    
+    vocabulary を省略すると token_sets から作成する。指定した語彙にないトークンは列に含めない。
+    """
+    import numpy as np
+    from scipy import sparse
+    
+    build_vocabulary = vocabulary is None
+    if build_vocabulary:
+        vocabulary = {}
+    
+    indptr = [0]
+    indices = []
+    for tokens in token_sets:
+        columns = set()
+        for token in tokens:
+            column = vocabulary.get(token)
+            if column is None and build_vocabulary:
+                column = vocabulary[token] = len(vocabulary)
+            if column is not None:
+                columns.add(column)
+        indices.extend(sorted(columns))
+        indptr.append(len(indices))
+    
+    matrix = sparse.csr_matrix(
+        (np.ones(len(indices), dtype=np.int32), np.asarray(indices, dtype=np.int64), np.asarray(indptr, dtype=np.int64)),
+        shape=(len(token_sets), len(vocabulary))
+    )
+    return matrix, vocabulary
+
+
+def _jaccard_batches(
+    token_sets: List[Iterable[str]],
+    query_sets: Optional[List[Iterable[str]]],
+    threshold: float,
+    batch_size: int
+) -> Iterable[Tuple[int, Any]]:
+    """クエリをバッチに分けて、クエリ×コーパスのJaccard係数の疎行列を順に返す
+    
+    共通のトークンがないペアと閾値未満のペアは0（疎行列に含めない）。
+    """
+    import numpy as np
+    
+    corpus_sets = [set(tokens) for tokens in token_sets]
+    corpus, vocabulary = build_token_matrix(corpus_sets)
+    corpus_sizes = np.asarray([len(tokens) for tokens in corpus_sets], dtype=np.int64)
+    corpus_t = corpus.T.tocsr()
+    
+    if query_sets is None:
+        queries, query_sizes = corpus, corpus_sizes
+    else:
+        query_sets = [set(tokens) for tokens in query_sets]
+        queries, _ = build_token_matrix(query_sets, vocabulary)
+        # コーパスにないトークンも和集合の大きさには数える
+        query_sizes = np.asarray([len(tokens) for tokens in query_sets], dtype=np.int64)
+    
+    for start in range(0, queries.shape[0], batch_size):
+        stop = min(start + batch_size, queries.shape[0])
+        # 共通トークン数 = クエリ行列 × コーパス行列の転置
+        scores = (queries[start:stop] @ corpus_t).tocsr()
+        rows = np.repeat(np.arange(stop - start), np.diff(scores.indptr))
+        intersection = scores.data.astype(np.float64)
+        union = query_sizes[start:stop][rows] + corpus_sizes[scores.indices] - intersection
+        scores.data = intersection / union
+        if threshold > 0:
+            scores.data[scores.data < threshold] = 0
+            scores.eliminate_zeros()
+        yield start, scores
+
+
+def jaccard_similarity_matrix(
+    token_sets: List[Iterable[str]],
+    query_sets: Optional[List[Iterable[str]]] = None,
+    threshold: float = 0.0,
+    batch_size: int = 1024
+) -> Any:
+    """トークン集合同士のJaccard係数を疎行列（クエリ×コーパスのCSR）でまとめて計算
+    
+    query_sets を省略するとコーパス同士の全ペア（対角成分を含む）を計算する。
+    共通のトークンがないペア（空の集合同士を含む）と閾値未満のペアは0として疎行列に含めない。
+    """
+    import numpy as np
+    from scipy import sparse
+    
+    blocks = [scores for _, scores in _jaccard_batches(token_sets, query_sets, threshold, batch_size)]
+    
+    n_queries = len(token_sets) if query_sets is None else len(query_sets)
+    if not blocks:
+        return sparse.csr_matrix((n_queries, len(token_sets)), dtype=np.float64)
+    return sparse.vstack(blocks, format="csr")
+
+
+def jaccard_top_k(
+    token_sets: List[Iterable[str]],
+    k: int,
+    query_sets: Optional[List[Iterable[str]]] = None,
+    threshold: float = 0.0,
+    batch_size: int = 1024
+) -> List[List[Tuple[int, float]]]:
+    """クエリごとにJaccard係数の高いコーパスの集合を上位k件まで返す（類似度の降順、同点は番号順）
+    
+    クエリをバッチに分けて処理し、バッチごとの疎行列しか保持しないので、大きなコーパスでもメモリが抑えられる。
+    query_sets を省略するとコーパス同士を比較し、自分自身は結果に含めない。
+    """
+    import numpy as np
+    
+    results = []
+    for start, scores in _jaccard_batches(token_sets, query_sets, threshold, batch_size):
+        for row in range(scores.shape[0]):
+            begin, end = scores.indptr[row], scores.indptr[row + 1]
+            columns = scores.indices[begin:end]
+            values = scores.data[begin:end]
+            if query_sets is None:
+                keep = columns != start + row
+                columns, values = columns[keep], values[keep]
+            # 類似度の降順、同点はコーパスの番号順
+            order = np.lexsort((columns, -values))[:k]
+            results.append([(int(columns[i]), float(values[i])) for i in order])
+    return results
@@ -0,0 +1,439 @@
+"""openpyxlを介さずにxlsxのシートを直接読むストリーミングリーダー
+
+zipからシートXMLを逐次パースし、共有文字列テーブルは最初に1回だけ解決する。
+値の変換（数値・真偽値・日付・数式文字列）は openpyxl の read_only モードと同じ結果になる。
+"""
+import posixpath
+import zipfile
+from typing import List, Dict, Any, Optional, Tuple, Iterator, Sequence
+from xml.etree.ElementTree import iterparse
+import logging
+
+logger = logging.getLogger(__name__)
+
+SHEET_MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+PKG_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+_ROW_TAG = f"{{{SHEET_MAIN_NS}}}row"
+_CELL_TAG = f"{{{SHEET_MAIN_NS}}}c"
+_VALUE_TAG = f"{{{SHEET_MAIN_NS}}}v"
+_FORMULA_TAG = f"{{{SHEET_MAIN_NS}}}f"
+_INLINE_STRING_TAG = f"{{{SHEET_MAIN_NS}}}is"
+_TEXT_TAG = f"{{{SHEET_MAIN_NS}}}t"
+_RUN_TAG = f"{{{SHEET_MAIN_NS}}}r"
+_SI_TAG = f"{{{SHEET_MAIN_NS}}}si"
+_DIMENSION_TAG = f"{{{SHEET_MAIN_NS}}}dimension"
+_SHEET_DATA_TAG = f"{{{SHEET_MAIN_NS}}}sheetData"
+_RELATIONSHIP_TAG = f"{{{PKG_REL_NS}}}Relationship"
+
+
+class UnsupportedXlsxFeature(ValueError):
+    """ネイティブリーダーが扱えない機能（共有数式など）を含む入力の場合の例外（openpyxl で読み直す）"""
+
+
+_column_index_cache: Dict[str, int] = {}
+
+
+def column_index_from_letters(letters: str) -> int:
+    """列記号（A, B, ..., AA）を1始まりの列番号に変換"""
+    index = _column_index_cache.get(letters)
+    if index is None:
+        index = 0
+        for char in letters:
+            index = index * 26 + (ord(char) - 64)
+        _column_index_cache[letters] = index
+    return index
+
+
+def _split_coordinate(coordinate: str) -> Tuple[int, int]:
+    """セル座標（例: B12）を（行, 列）に分解"""
+    letters = coordinate.rstrip("0123456789")
+    if not letters or len(letters) == len(coordinate):
+        raise ValueError(f"不正なセル座標です: {coordinate}")
+    return int(coordinate[len(letters):]), column_index_from_letters(letters.upper())
+
+
+def _column_of(coordinate: str) -> int:
+    """セル座標から列番号だけを取り出す"""
+    return column_index_from_letters(coordinate.rstrip("0123456789"))
+
+
+def _cell_parts(cell) -> Tuple[Optional[str], Any, Any]:
+    """セル要素の子（値・数式・インライン文字列）を1回の走査で取り出す"""
+    raw = formula = inline = None
+    for child in cell:
+        tag = child.tag
+        if tag == _VALUE_TAG:
+            raw = child.text or None
+        elif tag == _FORMULA_TAG:
+            formula = child
+        elif tag == _INLINE_STRING_TAG:
+            inline = child
+    return raw, formula, inline
+
+
+def _parse_dimension(ref: str) -> Optional[Tuple[int, int, int, int]]:
+    """dimension の ref（例: A1:C100）を（最小列, 最小行, 最大列, 最大行）に変換"""
+    if not ref:
+        return None
+    start, _, end = ref.partition(":")
+    try:
+        min_row, min_col = _split_coordinate(start)
+        max_row, max_col = _split_coordinate(end) if end else (min_row, min_col)
+    except ValueError:
+        return None
+    return min_col, min_row, max_col, max_row
+
+
+def _text_content(element) -> str:
+    """si / is 要素の文字列を連結（ふりがな rPh は除外）"""
+    if len(element) == 1 and element[0].tag == _TEXT_TAG:
+        return element[0].text or ""
+    snippets = []
+    plain = element.find(_TEXT_TAG)
+    if plain is not None and plain.text is not None:
+        snippets.append(plain.text)
+    for run in element.findall(_RUN_TAG):
+        text = run.find(_TEXT_TAG)
+        if text is not None and text.text is not None:
+            snippets.append(text.text)
+    return "".join(snippets)
+
+
+def _cast_number(value: str):
+    """数値文字列を int / float に変換（openpyxlと同じ規則）"""
+    if "." in value or "E" in value or "e" in value:
+        return float(value)
+    return int(value)
+
+
+class XlsxSheetReader:
+    """xlsxの1シートを逐次読み込むリーダー"""
+
+    def __init__(self, source, sheet_name: Optional[str] = None):
+        self._archive = zipfile.ZipFile(source)
+        try:
+            self._names = set(self._archive.namelist())
+            workbook_path = self._find_workbook_path()
+            sheet_paths, active_index, date1904 = self._read_workbook(workbook_path)
+            if not sheet_paths:
+                raise ValueError("シートが見つかりません")
+
+            if sheet_name is None:
+                index = active_index if 0 <= active_index < len(sheet_paths) else 0
+                self.sheet_name, self._sheet_path = sheet_paths[index]
+            else:
+                matches = [path for name, path in sheet_paths if name == sheet_name]
+                if not matches:
+                    raise ValueError(f"シートが見つかりません: {sheet_name}")
+                self.sheet_name, self._sheet_path = sheet_name, matches[0]
+            if self._sheet_path is None:
+                raise UnsupportedXlsxFeature(f"ワークシート以外のシートには対応していません: {self.sheet_name}")
+
+            self._date1904 = date1904
+            self._shared_strings = self._read_shared_strings()
+            self._date_styles, self._timedelta_styles = self._read_date_styles()
+            self.dimension = self._read_dimension()
+        except Exception:
+            self._archive.close()
+            raise
+
+    def close(self) -> None:
+        self._archive.close()
+
+    def __enter__(self) -> "XlsxSheetReader":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    @property
+    def max_column(self) -> Optional[int]:
+        return self.dimension[2] if self.dimension else None
+
+    @property
+    def max_row(self) -> Optional[int]:
+        return self.dimension[3] if self.dimension else None
+
+    # ------------------------------------------------------------------
+    # ワークブック構造の解決
+    # ------------------------------------------------------------------
+
+    def _read_relationships(self, rels_path: str, base_dir: str) -> Dict[str, Tuple[str, str]]:
+        """リレーションシップ（Id -> (Type, zip内パス)）を読み込む"""
+        relationships = {}
+        if rels_path not in self._names:
+            return relationships
+        with self._archive.open(rels_path) as src:
+            for _, element in iterparse(src):
+                if element.tag == _RELATIONSHIP_TAG:
+                    target = element.get("Target", "")
+                    if target.startswith("/"):
+                        path = target.lstrip("/")
+                    else:
+                        path = posixpath.normpath(posixpath.join(base_dir, target))
+                    relationships[element.get("Id")] = (element.get("Type", ""), path)
+        return relationships
+
+    def _find_workbook_path(self) -> str:
+        for rel_type, path in self._read_relationships("_rels/.rels", "").values():
+            if rel_type.endswith("/officeDocument"):
+                return path
+        return "xl/workbook.xml"
+
+    def _read_workbook(self, workbook_path: str) -> Tuple[List[Tuple[str, str]], int, bool]:
+        """シート一覧（名前, パス）、アクティブシート番号、1904年基準かどうかを取得"""
+        base_dir = posixpath.dirname(workbook_path)
+        rels_path = posixpath.join(base_dir, "_rels", posixpath.basename(workbook_path) + ".rels")
+        relationships = self._read_relationships(rels_path, base_dir)
+        self._workbook_relationships = relationships
+
+        sheets = []
+        active_index = None
+        date1904 = False
+        with self._archive.open(workbook_path) as src:
+            for _, element in iterparse(src):
+                tag = element.tag.rsplit("}", 1)[-1]
+                if tag == "sheet":
+                    rel_id = element.get(f"{{{REL_NS}}}id")
+                    rel_type, path = relationships.get(rel_id, ("", ""))
+                    # activeTab はグラフシートも含めた番号なので、ワークシート以外は path を None にして残す
+                    is_worksheet = rel_type.endswith("/worksheet") and path in self._names
+                    sheets.append((element.get("name"), path if is_worksheet else None))
+                elif tag == "workbookView" and active_index is None:
+                    active_index = int(element.get("activeTab", 0))
+                elif tag == "workbookPr":
+                    date1904 = element.get("date1904", "false").lower() in ("1", "true")
+        return sheets, active_index or 0, date1904
+
+    def _find_part(self, suffix: str, default: str) -> Optional[str]:
+        for rel_type, path in self._workbook_relationships.values():
+            if rel_type.endswith(suffix):
+                return path if path in self._names else None
+        return default if default in self._names else None
+
+    def _read_shared_strings(self) -> List[str]:
+        """共有文字列テーブルを1回だけ読み込む"""
+        path = self._find_part("/sharedStrings", "xl/sharedStrings.xml")
+        strings = []
+        if path is None:
+            return strings
+        with self._archive.open(path) as src:
+            for _, element in iterparse(src):
+                if element.tag == _SI_TAG:
+                    strings.append(_text_content(element).replace("x005F_", ""))
+                    element.clear()
+        return strings
+
+    def _read_date_styles(self) -> Tuple[set, set]:
+        """日付・時間間隔の書式を持つスタイル番号を抽出"""
+        path = self._find_part("/styles", "xl/styles.xml")
+        if path is None:
+            return set(), set()
+
+        from openpyxl.styles.numbers import (
+            BUILTIN_FORMATS, is_date_format, is_timedelta_format
+        )
+
+        custom_formats = {}
+        xf_format_ids = []
+        in_cell_xfs = False
+        with self._archive.open(path) as src:
+            for event, element in iterparse(src, events=("start", "end")):
+                tag = element.tag.rsplit("}", 1)[-1]
+                if tag == "cellXfs":
+                    in_cell_xfs = event == "start"
+                elif event == "end" and tag == "numFmt":
+                    custom_formats[int(element.get("numFmtId"))] = element.get("formatCode")
+                elif event == "end" and tag == "xf" and in_cell_xfs:
+                    xf_format_ids.append(int(element.get("numFmtId", 0)))
+
+        date_styles = set()
+        timedelta_styles = set()
+        for style_id, format_id in enumerate(xf_format_ids):
+            fmt = custom_formats.get(format_id, BUILTIN_FORMATS.get(format_id))
+            if is_date_format(fmt):
+                date_styles.add(style_id)
+            if is_timedelta_format(fmt):
+                timedelta_styles.add(style_id)
+        return date_styles, timedelta_styles
+
+    def _read_dimension(self) -> Optional[Tuple[int, int, int, int]]:
+        """シートの dimension を読む（行データより前にあるため先頭だけを読む）"""
+        with self._archive.open(self._sheet_path) as src:
+            for _, element in iterparse(src, events=("start",)):
+                if element.tag == _DIMENSION_TAG:
+                    return _parse_dimension(element.get("ref", ""))
+                if element.tag == _SHEET_DATA_TAG:
+                    break
+        return None
+
+    # ------------------------------------------------------------------
+    # 行の読み込み
+    # ------------------------------------------------------------------
+
+    def _convert_value(self, data_type: str, raw: Optional[str], formula, inline, style_id: int):
+        """セル値をopenpyxlと同じ型に変換"""
+        if formula is not None:
+            if formula.get("t") in ("shared", "array", "dataTable"):
+                raise UnsupportedXlsxFeature("共有数式・配列数式には対応していません")
+            return "=" + (formula.text or "")
+
+        if data_type == "inlineStr":
+            return _text_content(inline) if inline is not None else None
+        if raw is None:
+            return None
+
+        if data_type == "s":
+            return self._shared_strings[int(raw)]
+        if data_type == "n":
+            value = _cast_number(raw)
+            if style_id in self._date_styles:
+                from openpyxl.utils.datetime import from_excel, WINDOWS_EPOCH, MAC_EPOCH
+                epoch = MAC_EPOCH if self._date1904 else WINDOWS_EPOCH
+                try:
+                    return from_excel(value, epoch, timedelta=style_id in self._timedelta_styles)
+                except (OverflowError, ValueError):
+                    return "#VALUE!"
+            return value
+        if data_type == "b":
+            return bool(int(raw))
+        if data_type == "d":
+            from openpyxl.utils.datetime import from_ISO8601
+            return from_ISO8601(raw)
+        # str（数式の文字列結果）・e（エラー値）はそのまま
+        return raw
+
+    def iter_rows(
+        self,
+        min_row: int = 1,
+        max_col: Optional[int] = None,
+        columns: Optional[Sequence[int]] = None
+    ) -> Iterator[Tuple[int, Optional[tuple]]]:
+        """（行番号, 値のタプル）を順に返す
+
+        columns に1始まりの列番号を渡すと、その列の値だけを変換して返す。
+        値がすべて空の行は値の代わりに None を返すため、呼び出し側で
+        変換コストをかけずに読み飛ばせる。dimension がある場合は
+        openpyxl と同様にその範囲外の行・列を無視する。
+        """
+        max_col = max_col or self.max_column
+        max_row = self.max_row
+        if columns is None:
+            if max_col is None:
+                raise ValueError("dimension がないシートでは columns の指定が必要です")
+            columns = list(range(1, max_col + 1))
+        positions = {column: i for i, column in enumerate(columns)}
+        width = len(columns)
+
+        shared_strings = self._shared_strings
+        date_style_keys = {str(style_id) for style_id in self._date_styles}
+        row_counter = 0
+        with self._archive.open(self._sheet_path) as src:
+            for _, element in iterparse(src):
+                if element.tag != _ROW_TAG:
+                    continue
+
+                row_attr = element.get("r")
+                row_counter = int(row_attr) if row_attr else row_counter + 1
+                if max_row is not None and row_counter > max_row:
+                    break
+                if row_counter < min_row:
+                    element.clear()
+                    continue
+
+                values = None
+                column_counter = 0
+                for cell in element:
+                    if cell.tag != _CELL_TAG:
+                        continue
+                    coordinate = cell.get("r")
+                    column_counter = _column_of(coordinate) if coordinate else column_counter + 1
+                    if max_col is not None and column_counter > max_col:
+                        continue
+
+                    raw, formula, inline = _cell_parts(cell)
+                    data_type = cell.get("t", "n")
+                    if raw is None and formula is None and (data_type != "inlineStr" or inline is None):
+                        continue
+
+                    if values is None:
+                        values = [None] * width
+                    position = positions.get(column_counter)
+                    if position is None:
+                        # 要求されていない列は「空行かどうか」の判定にだけ使う
+                        continue
+                    if formula is None and data_type == "s":
+                        values[position] = shared_strings[int(raw)]
+                    elif formula is None and data_type == "n" and cell.get("s", "0") not in date_style_keys:
+                        values[position] = _cast_number(raw)
+                    else:
+                        style_id = int(cell.get("s", 0))
+                        values[position] = self._convert_value(data_type, raw, formula, inline, style_id)
+
+                element.clear()
+                yield row_counter, (tuple(values) if values is not None else None)
+
+    def read_headers(self, header_row: int = 1) -> List[Any]:
+        """ヘッダー行の値を取得（dimension がなければ最後のセルまで）"""
+        header_values = []
+        row_counter = 0
+        with self._archive.open(self._sheet_path) as src:
+            for _, element in iterparse(src):
+                if element.tag != _ROW_TAG:
+                    continue
+                row_attr = element.get("r")
+                row_counter = int(row_attr) if row_attr else row_counter + 1
+                if row_counter < header_row:
+                    element.clear()
+                    continue
+                if row_counter > header_row:
+                    break
+                column_counter = 0
+                cells = {}
+                for cell in element:
+                    if cell.tag != _CELL_TAG:
+                        continue
+                    coordinate = cell.get("r")
+                    column_counter = _column_of(coordinate) if coordinate else column_counter + 1
+                    raw, formula, inline = _cell_parts(cell)
+                    cells[column_counter] = self._convert_value(
+                        cell.get("t", "n"), raw, formula, inline, int(cell.get("s", 0))
+                    )
+                width = self.max_column or (column_counter if cells else 0)
+                header_values = [cells.get(column) for column in range(1, width + 1)]
+                break
+        if not header_values and self.max_column:
+            header_values = [None] * self.max_column
+        return header_values
+
+
+def read_xlsx_columns(
+    source,
+    columns: Optional[Sequence[Any]] = None,
+    header_row: int = 1
+) -> Tuple[List[Any], List[List[Any]]]:
+    """xlsxのアクティブシートから指定列だけを読み込む
+
+    columns にはヘッダー名（1行目の値）または0始まりの列番号を指定する。
+    戻り値は（ヘッダー一覧, 列ごとの値リスト）で、空行は除外される。
+    """
+    with XlsxSheetReader(source) as reader:
+        headers = reader.read_headers(header_row)
+        if columns is None:
+            indices = list(range(len(headers)))
+        else:
+            indices = [
+                column if isinstance(column, int) else headers.index(column)
+                for column in columns
+            ]
+        data = [[] for _ in indices]
+        for _, values in reader.iter_rows(
+            min_row=header_row + 1, columns=[i + 1 for i in indices]
+        ):
+            if values is None:
+                continue
+            for column_values, value in zip(data, values):
+                column_values.append(value)
+        return [headers[i] for i in indices], data
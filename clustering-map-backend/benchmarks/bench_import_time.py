@@ -0,0 +1,76 @@
+"""
+text_utils のインポート時間と、Sudachi辞書の読み込みを含む初回トークン化の時間を計測するベンチマーク
+
+各計測は新しいPythonプロセスで行う（モジュールと辞書のキャッシュを持ち越さないため）。
+
+使い方:
+    python benchmarks/bench_import_time.py
+    python benchmarks/bench_import_time.py --repeat 10
+"""
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent.parent
+
+# 各シナリオを新しいプロセスで実行し、区間ごとの秒数をJSONで出力するスクリプト
+SCENARIOS = {
+    # 辞書を読み込まないリクエスト（アップロードのみなど）
+    "import only": """
+import time
+start = time.perf_counter()
+import app.utils.text_utils
+timings = {"import": time.perf_counter() - start}
+""",
+    # 最初のトークン化で辞書を読み込む
+    "import + first tokenize": """
+import time
+start = time.perf_counter()
+import app.utils.text_utils as text_utils
+timings = {"import": time.perf_counter() - start}
+start = time.perf_counter()
+text_utils.preprocess_text("顧客満足度を向上させたい")
+timings["first tokenize"] = time.perf_counter() - start
+""",
+    # 変更前と同じく、インポート時に辞書を読み込む
+    "import + preload": """
+import time
+start = time.perf_counter()
+import app.utils.text_utils as text_utils
+text_utils.preload_tokenizer()
+timings = {"import": time.perf_counter() - start}
+start = time.perf_counter()
+text_utils.preprocess_text("顧客満足度を向上させたい")
+timings["first tokenize"] = time.perf_counter() - start
+""",
+}
+
+
+def run_scenario(code: str) -> dict:
+    """新しいプロセスでシナリオを実行し、区間ごとの秒数を返す"""
+    script = code + "\nimport json\nprint(json.dumps(timings))\n"
+    result = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", script],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="各シナリオの試行回数（最速値を表示）")
+    args = parser.parse_args()
+
+    print(f"{'scenario':<26}{'import':>12}{'first tokenize':>18}")
+    for name, code in SCENARIOS.items():
+        runs = [run_scenario(code) for _ in range(args.repeat)]
+        best_import = min(run["import"] for run in runs)
+        first_tokenize = [run["first tokenize"] for run in runs if "first tokenize" in run]
+        tokenize_column = f"{min(first_tokenize) * 1000:.1f} ms" if first_tokenize else "-"
+        print(f"{name:<26}{best_import * 1000:>9.1f} ms{tokenize_column:>18}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+merge_similar_tags の全ペア比較とプレフィックスフィルタによる候補絞り込みを比較するベンチマーク
+
+使い方:
+    python benchmarks/bench_merge_tags.py
+    python benchmarks/bench_merge_tags.py --tags 1000 3000 --threshold 0.8
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.utils import text_utils
+
+WORDS = [
+    '残業', '深夜', '連絡', '休日', '給与', '賞与', '評価', '制度', '上司', '部下', '研修', 'スキル',
+    'キャリア', '成長', 'チーム', '協力', '環境', 'オフィス', '設備', '福利厚生', '休暇', '家族',
+    '業務', '負担', '改善', '満足', '不満', '会議', '資料', '残業代', '昇進', '目標', '方針', '意見',
+]
+
+
+def make_keyphrases(n_tags: int, seed: int = 0) -> list:
+    """KeyBERT のキーフレーズ（1〜3語）に似たタグを作成"""
+    rng = random.Random(seed)
+    tags = []
+    for i in range(n_tags):
+        words = rng.sample(WORDS, rng.randint(1, 3))
+        # 同じタグばかりにならないように番号付きの語を混ぜる
+        if rng.random() < 0.5:
+            words.append(f"項目{i}")
+        tags.append(" ".join(words))
+    return tags
+
+
+def merge_all_pairs(tags: list, token_sets: list, threshold: float) -> list:
+    """全ペアを比較する従来の貪欲マージ（トークン化済みの集合を使う）"""
+    merged_tags = []
+    used_indices = set()
+    for i, tag1 in enumerate(tags):
+        if i in used_indices:
+            continue
+        similar_tags = [tag1]
+        used_indices.add(i)
+        for j in range(i + 1, len(tags)):
+            if j not in used_indices and text_utils._jaccard_similarity(token_sets[i], token_sets[j]) >= threshold:
+                similar_tags.append(tags[j])
+                used_indices.add(j)
+        merged_tags.append(max(similar_tags, key=len))
+    return merged_tags
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tags", type=int, nargs="+", default=[1000, 3000], help="タグ数")
+    parser.add_argument("--threshold", type=float, default=0.8, help="マージするJaccard係数の閾値")
+    args = parser.parse_args()
+
+    text_utils.preload_tokenizer()
+    print(f"{'tags':>6}{'tokenize':>12}{'all pairs':>12}{'prefix filter':>15}{'merged':>8}")
+    for n_tags in args.tags:
+        tags = make_keyphrases(n_tags)
+        text_utils.token_cache.clear()
+
+        start = time.perf_counter()
+        token_sets = [set(tokens) for tokens in text_utils.preprocess_texts(tags)]
+        tokenize_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        expected = merge_all_pairs(tags, token_sets, args.threshold)
+        all_pairs_time = time.perf_counter() - start
+
+        # トークンはキャッシュ済みなので、候補の列挙と検証の時間になる
+        start = time.perf_counter()
+        merged = text_utils.merge_similar_tags(tags, args.threshold)
+        prefix_time = time.perf_counter() - start
+
+        assert merged == expected
+        print(
+            f"{n_tags:>6}{tokenize_time * 1000:>9.1f} ms{all_pairs_time * 1000:>9.1f} ms"
+            f"{prefix_time * 1000:>12.1f} ms{len(merged):>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+直列と並列（プロセスプール）の形態素解析のスループットを比較するベンチマーク
+
+使い方:
+    python benchmarks/bench_tokenize.py
+    python benchmarks/bench_tokenize.py --rows 10000 50000 --workers 2 4
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.utils import text_utils
+
+SAMPLE_TEXTS = [
+    '22時以降の残業を禁止にして欲しいです。夜に連絡がくるのでワークライフバランスが保てません。',
+    'チームの仲間がとても協力的で、困った時には助け合える環境です。上司も理解があります。',
+    'スキルアップのための研修制度が充実していて、キャリア成長を実感できます。',
+    '給与や待遇面で満足しており、ボーナスも期待できます。昇進の機会も多いです。',
+    '残業が多く、休暇が取りにくい状況が続いています。改善が必要です。',
+]
+
+
+def make_texts(n_rows: int) -> list:
+    """キャッシュが効かないように行番号を付けた回答を作成"""
+    return [f"{SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)]}（回答{i}）" for i in range(n_rows)]
+
+
+def measure(texts: list, workers: int) -> float:
+    """キャッシュを空にした状態での前処理時間（秒）を返す"""
+    text_utils.token_cache.clear()
+    start = time.perf_counter()
+    text_utils.preprocess_texts(texts, workers=workers)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 50000], help="テキスト件数")
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, os.cpu_count() or 1], help="並列プロセス数")
+    args = parser.parse_args()
+
+    # 全件がキャッシュに収まるようにする
+    text_utils.token_cache.max_entries = max(args.rows)
+    text_utils.preload_tokenizer()
+    print(f"CPU cores: {os.cpu_count()}")
+    print(f"{'rows':>8}{'workers':>9}{'seconds':>10}{'texts/s':>10}{'speedup':>9}")
+    for n_rows in args.rows:
+        texts = make_texts(n_rows)
+        serial = measure(texts, workers=1)
+        print(f"{n_rows:>8}{1:>9}{serial:>10.2f}{n_rows / serial:>10.0f}{1.0:>8.2f}x")
+        for workers in sorted(set(args.workers) - {1}):
+            # プロセスの起動と辞書の読み込みは除いて計測する
+            measure(make_texts(text_utils.PARALLEL_MIN_TEXTS), workers)
+            elapsed = measure(texts, workers)
+            print(f"{n_rows:>8}{workers:>9}{elapsed:>10.2f}{n_rows / elapsed:>10.0f}{serial / elapsed:>8.2f}x")
+    text_utils.shutdown_process_pool()
+
+
+if __name__ == "__main__":
+    main()
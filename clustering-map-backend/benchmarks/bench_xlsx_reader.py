@@ -0,0 +1,78 @@
+"""
+ネイティブxlsxリーダーと openpyxl（read_only）の読み込み速度を比較するベンチマーク
+
+使い方:
+    python benchmarks/bench_xlsx_reader.py
+    python benchmarks/bench_xlsx_reader.py --rows 1000 10000 50000 --repeat 3
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from openpyxl import Workbook
+
+from app.utils.file_utils import read_excel_file
+
+SAMPLE_TEXTS = [
+    '22時以降の残業を禁止にして欲しいです。夜に連絡がくるのでワークライフバランスが保てません。',
+    'チームの仲間がとても協力的で、困った時には助け合える環境です。上司も理解があります。',
+    'スキルアップのための研修制度が充実していて、キャリア成長を実感できます。',
+    '給与や待遇面で満足しており、ボーナスも期待できます。昇進の機会も多いです。',
+    '残業が多く、休暇が取りにくい状況が続いています。改善が必要です。',
+]
+
+
+def create_workbook(path: str, n_rows: int) -> None:
+    """アンケート形式（ID・自由記述・部署・スコア）のワークブックを作成"""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("アンケート結果")
+    ws.append(['ID', '自由記述', '部署', 'スコア'])
+    for i in range(n_rows):
+        # 同じ文が繰り返されないように行番号を付ける
+        text = f"{SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)]}（回答{i}）"
+        ws.append([i + 1, text, f"部署{i % 12}", (i % 5) + 0.5])
+    wb.save(path)
+
+
+def measure(path: str, engine: str, repeat: int) -> float:
+    """最速の読み込み時間（秒）を返す"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        read_excel_file(path, engine=engine)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 50000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'size(KB)':>10} {'openpyxl(s)':>12} {'native(s)':>10} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for n_rows in args.rows:
+            path = os.path.join(temp_dir, f"bench_{n_rows}.xlsx")
+            create_workbook(path, n_rows)
+
+            # 両方のリーダーが同じ結果を返すことを確認してから計測
+            expected = read_excel_file(path, engine="openpyxl")
+            actual = read_excel_file(path, engine="native")
+            assert actual.columns == expected.columns
+            assert actual.to_dict('list') == expected.to_dict('list')
+
+            openpyxl_time = measure(path, "openpyxl", args.repeat)
+            native_time = measure(path, "native", args.repeat)
+            size_kb = os.path.getsize(path) / 1024
+            print(f"{n_rows:>8} {size_kb:>10.0f} {openpyxl_time:>12.3f} {native_time:>10.3f} "
+                  f"{openpyxl_time / native_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,17 @@
-import React, { useState } from 'react'
+import React, { useState, useEffect } from 'react'
 import { Header } from './components/Header'
 import { UploadStep } from './components/UploadStep'
 import { TagEditingStep } from './components/TagEditingStep'
 import { AnalysisStep } from './components/AnalysisStep'
 import { VisualizationStep } from './components/VisualizationStep'
 import { UploadResponse, AnalysisRequest, AnalysisResult } from './types'
+import { getTagCandidates } from './utils/api'
 
 type Step = 'upload' | 'tags' | 'analysis' | 'visualization'
 
+// タグ候補の計算状況を問い合わせる間隔（ミリ秒）
+const TAG_POLL_INTERVAL = 1000
+
 function App() {
   const [currentStep, setCurrentStep] = useState<Step>('upload')
   const [isLoading, setIsLoading] = useState(false)
@@ -21,6 +25,34 @@ function App() {
     setCurrentStep('tags')
   }
 
+  // タグ候補はアップロード応答の後にバックグラウンドで計算されるので、完了するまで問い合わせる
+  const datasetId = uploadData?.dataset_id
+  const tagStatus = uploadData?.tag_status
+  useEffect(() => {
+    if (!datasetId || (tagStatus !== 'pending' && tagStatus !== 'running')) {
+      return
+    }
+    let cancelled = false
+    const timer = setTimeout(async () => {
+      try {
+        const result = await getTagCandidates(datasetId)
+        if (cancelled) return
+        setUploadData(prev => prev && prev.dataset_id === datasetId
+          ? { ...prev, tag_status: result.status, tag_candidates: result.tag_candidates }
+          : prev)
+      } catch (error) {
+        console.error('Tag candidates polling failed:', error)
+        if (!cancelled) {
+          setUploadData(prev => prev && prev.dataset_id === datasetId ? { ...prev, tag_status: 'failed' } : prev)
+        }
+      }
+    }, TAG_POLL_INTERVAL)
+    return () => {
+      cancelled = true
+      clearTimeout(timer)
+    }
+  }, [datasetId, tagStatus, uploadData])
+
   const handleAnalysisComplete = (result: AnalysisResult) => {
     setAnalysisResult(result)
     setCurrentStep('visualization')
@@ -52,6 +84,7 @@ function App() {
             onComplete={(tagRules) => {
               // デフォルトのAnalysisRequestを作成
               const request: AnalysisRequest = {
+                dataset_id: uploadData.dataset_id,
                 column_mapping: {
                   text_column: uploadData.columns[0] || '自由記述',
                   id_column: '',
@@ -99,14 +99,12 @@ export const UploadStep: React.FC<UploadStepProps> = ({
     setUploadedFile(file)
     setUploadProgress('ファイルを検証中...')
 
-    // ファイル形式の検証
-    const allowedTypes = [
-      'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-      'application/vnd.ms-excel',
-    ]
+    // ファイル形式の検証（CSVはブラウザによってMIMEタイプが異なるため拡張子で判定）
+    const allowedExtensions = ['.xlsx', '.xls', '.csv', '.tsv', '.parquet']
+    const extension = file.name.slice(file.name.lastIndexOf('.')).toLowerCase()
     
-    if (!allowedTypes.includes(file.type)) {
-      setError('Excelファイル（.xlsx, .xls）をアップロードしてください。')
+    if (!allowedExtensions.includes(extension)) {
+      setError('Excel（.xlsx, .xls）、CSV（.csv, .tsv）またはParquet（.parquet）ファイルをアップロードしてください。')
       setUploadProgress('')
       return
     }
@@ -213,7 +211,7 @@ export const UploadStep: React.FC<UploadStepProps> = ({
         >
           <input
             type="file"
-            accept=".xlsx,.xls"
+            accept=".xlsx,.xls,.csv,.tsv,.parquet"
             onChange={handleFileInput}
             className="absolute inset-0 w-full h-full opacity-0 cursor-pointer"
             disabled={isLoading}
@@ -251,7 +249,7 @@ export const UploadStep: React.FC<UploadStepProps> = ({
                 ファイルを選択
               </button>
               <p className="text-xs text-gray-500 mt-4">
-                対応形式: .xlsx, .xls（最大50MB）
+                対応形式: .xlsx, .xls, .csv, .tsv, .parquet（最大50MB）
               </p>
             </div>
           )}
@@ -273,7 +271,7 @@ export const UploadStep: React.FC<UploadStepProps> = ({
           ファイル形式について
         </h3>
         <ul className="text-sm text-blue-800 space-y-1">
-          <li>• Excelファイル（.xlsx, .xls）のみ対応</li>
+          <li>• Excel（.xlsx, .xls）、CSV（.csv, .tsv）、Parquet（.parquet）に対応</li>
           <li>• 1行目はヘッダー行として扱われます</li>
           <li>• 自由記述のテキスト列を含む必要があります</li>
           <li>• 最大50,000行まで処理可能</li>
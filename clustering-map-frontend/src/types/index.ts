@@ -50,9 +50,22 @@ export interface UploadResponse {
   columns: string[]
   sample_data: Record<string, any>[]
   tag_candidates: TagCandidate[]
+  tag_status?: TagStatus
+  dataset_id?: string
+}
+
+export type TagStatus = 'pending' | 'running' | 'completed' | 'failed'
+
+export interface TagCandidatesResponse {
+  success: boolean
+  dataset_id: string
+  status: TagStatus
+  tag_candidates: TagCandidate[]
+  message?: string
 }
 
 export interface AnalysisRequest {
+  dataset_id?: string
   column_mapping: ColumnMapping
   tag_rules: TagRule[]
   cluster_method: 'hdbscan' | 'kmeans' | 'dbscan'
@@ -60,4 +73,8 @@ export interface AnalysisRequest {
   kmeans_params: Record<string, any>
   umap_params: Record<string, any>
   shape_mask_path?: string
+  tokenizer_mode?: TokenizerMode
 }
+
+// タグ抽出のトークナイザー（fast は辞書不要で空白のない日本語にも対応）
+export type TokenizerMode = 'regex' | 'fast' | 'sudachi'
@@ -1,5 +1,5 @@
 import axios from 'axios'
-import { UploadResponse, AnalysisRequest, AnalysisResult, TagCandidate } from '../types'
+import { UploadResponse, AnalysisRequest, AnalysisResult, TagCandidate, TagCandidatesResponse } from '../types'
 
 // 環境変数からAPI URLを取得（Vite環境変数）
 const getApiUrl = (): string => {
@@ -52,6 +52,12 @@ export const uploadFile = async (file: File): Promise<UploadResponse> => {
   return response.data
 }
 
+// タグ候補の取得（アップロード後にバックグラウンドで計算される）
+export const getTagCandidates = async (datasetId: string): Promise<TagCandidatesResponse> => {
+  const response = await api.get(`/datasets/${datasetId}/tag-candidates`)
+  return response.data
+}
+
 // データ解析
 export const analyzeData = async (request: AnalysisRequest): Promise<AnalysisResult> => {
   const response = await api.post('/analyze', request)